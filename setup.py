@@ -24,4 +24,10 @@ setup(
     packages=find_packages("src"),
     include_package_data=True,
     package_data={"": ["**/*.cu", "**/*.cpp", "**/*.cuh", "**/*.h", "**/*.pyx"]},
+    entry_points={
+        'console_scripts': [
+            'numpy_io_convert = numpy_io.core.converter:main',
+            'numpy_io_merge = numpy_io.core.merger:main',
+        ]
+    },
 )
@@ -0,0 +1,394 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/20 19:00
+# @Author: tk
+# @File：arena
+import hashlib
+import json
+import logging
+import math
+import os
+import pickle
+import tempfile
+import threading
+import time
+import typing
+from multiprocessing import Pool
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase
+from .batch import fetch_batch
+
+__all__ = [
+    'DEFAULT_SHM_DIR',
+    'get_arena_name',
+    'write_arena',
+    'build_arena',
+    'remove_arena',
+    'ArenaRandomDataset',
+    'load_shared_arena',
+]
+
+DEFAULT_SHM_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+
+# 等待其他进程写入的默认超时秒数 , 写入进程退出时不等待超时直接报错
+DEFAULT_TIMEOUT = 6 * 3600
+
+# 锁文件还未写入 pid 时 , 超过该秒数视为创建者已退出
+_EMPTY_LOCK_TIMEOUT = 60
+
+
+def _arena_path(shm_dir: str, name: str, suffix: str):
+    return os.path.join(shm_dir, '{}.{}'.format(name, suffix))
+
+
+def _chunk_path(shm_dir: str, name: str, chunk_id: int, suffix: str):
+    return os.path.join(shm_dir, '{}.{:05d}.{}'.format(name, chunk_id, suffix))
+
+
+def get_arena_name(files: typing.Union[typing.List, str], backend: str, **kwargs) -> str:
+    '''
+        按文件路径 , 大小 , 修改时间及读取参数生成共享内存名称 , 数据变化后名称随之变化
+    '''
+    if isinstance(files, str):
+        files = [files]
+    info = []
+    for f in files:
+        if isinstance(f, str) and os.path.exists(f):
+            info.append((os.path.abspath(f), os.path.getsize(f), os.path.getmtime(f)))
+        else:
+            info.append(repr(f))
+    key = json.dumps([info, backend, sorted((k, repr(v)) for k, v in kwargs.items())])
+    return 'numpy_io-' + hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+def _item_bytes(x) -> bytes:
+    if isinstance(x, dict):
+        if len(x) != 1:
+            raise ValueError('shared arena only supports single key kv data')
+        x = list(x.values())[0]
+    if isinstance(x, str):
+        return x.encode('utf-8')
+    if not isinstance(x, (bytes, bytearray, memoryview)):
+        raise ValueError('shared arena only supports serialized bytes data , got {}'.format(type(x)))
+    return x
+
+
+def _write_meta(name: str, shm_dir: str, chunks: typing.List, with_stream: bool = False):
+    meta_path = _arena_path(shm_dir, name, 'meta')
+    with open(meta_path + '.tmp', mode='w', encoding='utf-8') as f:
+        json.dump({'total_num': chunks[-1][1] if chunks else 0, 'chunks': chunks, 'stream': with_stream}, f)
+    os.replace(meta_path + '.tmp', meta_path)
+
+
+def _write_done(name: str, shm_dir: str):
+    # 全部分块写完后写入 , 等待方以此为准
+    done_path = _arena_path(shm_dir, name, 'done')
+    with open(done_path + '.tmp', mode='w', encoding='utf-8') as f:
+        f.write(str(os.getpid()))
+    os.replace(done_path + '.tmp', done_path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_alive(lock_path: str) -> bool:
+    '''
+        锁文件记录写入进程 pid , 进程不存在时为失效锁
+    '''
+    try:
+        with open(lock_path, mode='r', encoding='utf-8') as f:
+            pid = f.read().strip()
+        mtime = os.path.getmtime(lock_path)
+    except FileNotFoundError:
+        return False
+    if not pid:
+        return time.time() - mtime < _EMPTY_LOCK_TIMEOUT
+    return _pid_alive(int(pid))
+
+
+def _write_chunk(data: typing.Iterable, name: str, shm_dir: str, chunk_id: int) -> int:
+    # 数据区先落盘 , offsets 最后重命名作为分块完成标记
+    data_path = _chunk_path(shm_dir, name, chunk_id, 'data')
+    offsets_path = _chunk_path(shm_dir, name, chunk_id, 'offsets')
+    offsets = [0]
+    with open(data_path + '.tmp', mode='wb') as f:
+        for x in data:
+            b = _item_bytes(x)
+            f.write(b)
+            offsets.append(offsets[-1] + len(b))
+    np.asarray(offsets, dtype=np.int64).tofile(offsets_path + '.tmp')
+    os.replace(data_path + '.tmp', data_path)
+    os.replace(offsets_path + '.tmp', offsets_path)
+    return len(offsets) - 1
+
+
+def write_arena(data: typing.Iterable, name: str, shm_dir: str = DEFAULT_SHM_DIR) -> int:
+    '''
+        顺序写入单个分块 , 最后写入 meta 与完成标记
+        return: 数据条数
+    '''
+    num = _write_chunk(data, name, shm_dir, 0)
+    _write_meta(name, shm_dir, [[0, num]])
+    _write_done(name, shm_dir)
+    return num
+
+
+def _iter_range(dataset, start: int, end: int, block_size: int = 1024):
+    for i in range(start, end, block_size):
+        for x in fetch_batch(dataset, np.arange(i, min(i + block_size, end))):
+            yield x
+
+
+def _build_chunk_task(args):
+    dataset_fn, name, shm_dir, chunk_id, start, end = args
+    dataset = dataset_fn()
+    num = _write_chunk(_iter_range(dataset, start, end), name, shm_dir, chunk_id)
+    dataset.close()
+    return chunk_id, num
+
+
+def _build_chunks(dataset, dataset_fn, name: str, shm_dir: str, chunks: typing.List, num_workers: int):
+    total = chunks[-1][1] if chunks else 0
+    loaded = 0
+    start_time = time.time()
+
+    def log_progress(num):
+        elapsed = max(time.time() - start_time, 1e-6)
+        logging.info('load dataset to memory {}/{} ({:.1f}%) {:.0f} samples/s'.format(
+            num, total, 100.0 * num / max(total, 1), num / elapsed))
+
+    if num_workers <= 0 or dataset_fn is None:
+        for chunk_id, (start, end) in enumerate(chunks):
+            loaded += _write_chunk(_iter_range(dataset, start, end), name, shm_dir, chunk_id)
+            log_progress(loaded)
+        return
+
+    tasks = [(dataset_fn, name, shm_dir, chunk_id, start, end) for chunk_id, (start, end) in enumerate(chunks)]
+    with Pool(min(num_workers, len(tasks))) as pool:
+        # 按分块顺序完成 , 已完成的前缀可以先被读取
+        for _, num in pool.imap(_build_chunk_task, tasks):
+            loaded += num
+            log_progress(loaded)
+
+
+def _build_chunks_done(dataset, dataset_fn, name: str, shm_dir: str, chunks: typing.List, num_workers: int):
+    _build_chunks(dataset, dataset_fn, name, shm_dir, chunks, num_workers)
+    _write_done(name, shm_dir)
+
+
+def build_arena(dataset,
+                name: str,
+                shm_dir: str = DEFAULT_SHM_DIR,
+                dataset_fn: typing.Optional[typing.Callable] = None,
+                num_workers: int = 4,
+                chunk_size: typing.Optional[int] = None,
+                with_stream: bool = False) -> typing.Optional[threading.Thread]:
+    '''
+        随机读数据集按下标区间分块并行写入共享内存
+        dataset: 未解析 numpy 的随机读数据集
+        dataset_fn: 子进程重新打开数据集的可序列化函数 , 为空时在当前进程顺序读取
+        num_workers: 并行读取进程数
+        chunk_size: 每个分块数据条数 , 默认每个进程 8 个分块
+        with_stream: 后台线程写入 , 立即返回 , 读取未完成的分块时等待
+        return: with_stream 时返回后台线程
+        meta 先写入 , 全部分块写完后写入完成标记
+    '''
+    total = len(dataset)
+    if chunk_size is None:
+        chunk_size = max(int(math.ceil(total / (max(num_workers, 1) * 8))), 1)
+    chunks = [[s, min(s + chunk_size, total)] for s in range(0, total, chunk_size)]
+    if dataset_fn is not None:
+        try:
+            pickle.dumps(dataset_fn)
+        except Exception:
+            logging.warning('dataset_fn is not picklable , load dataset in current process')
+            dataset_fn = None
+    _write_meta(name, shm_dir, chunks, with_stream=with_stream)
+    if not with_stream:
+        _build_chunks_done(dataset, dataset_fn, name, shm_dir, chunks, num_workers)
+        return None
+    thread = threading.Thread(target=_build_chunks_done,
+                              args=(dataset, dataset_fn, name, shm_dir, chunks, num_workers),
+                              daemon=True)
+    thread.start()
+    return thread
+
+
+def _remove_file(path: str):
+    # 多个进程可能同时清理
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_arena(name: str, shm_dir: str = DEFAULT_SHM_DIR):
+    prefix = name + '.'
+    for f in os.listdir(shm_dir):
+        if f.startswith(prefix):
+            _remove_file(os.path.join(shm_dir, f))
+
+
+class ArenaRandomDataset(RandomDatasetBase):
+    '''
+        mmap 共享内存中的扁平数据区 , 同一节点所有进程与 DataLoader worker 共享同一份物理内存
+        分块未写完时读取会等待 , 写入进程已退出时报错 , timeout 为空时一直等待
+    '''
+    def __init__(self, name: str, shm_dir: str = DEFAULT_SHM_DIR,
+                 timeout: typing.Optional[float] = DEFAULT_TIMEOUT, poll_interval: float = 0.1):
+        self.name = name
+        self.shm_dir = shm_dir
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.__reopen__()
+
+    def __reopen__(self):
+        with open(_arena_path(self.shm_dir, self.name, 'meta'), mode='r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.length = meta['total_num']
+        self.starts = np.asarray([c[0] for c in meta['chunks']], dtype=np.int64)
+        self._chunks = [None] * len(meta['chunks'])
+
+    def __getstate__(self):
+        # 不序列化 mmap 内容 , 反序列化后重新映射
+        state = self.__dict__.copy()
+        state['_chunks'] = [None] * len(self._chunks)
+        return state
+
+    def reset(self):
+        self.__reopen__()
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def num_ready(self) -> int:
+        return sum(1 for k in range(len(self._chunks))
+                   if self._chunks[k] is not None or os.path.exists(_chunk_path(self.shm_dir, self.name, k, 'offsets')))
+
+    def is_ready(self) -> bool:
+        return self.num_ready == len(self._chunks)
+
+    def _get_chunk(self, chunk_id: int):
+        chunk = self._chunks[chunk_id]
+        if chunk is not None:
+            return chunk
+        offsets_path = _chunk_path(self.shm_dir, self.name, chunk_id, 'offsets')
+        start = time.time()
+        while not os.path.exists(offsets_path):
+            if self.timeout is not None and time.time() - start > self.timeout:
+                raise TimeoutError('wait shared arena {} chunk {} timeout'.format(self.name, chunk_id))
+            if not _lock_alive(_arena_path(self.shm_dir, self.name, 'lock')) and not os.path.exists(offsets_path):
+                raise RuntimeError('shared arena {} builder exited before chunk {} was written'.format(self.name, chunk_id))
+            time.sleep(self.poll_interval)
+        offsets = np.memmap(offsets_path, dtype=np.int64, mode='r')
+        if offsets[-1] > 0:
+            data = np.memmap(_chunk_path(self.shm_dir, self.name, chunk_id, 'data'), dtype=np.uint8, mode='r')
+        else:
+            data = np.zeros((0,), dtype=np.uint8)
+        chunk = self._chunks[chunk_id] = (data, offsets)
+        return chunk
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= self.length:
+            raise OverflowError
+        chunk_id = int(np.searchsorted(self.starts, item, side='right')) - 1
+        data, offsets = self._get_chunk(chunk_id)
+        item -= int(self.starts[chunk_id])
+        return data[offsets[item]: offsets[item + 1]].tobytes()
+
+
+def _release_after(thread: threading.Thread, name: str, shm_dir: str, fd: int, lock_path: str):
+    # 后台写入结束后释放锁 , 未写完时清理半成品
+    try:
+        thread.join()
+        if not os.path.exists(_arena_path(shm_dir, name, 'done')):
+            remove_arena(name, shm_dir)
+    finally:
+        os.close(fd)
+        _remove_file(lock_path)
+
+
+def _remove_stale_arena(name: str, shm_dir: str, lock_path: str) -> bool:
+    # 写入进程已退出 , 删除其锁与未完成的数据
+    if _lock_alive(lock_path):
+        return False
+    if os.path.exists(_arena_path(shm_dir, name, 'done')):
+        # 写完后退出 , 只遗留锁
+        _remove_file(lock_path)
+        return True
+    logging.warning('shared arena {} builder exited , remove incomplete data'.format(os.path.join(shm_dir, name)))
+    remove_arena(name, shm_dir)
+    return True
+
+
+def load_shared_arena(dataset, name: str, shm_dir: str = DEFAULT_SHM_DIR,
+                      timeout: typing.Optional[float] = DEFAULT_TIMEOUT, poll_interval: float = 1.0,
+                      dataset_fn: typing.Optional[typing.Callable] = None,
+                      num_workers: int = 0,
+                      with_stream: bool = False) -> ArenaRandomDataset:
+    '''
+        节点内第一个进程读取 dataset 写入共享内存 , 其余进程等待完成标记后直接映射
+        写入进程在锁文件中记录 pid , 进程退出后其余进程清理未完成的数据并重新写入
+        dataset: 未解析 numpy 的随机读或迭代数据集 , 迭代数据集只能当前进程顺序写入
+        name: 共享内存名称 , 见 get_arena_name
+        timeout: 等待其他进程写入的超时秒数 , 为空时一直等待
+        dataset_fn , num_workers , with_stream: 见 build_arena , with_stream 时等待方在 meta 写入后即可读取
+    '''
+    meta_path = _arena_path(shm_dir, name, 'meta')
+    done_path = _arena_path(shm_dir, name, 'done')
+    lock_path = _arena_path(shm_dir, name, 'lock')
+    start = time.time()
+    while not os.path.exists(done_path):
+        if os.path.exists(meta_path) and _lock_alive(lock_path):
+            with open(meta_path, mode='r', encoding='utf-8') as f:
+                if json.load(f).get('stream'):
+                    break
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if _remove_stale_arena(name, shm_dir, lock_path):
+                continue
+            if timeout is not None and time.time() - start > timeout:
+                raise TimeoutError('wait shared arena {} timeout , builder lock {}'.format(name, lock_path))
+            time.sleep(poll_interval)
+            continue
+        os.write(fd, str(os.getpid()).encode('utf-8'))
+        thread = None
+        try:
+            if os.path.exists(done_path):
+                break
+            # 崩溃遗留的 meta 与分块
+            for f in os.listdir(shm_dir):
+                if f.startswith(name + '.') and f != os.path.basename(lock_path):
+                    _remove_file(os.path.join(shm_dir, f))
+            logging.info('load dataset to shared memory {}...'.format(os.path.join(shm_dir, name)))
+            if isinstance(dataset, typing.Iterator):
+                write_arena(dataset, name, shm_dir)
+            else:
+                thread = build_arena(dataset, name, shm_dir,
+                                     dataset_fn=dataset_fn,
+                                     num_workers=num_workers,
+                                     with_stream=with_stream)
+        except BaseException:
+            remove_arena(name, shm_dir)
+            raise
+        finally:
+            if thread is None:
+                os.close(fd)
+                _remove_file(lock_path)
+        if thread is not None:
+            threading.Thread(target=_release_after, args=(thread, name, shm_dir, fd, lock_path), daemon=True).start()
+        break
+    return ArenaRandomDataset(name, shm_dir, timeout=timeout)
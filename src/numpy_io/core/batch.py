@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/20 14:10
+# @Author: tk
+# @File：batch
+import typing
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase, ConcatRandomDataset, TopRandomDataset, \
+    SkipRandomDataset, MapRandomDataset, MPRandomDataset, ShuffleIdsRandomDataset, ShuffleRandomDataset
+from fastdatasets.record.random_dataset import SingleRecordRandomDataset
+from .cache import CacheRandomDataset
+from .mixture import MixtureRandomDataset
+from .prefetch import PrefetchRandomDataset
+from .record_index import IndexedRecordRandomDataset
+from .zero_copy import TableNumpyViewRandomDataset
+from .manifest import LazyShardRandomDataset
+from .lazy_import import loaded_attr
+
+__all__ = [
+    'fetch_batch',
+    'stack_batch',
+    'get_batch',
+    'get_shard_sizes',
+]
+
+
+def _check_range(indices: np.ndarray, length: int):
+    if len(indices) and (indices.min() < 0 or indices.max() >= length):
+        raise OverflowError
+
+
+def _fetch_kv(dataset, indices: np.ndarray) -> typing.List:
+    # 去重 , 按键字典序读取
+    if dataset.file_reader_ is None:
+        raise OverflowError
+    _check_range(indices, len(dataset))
+    uniq, inverse = np.unique(indices, return_inverse=True)
+    values = [None] * len(uniq)
+    for k in dataset.data_key_prefix_list:
+        keys = ['{}{}'.format(k, i) for i in uniq]
+        for j in sorted(range(len(keys)), key=keys.__getitem__):
+            value = dataset.file_reader_.get(keys[j])
+            assert value is not None, 'missing key ' + keys[j]
+            if values[j] is None:
+                values[j] = {}
+            values[j][keys[j]] = value
+    return [values[j] for j in inverse]
+
+
+def _fetch_record(dataset, indices: np.ndarray) -> typing.List:
+    # 去重 , 按文件偏移升序读取
+    if dataset.file_reader_ is None:
+        raise OverflowError
+    _check_range(indices, len(dataset))
+    uniq, inverse = np.unique(indices, return_inverse=True)
+    reader = dataset.get_reader() if isinstance(dataset, IndexedRecordRandomDataset) else dataset.file_reader_
+    if isinstance(dataset.indexes, np.ndarray):
+        offsets = np.asarray(dataset.indexes[uniq, 0], dtype=np.int64)
+    else:
+        offsets = np.asarray([dataset.indexes[i][0] for i in uniq], dtype=np.int64)
+    values = [None] * len(uniq)
+    for j in np.argsort(offsets, kind='stable'):
+        values[j], _ = reader.read(int(offsets[j]))
+    return [values[j] for j in inverse]
+
+
+def _fetch_parts(parts: typing.List, indices: np.ndarray) -> typing.List:
+    lengths = np.asarray([len(d) for d in parts], dtype=np.int64)
+    cumsum = np.cumsum(lengths)
+    _check_range(indices, int(cumsum[-1]) if len(cumsum) else 0)
+    part_ids = np.searchsorted(cumsum, indices, side='right')
+    local = indices - (cumsum - lengths)[part_ids]
+    out = [None] * len(indices)
+    for p in np.unique(part_ids):
+        pos = np.nonzero(part_ids == p)[0]
+        for i, x in zip(pos, fetch_batch(parts[p], local[pos])):
+            out[i] = x
+    return out
+
+
+def _fetch_cache(dataset: CacheRandomDataset, indices: np.ndarray) -> typing.List:
+    out = [None] * len(indices)
+    miss_pos = []
+    for pos, item in enumerate(indices.tolist()):
+        node = dataset.lookup(item)
+        if node is None:
+            miss_pos.append(pos)
+        else:
+            out[pos] = node
+    if miss_pos:
+        xs = fetch_batch(dataset.dataset, indices[miss_pos])
+        for pos, x in zip(miss_pos, xs):
+            out[pos] = x
+            dataset.insert(int(indices[pos]), x)
+    return out
+
+
+def _fetch_mixture(dataset: MixtureRandomDataset, indices: np.ndarray) -> typing.List:
+    _check_range(indices, len(dataset))
+    sources, local = dataset.locate_many(indices)
+    out = [None] * len(indices)
+    for k in np.unique(sources):
+        pos = np.nonzero(sources == k)[0]
+        for i, x in zip(pos, fetch_batch(dataset.datasets[k], local[pos])):
+            out[i] = x
+    return out
+
+
+def _fetch_lazy_shards(dataset: LazyShardRandomDataset, indices: np.ndarray) -> typing.List:
+    # 只打开本 batch 涉及的分片
+    _check_range(indices, len(dataset))
+    shard_ids, local = dataset.locate_many(indices)
+    out = [None] * len(indices)
+    for k in np.unique(shard_ids):
+        pos = np.nonzero(shard_ids == k)[0]
+        for i, x in zip(pos, fetch_batch(dataset.get_shard(int(k)), local[pos])):
+            out[i] = x
+    return out
+
+
+def _is_kv_dataset(dataset) -> bool:
+    # leveldb , lmdb 未导入时不会有对应数据集 , 不为判断类型而导入
+    for module_name, attr in (('fastdatasets.lmdb.random_dataset', 'SingleLmdbRandomDataset'),
+                              ('fastdatasets.leveldb.random_dataset', 'SingleLeveldbRandomDataset')):
+        cls = loaded_attr(module_name, attr)
+        if cls is not None and isinstance(dataset, cls):
+            return True
+    return False
+
+
+def _shuffle_ids(dataset: ShuffleRandomDataset, indices: np.ndarray) -> np.ndarray:
+    if dataset.buffer_size <= 0:
+        return indices
+    start = indices // dataset.buffer_size
+    offset = indices % dataset.buffer_size
+    last = start == dataset.last_buffer_id
+    offset[~last] = np.asarray(dataset.buffer, dtype=np.int64)[offset[~last]]
+    if last.any():
+        offset[last] = np.asarray(dataset.buffer2, dtype=np.int64)[offset[last]]
+    return start * dataset.buffer_size + offset
+
+
+def fetch_batch(dataset: RandomDatasetBase, indices: typing.Union[typing.Sequence[int], np.ndarray]) -> typing.List:
+    '''
+        按下标批量读取 , 返回与 indices 顺序一致的数据列表
+        键值数据库按键排序读取 , record 按文件偏移排序读取 , 重复下标只读取一次
+        未识别的数据集逐条 __getitem__
+    '''
+    indices = np.asarray(indices, dtype=np.int64).reshape(-1)
+    if len(indices) == 0:
+        return []
+    if isinstance(dataset, PrefetchRandomDataset):
+        return dataset.get_many(indices)
+    if isinstance(dataset, CacheRandomDataset):
+        return _fetch_cache(dataset, indices)
+    if isinstance(dataset, MapRandomDataset):
+        xs = fetch_batch(dataset.dataset, indices)
+        if dataset.transform_fn:
+            xs = [dataset.transform_fn(x) for x in xs]
+        return xs
+    if isinstance(dataset, TopRandomDataset):
+        _check_range(indices, len(dataset))
+        return fetch_batch(dataset.dataset, indices)
+    if isinstance(dataset, SkipRandomDataset):
+        _check_range(indices, len(dataset))
+        return fetch_batch(dataset.dataset, indices + dataset.n)
+    if isinstance(dataset, MPRandomDataset):
+        _check_range(indices, len(dataset))
+        return fetch_batch(dataset.dataset, indices * dataset.process_num + dataset.process_id)
+    if isinstance(dataset, ShuffleIdsRandomDataset):
+        _check_range(indices, len(dataset))
+        return fetch_batch(dataset.dataset, np.asarray(dataset.shuffle_idx, dtype=np.int64)[indices])
+    if isinstance(dataset, ShuffleRandomDataset):
+        _check_range(indices, len(dataset))
+        return fetch_batch(dataset.dataset, _shuffle_ids(dataset, indices))
+    if isinstance(dataset, ConcatRandomDataset):
+        return _fetch_parts(dataset.all_dataset_list, indices)
+    if isinstance(dataset, MixtureRandomDataset):
+        return _fetch_mixture(dataset, indices)
+    if isinstance(dataset, LazyShardRandomDataset):
+        return _fetch_lazy_shards(dataset, indices)
+    if _is_kv_dataset(dataset):
+        return _fetch_kv(dataset, indices)
+    if isinstance(dataset, SingleRecordRandomDataset):
+        return _fetch_record(dataset, indices)
+    if hasattr(dataset, 'iterators_') and all('inst' in it_obj for it_obj in dataset.iterators_):
+        # Multi*RandomDataset
+        return _fetch_parts([it_obj['inst'] for it_obj in dataset.iterators_], indices)
+    return [dataset[i] for i in indices.tolist()]
+
+
+def _stack(values: typing.List):
+    v0 = values[0]
+    if isinstance(v0, np.ndarray):
+        if all(isinstance(v, np.ndarray) and v.shape == v0.shape and v.dtype == v0.dtype for v in values):
+            return np.stack(values)
+        return values
+    if isinstance(v0, (bool, int, float, np.generic)):
+        return np.asarray(values)
+    return values
+
+
+def stack_batch(samples: typing.List) -> typing.Union[typing.Dict, typing.List]:
+    '''
+        dict 数据按键堆叠 , 同形状 numpy 数组 stack , 标量转为数组 , 变长数据保留为 list
+    '''
+    if not samples or not isinstance(samples[0], dict):
+        return samples
+    return {k: _stack([s[k] for s in samples]) for k in samples[0]}
+
+
+def get_batch(dataset: RandomDatasetBase,
+              indices: typing.Union[typing.Sequence[int], np.ndarray],
+              with_stack: bool = True) -> typing.Union[typing.Dict, typing.List]:
+    '''
+        dataset: load_numpy_dataset 返回的随机读数据集
+        indices: 数据下标
+        with_stack: 按键堆叠为 numpy 数组
+    '''
+    samples = fetch_batch(dataset, indices)
+    return stack_batch(samples) if with_stack else samples
+
+
+def get_shard_sizes(dataset) -> typing.List[int]:
+    '''
+        数据集按底层文件划分的连续下标区间条数 , 和为 len(dataset)
+        打乱或按进程切分后下标不再连续 , 视为一个分片
+    '''
+    if not isinstance(dataset, RandomDatasetBase) and hasattr(dataset, 'dataset'):
+        return get_shard_sizes(dataset.dataset)
+    if isinstance(dataset, (PrefetchRandomDataset, CacheRandomDataset, MapRandomDataset, TableNumpyViewRandomDataset)):
+        return get_shard_sizes(dataset.dataset)
+    if isinstance(dataset, TopRandomDataset):
+        sizes, left = [], len(dataset)
+        for n in get_shard_sizes(dataset.dataset):
+            if left <= 0:
+                break
+            sizes.append(min(n, left))
+            left -= sizes[-1]
+        return sizes
+    if isinstance(dataset, SkipRandomDataset):
+        sizes, skip = [], dataset.n
+        for n in get_shard_sizes(dataset.dataset):
+            if skip >= n:
+                skip -= n
+                continue
+            sizes.append(n - skip)
+            skip = 0
+        return sizes
+    if isinstance(dataset, ConcatRandomDataset):
+        return [n for d in dataset.all_dataset_list for n in get_shard_sizes(d)]
+    if isinstance(dataset, LazyShardRandomDataset):
+        return list(dataset.counts)
+    if hasattr(dataset, 'iterators_') and all('inst' in it_obj for it_obj in dataset.iterators_):
+        return [len(it_obj['inst']) for it_obj in dataset.iterators_]
+    return [len(dataset)]
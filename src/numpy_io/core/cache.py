@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/20 11:30
+# @Author: tk
+# @File：cache
+import sys
+import threading
+import typing
+from collections import OrderedDict
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase
+
+__all__ = [
+    'sizeof_sample',
+    'CacheRandomDataset',
+]
+
+
+def sizeof_sample(x) -> int:
+    if isinstance(x, np.ndarray):
+        return x.nbytes
+    if isinstance(x, (bytes, bytearray, str)):
+        return len(x)
+    if isinstance(x, dict):
+        return sum(sizeof_sample(v) for v in x.values()) + 64
+    if isinstance(x, (list, tuple)):
+        return sum(sizeof_sample(v) for v in x) + 64
+    return sys.getsizeof(x)
+
+
+class CacheRandomDataset(RandomDatasetBase):
+    '''
+        解码后数据 LRU 缓存 , 按字节预算淘汰
+        DataLoader 每个 worker 进程各自持有一份缓存 , 配合 persistent_workers 跨 epoch 复用
+        缓存返回同一对象 , 不要原地修改返回的 numpy 数据
+    '''
+    def __init__(self, dataset, max_bytes: int):
+        assert max_bytes > 0
+        self.dataset = dataset
+        self.max_bytes = max_bytes
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cached_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def reset(self):
+        self.clear()
+        if self.dataset:
+            self.dataset.close()
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.cached_bytes = 0
+
+    def stats(self) -> typing.Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'num_items': len(self._cache),
+            'cached_bytes': self.cached_bytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def lookup(self, item):
+        with self._lock:
+            node = self._cache.get(item)
+            if node is None:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(item)
+            self.hits += 1
+            return node[0]
+
+    def insert(self, item, x):
+        size = sizeof_sample(x)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if item in self._cache:
+                return
+            while self.cached_bytes + size > self.max_bytes:
+                _, (_, evict_size) = self._cache.popitem(last=False)
+                self.cached_bytes -= evict_size
+            self._cache[item] = (x, size)
+            self.cached_bytes += size
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+
+        x = self.lookup(item)
+        if x is None:
+            x = self.dataset[item]
+            self.insert(item, x)
+        return x
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/19 10:12
+# @Author: tk
+# @File：converter
+import argparse
+import json
+import logging
+import typing
+import numpy as np
+from fastdatasets.common.writer import deserialize_numpy
+from .numpyadapter import E_file_backend, NumpyReaderAdapter, ParallelNumpyWriter
+from .parallel import ParallelNode, parallel_apply
+from .manifest import get_manifest_path, write_manifest
+
+__all__ = [
+    'convert_dataset',
+    'count_records',
+    'infer_table_schema',
+    'main'
+]
+
+# 表格类型后端
+TABLE_BACKENDS = (E_file_backend.arrow_stream, E_file_backend.arrow_file, E_file_backend.parquet)
+
+
+def _to_backend(backend: typing.Union[E_file_backend, str]) -> E_file_backend:
+    data_backend = backend if isinstance(backend, E_file_backend) else E_file_backend.from_string(backend)
+    if data_backend is None:
+        raise ValueError('no support backend={}'.format(backend))
+    return data_backend
+
+
+def _open_source(input_files, backend: E_file_backend, options=None, **kwargs):
+    # 表格类型随机读会整表载入内存 , 使用迭代器读取
+    return NumpyReaderAdapter.load(input_files, backend, options,
+                                   with_record_iterable_dataset=backend in TABLE_BACKENDS,
+                                   with_parse_from_numpy=False,
+                                   **kwargs)
+
+
+def _decode_sample(x, with_parse_from_numpy: bool, is_table: bool):
+    if with_parse_from_numpy:
+        if isinstance(x, dict):
+            x = list(x.values())[0]
+        elif isinstance(x, tuple):
+            x = x[1]
+        x = deserialize_numpy(x)
+    if is_table:
+        return x
+    node = {}
+    for k, v in x.items():
+        if not isinstance(v, np.ndarray):
+            v = np.asarray(v)
+        if v.dtype.kind == 'U':
+            v = np.char.encode(v, 'utf-8')
+        node[k] = v
+    return node
+
+
+def _convert_input_fn(x, user_data: tuple):
+    with_parse_from_numpy, is_table = user_data
+    return _decode_sample(x, with_parse_from_numpy, is_table)
+
+
+def infer_table_schema(sample: typing.Dict) -> typing.Dict:
+    '''
+        sample: 解码后的一条数据
+        return: arrow / parquet 写入 schema , 如 {'input_ids': 'int32_list'}
+    '''
+    schema = {}
+    for k, v in sample.items():
+        v = np.asarray(v)
+        if v.dtype.kind in ('i', 'u', 'f'):
+            name = v.dtype.name
+        elif v.dtype.kind == 'b':
+            name = 'int8'
+        elif v.dtype.kind == 'S':
+            name = 'binary'
+        elif v.dtype.kind == 'U':
+            name = 'str'
+        else:
+            raise ValueError('infer_table_schema: no support dtype', k, v.dtype)
+        schema[k] = name + '_list' if v.ndim > 0 else name
+    return schema
+
+
+class _ShardWriterNode(ParallelNode):
+    '''
+        源数据只读取一遍 , 输入为 (shard_id, x) , 解码后分发给对应分片的 ParallelNumpyWriter
+    '''
+    def __init__(self, writers: typing.List[ParallelNumpyWriter], input_hook_fn: typing.Callable, fn_args, **kwargs):
+        ParallelNode.__init__(self, **kwargs)
+        self.writers = writers
+        self.input_hook_fn = input_hook_fn
+        self.fn_args = fn_args
+
+    # 继承
+    def on_input_process(self, x):
+        shard_id, x = x
+        return shard_id, self.input_hook_fn(x, self.fn_args)
+
+    # 继承
+    def on_output_startup(self):
+        for writer in self.writers:
+            writer.on_output_startup()
+
+    # 继承
+    def on_output_process(self, x):
+        # 生产进程结束标记
+        if x is None:
+            return
+        shard_id, x = x
+        self.writers[shard_id].on_output_process(x)
+
+    # 继承
+    def on_output_cleanup(self):
+        for writer in self.writers:
+            writer.on_output_cleanup()
+
+
+def _iter_shards(dataset, is_iterable: bool, num_shards: int, counts: typing.List[int]):
+    # 迭代数据集按条轮流分配 , 随机数据集按连续区间分配 , 同时统计各分片条数
+    if is_iterable:
+        for i, x in enumerate(dataset):
+            shard_id = i % num_shards
+            counts[shard_id] += 1
+            yield shard_id, x
+    else:
+        total = len(dataset)
+        for shard_id in range(num_shards):
+            for i in range(total * shard_id // num_shards, total * (shard_id + 1) // num_shards):
+                counts[shard_id] += 1
+                yield shard_id, dataset[i]
+
+
+def count_records(files: typing.Union[typing.List, str],
+                  backend: typing.Union[E_file_backend, str],
+                  options=None,
+                  **kwargs):
+    '''
+        统计数据条数 , arrow_stream 流式读取计数 , 其他后端读取索引或 total_num
+        kwargs: NumpyReaderAdapter.load 其他参数 , 如 data_key_prefix_list , num_key
+    '''
+    data_backend = _to_backend(backend)
+    if data_backend == E_file_backend.arrow_stream:
+        dataset = NumpyReaderAdapter.load(files, data_backend, options, with_parse_from_numpy=False, **kwargs)
+        return sum(1 for _ in dataset)
+    dataset = NumpyReaderAdapter.load(files, data_backend, options,
+                                      with_record_iterable_dataset=False,
+                                      with_parse_from_numpy=False,
+                                      **kwargs)
+    return len(dataset)
+
+
+def _shard_outputs(output_files, data_backend: E_file_backend, num_shards: typing.Optional[int]):
+    if data_backend in (E_file_backend.memory, E_file_backend.memory_raw):
+        return [output_files]
+    if isinstance(output_files, str):
+        if num_shards is None or num_shards <= 1:
+            return [output_files]
+        return ['{}-{:05d}-of-{:05d}'.format(output_files, i, num_shards) for i in range(num_shards)]
+    if num_shards is not None and num_shards != len(output_files):
+        raise ValueError('num_shards={} mismatch output files {}'.format(num_shards, len(output_files)))
+    return list(output_files)
+
+
+def convert_dataset(input_files: typing.Union[typing.List, str],
+                    input_backend: typing.Union[E_file_backend, str],
+                    output_files: typing.Union[typing.List, str],
+                    output_backend: typing.Union[E_file_backend, str],
+                    num_shards: typing.Optional[int] = None,
+                    num_process_worker: int = 4,
+                    input_options=None,
+                    output_options=None,
+                    parquet_options: typing.Optional = None,
+                    schema: typing.Optional[typing.Dict] = None,
+                    batch_size=None,
+                    verify: bool = True,
+                    with_manifest: bool = True,
+                    manifest_file: typing.Optional[str] = None,
+                    **kwargs) -> typing.List:
+    '''
+        input_files: 源文件列表
+        input_backend: 源存储引擎类型
+        output_files: 目标文件 , 字符串且 num_shards > 1 时生成 {output}-00000-of-0000N 分片
+        output_backend: 目标存储引擎类型
+        num_shards: 目标分片数 , 源数据只读取一遍 , 迭代读取时按条轮流写入各分片 , 随机读取时按连续区间
+        num_process_worker: 解码 / 编码进程数
+        schema: 目标为 arrow / parquet 时的 schema , 为空时按第一条数据推断
+        verify: 转换完成后校验数据条数
+        with_manifest: 写入数据集清单 , 默认 {output}.manifest.json , 见 manifest.write_manifest
+        kwargs: NumpyReaderAdapter.load 其他参数 , 如 data_key_prefix_list , num_key
+        return: 输出分片列表
+    '''
+    src_backend = _to_backend(input_backend)
+    dst_backend = _to_backend(output_backend)
+    with_parse_from_numpy = src_backend not in TABLE_BACKENDS and src_backend != E_file_backend.memory_raw
+    is_table = dst_backend in TABLE_BACKENDS
+
+    dataset = _open_source(input_files, src_backend, input_options, **kwargs)
+    is_iterable = isinstance(dataset, typing.Iterator)
+
+    if is_table and schema is None:
+        first = next(iter(dataset)) if is_iterable else dataset[0]
+        schema = infer_table_schema(_decode_sample(first, with_parse_from_numpy, True))
+        if is_iterable:
+            dataset.reset()
+
+    outputs = _shard_outputs(output_files, dst_backend, num_shards)
+    # 所有分片同时打开 , 源数据只读取一遍
+    writers = []
+    for outfile in outputs:
+        parallel_writer = ParallelNumpyWriter(num_process_worker=num_process_worker, shuffle=False)
+        parallel_writer.open(outfile, dst_backend.name,
+                             options=output_options,
+                             parquet_options=parquet_options,
+                             schema=schema,
+                             batch_size=batch_size,
+                             with_manifest=False)
+        if batch_size is not None and batch_size > 0:
+            parallel_writer.write_batch_size = batch_size
+        parallel_writer.write_batch_size = max(parallel_writer.write_batch_size, 1)
+        if num_process_worker > 0:
+            # 写进程中重新打开 , 见 ParallelNumpyWriter.write
+            parallel_writer.numpy_writer.abort()
+        writers.append(parallel_writer)
+
+    shard_counts = [0] * len(outputs)
+    node = _ShardWriterNode(writers, _convert_input_fn, (with_parse_from_numpy, is_table),
+                            num_process_worker=num_process_worker,
+                            shuffle=False,
+                            desc='convert')
+    parallel_apply(_iter_shards(dataset, is_iterable, len(outputs), shard_counts), node)
+    num_written = sum(shard_counts)
+    for shard_id, outfile in enumerate(outputs):
+        logging.info('convert shard {} {} records'.format(outfile if isinstance(outfile, str) else shard_id,
+                                                          shard_counts[shard_id]))
+
+    if verify:
+        num_output = sum(count_records(f, dst_backend, output_options) for f in outputs)
+        if num_output != num_written:
+            raise ValueError('convert_dataset: output has {} records , expect {}'.format(num_output, num_written))
+    if with_manifest and dst_backend not in (E_file_backend.memory, E_file_backend.memory_raw):
+        write_manifest(manifest_file or get_manifest_path(output_files), outputs, dst_backend.name,
+                       counts=shard_counts, schema=schema, options=output_options)
+    return outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='numpy_io backend converter')
+    parser.add_argument('--input', nargs='+', required=True, help='input files')
+    parser.add_argument('--input_backend', required=True, help='record,leveldb,lmdb,arrow_stream,arrow_file,parquet')
+    parser.add_argument('--output', required=True, help='output file or shard prefix')
+    parser.add_argument('--output_backend', required=True, help='record,leveldb,lmdb,arrow_stream,arrow_file,parquet')
+    parser.add_argument('--num_shards', type=int, default=None)
+    parser.add_argument('--num_process_worker', type=int, default=4)
+    parser.add_argument('--batch_size', type=int, default=None)
+    parser.add_argument('--schema', default=None, help='json schema for arrow / parquet output')
+    parser.add_argument('--no_verify', action='store_true')
+    parser.add_argument('--no_manifest', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    outputs = convert_dataset(args.input if len(args.input) > 1 else args.input[0],
+                              args.input_backend,
+                              args.output,
+                              args.output_backend,
+                              num_shards=args.num_shards,
+                              num_process_worker=args.num_process_worker,
+                              schema=json.loads(args.schema) if args.schema else None,
+                              batch_size=args.batch_size,
+                              verify=not args.no_verify,
+                              with_manifest=not args.no_manifest)
+    for f in outputs:
+        print(f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/23 9:20
+# @Author: tk
+# @File：corpus
+import bz2
+import gzip
+import io
+import lzma
+import mmap
+import os
+import re
+import typing
+from multiprocessing import Pool
+
+__all__ = [
+    'open_binary',
+    'iter_lines',
+    'count_lines',
+    'CorpusLines',
+]
+
+DEFAULT_BLOCK_SIZE = 16 * 1024 * 1024
+
+# 去掉块末尾换行后的空行 , 空行不计入条数
+_EMPTY_LINE = re.compile(rb'^\r?$', re.M)
+
+
+def open_binary(filename: str):
+    '''
+        按后缀打开 , .gz .bz2 .xz 使用标准库解压 , .zst 需要 zstandard , 其余文件 mmap 只读映射
+        返回对象支持 read(n) 与 close
+    '''
+    if filename.endswith('.gz'):
+        return gzip.open(filename, 'rb')
+    if filename.endswith('.bz2'):
+        return bz2.open(filename, 'rb')
+    if filename.endswith('.xz'):
+        return lzma.open(filename, 'rb')
+    if filename.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError('reading {} requires zstandard , pip install zstandard'.format(filename))
+        return zstandard.ZstdDecompressor().stream_reader(open(filename, 'rb'), closefd=True)
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return io.BytesIO()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mm, 'madvise'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+    return mm
+
+
+def _is_compressed(filename: str) -> bool:
+    return filename.endswith(('.gz', '.bz2', '.xz', '.zst'))
+
+
+def _iter_chunks(filename: str, block_size: int, start: int = 0, end: typing.Optional[int] = None):
+    # 按块读取 , 每块在换行处截断 , 保证块内都是完整行
+    # start , end 为未压缩文件字节区间 , 行首在区间内的行属于该区间
+    f = open_binary(filename)
+    try:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline()
+        pos = f.tell() if end is not None else 0
+        rest = b''
+        while end is None or pos < end:
+            n = block_size if end is None else min(block_size, end - pos)
+            block = f.read(n)
+            if not block:
+                break
+            pos += len(block)
+            if end is not None and pos >= end and not block.endswith(b'\n'):
+                block += f.readline()
+            block = rest + block if rest else block
+            k = block.rfind(b'\n')
+            if k < 0:
+                rest = block
+                continue
+            rest = block[k + 1:]
+            yield block[:k + 1]
+        if rest:
+            yield rest + b'\n'
+    finally:
+        f.close()
+
+
+def _chunk_lines(chunk: bytes, encoding: str) -> typing.List[str]:
+    lines = chunk.decode(encoding).split('\n')
+    lines.pop()
+    return [line[:-1] if line.endswith('\r') else line for line in lines if line and line != '\r']
+
+
+def _chunk_count(chunk: bytes) -> int:
+    return chunk.count(b'\n') - sum(1 for _ in _EMPTY_LINE.finditer(chunk, 0, len(chunk) - 1))
+
+
+def iter_lines(filename: str, encoding: str = 'utf-8', block_size: int = DEFAULT_BLOCK_SIZE) -> typing.Iterator[str]:
+    '''
+        逐行读取文本 , 去掉换行符 , 跳过空行 , 每次解码一个块
+    '''
+    for chunk in _iter_chunks(filename, block_size):
+        yield from _chunk_lines(chunk, encoding)
+
+
+def count_lines(filename: str, block_size: int = DEFAULT_BLOCK_SIZE) -> int:
+    '''
+        非空行数 , 与 iter_lines 条数一致 , 压缩文件需要完整解压一遍
+    '''
+    return sum(_chunk_count(chunk) for chunk in _iter_chunks(filename, block_size))
+
+
+def _read_task(task) -> typing.List[str]:
+    filename, start, end, encoding, block_size = task
+    lines = []
+    for chunk in _iter_chunks(filename, block_size, start, end):
+        lines.extend(_chunk_lines(chunk, encoding))
+    return lines
+
+
+def _count_task(task) -> int:
+    filename, start, end, _, block_size = task
+    return sum(_chunk_count(chunk) for chunk in _iter_chunks(filename, block_size, start, end))
+
+
+class CorpusLines:
+    '''
+        多个文本文件按顺序逐行迭代 , 不整体读入内存 , 可多次迭代
+        num_workers: 大于 0 时多进程读取 , 未压缩文件按 task_size 字节切分 , 压缩文件一个文件一个任务 , 输出顺序与单进程一致
+        max_pending: 多进程时最多在途任务数 , 默认 2 * num_workers , 限制内存
+        len() 为非空行数 , 第一次调用时统计并缓存 , 可用于 parallel_apply 显示进度
+    '''
+    def __init__(self,
+                 files: typing.Union[typing.List[str], str],
+                 encoding: str = 'utf-8',
+                 block_size: int = DEFAULT_BLOCK_SIZE,
+                 num_workers: int = 0,
+                 task_size: int = 4 * DEFAULT_BLOCK_SIZE,
+                 max_pending: typing.Optional[int] = None):
+        self.files = [files] if isinstance(files, str) else list(files)
+        self.encoding = encoding
+        self.block_size = block_size
+        self.num_workers = num_workers
+        self.task_size = task_size
+        self.max_pending = max_pending or 2 * max(num_workers, 1)
+        self._length = None
+
+    def _tasks(self) -> typing.List[typing.Tuple]:
+        tasks = []
+        for filename in self.files:
+            size = os.path.getsize(filename)
+            if _is_compressed(filename) or size <= self.task_size:
+                tasks.append((filename, 0, None, self.encoding, self.block_size))
+                continue
+            for start in range(0, size, self.task_size):
+                tasks.append((filename, start, min(start + self.task_size, size), self.encoding, self.block_size))
+        return tasks
+
+    def _map(self, fn, tasks):
+        # 按任务顺序返回 , 在途任务不超过 max_pending
+        with Pool(min(self.num_workers, len(tasks))) as pool:
+            pending = []
+            for task in tasks:
+                pending.append(pool.apply_async(fn, (task,)))
+                if len(pending) >= self.max_pending:
+                    yield pending.pop(0).get()
+            while pending:
+                yield pending.pop(0).get()
+
+    def __iter__(self) -> typing.Iterator[str]:
+        if self.num_workers > 0 and self.files:
+            for lines in self._map(_read_task, self._tasks()):
+                yield from lines
+        else:
+            for filename in self.files:
+                yield from iter_lines(filename, self.encoding, self.block_size)
+
+    def __len__(self):
+        if self._length is None:
+            if self.num_workers > 0 and self.files:
+                self._length = sum(self._map(_count_task, self._tasks()))
+            else:
+                self._length = sum(count_lines(filename, self.block_size) for filename in self.files)
+        return self._length
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/22 16:30
+# @Author: tk
+# @File：iterable_shard
+import typing
+from fastdatasets.common.iterable_dataset import IterableDatasetBase, SkipIterableDataset, TopRandomDataset, \
+    ChoiseIterableDataset, IntervalIterableDataset, BatchIterableDataset, UnBatchIterableDataset
+from .resumable import ResumableIterableDataset
+from .stream_shuffle import HierarchicalShuffleIterableDataset
+
+__all__ = [
+    'shard_iterable_dataset',
+]
+
+# 与上游条目顺序相关的包装 , 切分只能在其之上进行
+_ORDER_SENSITIVE = (SkipIterableDataset, TopRandomDataset, ChoiseIterableDataset, IntervalIterableDataset,
+                    BatchIterableDataset, UnBatchIterableDataset)
+
+_FILE_SHARD_DATASETS = (ResumableIterableDataset, HierarchicalShuffleIterableDataset)
+
+
+def _chain(dataset) -> typing.List:
+    nodes = [dataset]
+    while isinstance(nodes[-1], IterableDatasetBase) and getattr(nodes[-1], 'dataset', None) is not None:
+        nodes.append(nodes[-1].dataset)
+    return nodes
+
+
+def shard_iterable_dataset(dataset: IterableDatasetBase, num_shards: int, shard_id: int,
+                           with_file_shard: bool = False) -> IterableDatasetBase:
+    '''
+        迭代数据集切分为 num_shards 份 , 返回第 shard_id 份 , 包装链原地修改
+        with_file_shard: 底层为多文件顺序读取且文件数不少于份数时按文件切分 , 每份只打开自己的文件 ,
+            各份条数取决于文件大小 , 适合 DataLoader worker , 分布式进程间条数需一致时保持默认按条间隔切分
+        否则在底层数据集 (或最深的 skip , limit , mutiprocess 包装) 之上按条间隔切分 , 位于 shuffle , repeat , map 之下
+        可多次调用组合切分 , 例如先按进程再按 DataLoader worker
+    '''
+    assert 0 <= shard_id < num_shards
+    if num_shards <= 1:
+        return dataset
+    nodes = _chain(dataset)
+    sensitive = [i for i, node in enumerate(nodes) if isinstance(node, _ORDER_SENSITIVE)]
+    base = nodes[-1]
+    if with_file_shard and not sensitive and isinstance(base, _FILE_SHARD_DATASETS) and len(base.path) >= num_shards:
+        base.shard(num_shards, shard_id)
+        return dataset
+    j = sensitive[-1] if sensitive else len(nodes) - 1
+    node = nodes[j].mutiprocess(num_shards, shard_id)
+    if j == 0:
+        return node
+    nodes[j - 1].dataset = node
+    return dataset
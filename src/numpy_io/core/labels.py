@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/23 11:40
+# @Author: tk
+# @File：labels
+import json
+import os
+import typing
+from collections import Counter
+from multiprocessing import Pool
+from .corpus import CorpusLines, DEFAULT_BLOCK_SIZE, _iter_chunks, _chunk_lines
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+__all__ = [
+    'scan_labels',
+    'build_label_vocab',
+]
+
+_COMPRESS_SUFFIXES = ('.gz', '.bz2', '.xz', '.zst')
+
+
+def _is_json_file(filename: str) -> bool:
+    for suffix in _COMPRESS_SUFFIXES:
+        if filename.endswith(suffix):
+            filename = filename[:-len(suffix)]
+            break
+    return filename.endswith(('.json', '.jsonl'))
+
+
+def _scan_task(task) -> Counter:
+    filename, start, end, encoding, block_size, label_key = task
+    counter = Counter()
+    is_json = _is_json_file(filename)
+    for chunk in _iter_chunks(filename, block_size, start, end):
+        lines = _chunk_lines(chunk, encoding)
+        if is_json:
+            counter.update(_json_loads(line)[label_key] for line in lines)
+        else:
+            counter.update(lines)
+    return counter
+
+
+def scan_labels(files: typing.Union[typing.List[str], str],
+                label_key: str = 'label',
+                num_workers: int = 0,
+                encoding: str = 'utf-8',
+                block_size: int = DEFAULT_BLOCK_SIZE,
+                task_size: int = 4 * DEFAULT_BLOCK_SIZE) -> Counter:
+    '''
+        统计所有标签文件的标签频次 , .json .jsonl 每行一个 json 取 label_key , 其余文件每行一个标签
+        num_workers: 大于 0 时按 CorpusLines 任务切分多进程统计后合并
+        安装 orjson 时使用 orjson 解析
+    '''
+    tasks = [task + (label_key,) for task in
+             CorpusLines(files, encoding=encoding, block_size=block_size, task_size=task_size)._tasks()]
+    counter = Counter()
+    if num_workers > 0 and len(tasks) > 1:
+        with Pool(min(num_workers, len(tasks))) as pool:
+            for c in pool.imap_unordered(_scan_task, tasks):
+                counter.update(c)
+    else:
+        for task in tasks:
+            counter.update(_scan_task(task))
+    return counter
+
+
+def _files_info(files: typing.List[str]) -> typing.List[typing.Dict]:
+    return [{'file': os.path.abspath(f), 'size': os.path.getsize(f), 'mtime': os.path.getmtime(f)} for f in files]
+
+
+def build_label_vocab(files: typing.Union[typing.List[str], str],
+                      label_key: str = 'label',
+                      cache_file: typing.Optional[str] = None,
+                      num_workers: int = 0,
+                      **kwargs) -> typing.Tuple[typing.Dict, typing.Dict]:
+    '''
+        标签按频次从高到低编号 , 频次相同按标签字符串排序 , 不同进程结果一致
+        cache_file: 标签缓存文件 , 标签文件大小与修改时间不变时直接读取 , 不再扫描
+        kwargs: 见 scan_labels
+        return: label2id , id2label
+    '''
+    files = [files] if isinstance(files, str) else list(files)
+    info = {'label_key': label_key, 'files': _files_info(files)}
+    labels = None
+    if cache_file is not None and os.path.exists(cache_file):
+        with open(cache_file, mode='r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('label_key') == info['label_key'] and cache.get('files') == info['files']:
+            labels = [label for label, _ in cache['labels']]
+
+    if labels is None:
+        counter = scan_labels(files, label_key=label_key, num_workers=num_workers, **kwargs)
+        items = sorted(counter.items(), key=lambda x: (-x[1], str(x[0])))
+        labels = [label for label, _ in items]
+        if cache_file is not None:
+            with open(cache_file + '.tmp', mode='w', encoding='utf-8') as f:
+                json.dump({**info, 'labels': items}, f, ensure_ascii=False, indent=1)
+            os.replace(cache_file + '.tmp', cache_file)
+
+    label2id = {label: i for i, label in enumerate(labels)}
+    id2label = {i: label for i, label in enumerate(labels)}
+    return label2id, id2label
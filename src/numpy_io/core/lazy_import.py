@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/22 21:00
+# @Author: tk
+# @File：lazy_import
+import importlib
+import sys
+import typing
+
+__all__ = [
+    'LazyModule',
+    'loaded_attr',
+]
+
+
+class LazyModule:
+    '''
+        第一次访问属性时才导入 , 代替模块级 from module import attr
+        module_name: 模块名
+        attr: 模块属性 , 为空时代理模块本身
+    '''
+    def __init__(self, module_name: str, attr: typing.Optional[str] = None):
+        self._module_name = module_name
+        self._attr = attr
+        self._target = None
+
+    def _load(self):
+        if self._target is None:
+            module = importlib.import_module(self._module_name)
+            self._target = module if self._attr is None else getattr(module, self._attr)
+        return self._target
+
+    def __getattr__(self, item):
+        if item.startswith('__') or item in ('_module_name', '_attr', '_target'):
+            raise AttributeError(item)
+        return getattr(self._load(), item)
+
+    def __repr__(self):
+        return '<LazyModule {}{}>'.format(self._module_name, '.' + self._attr if self._attr else '')
+
+
+def loaded_attr(module_name: str, attr: str):
+    '''
+        模块已导入时返回其属性 , 未导入返回 None , 用于 isinstance 判断时不触发导入
+    '''
+    module = sys.modules.get(module_name)
+    return getattr(module, attr, None) if module is not None else None
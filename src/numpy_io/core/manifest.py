@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/22 19:10
+# @Author: tk
+# @File：manifest
+import json
+import os
+import time
+import typing
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase
+from fastdatasets.record import RECORD
+from .marker import read_done_marker, _data_files, _checksum
+from .numpyadapter import NumpyReaderAdapter
+
+__all__ = [
+    'MANIFEST_SUFFIX',
+    'get_manifest_path',
+    'is_manifest_file',
+    'DatasetManifest',
+    'write_manifest',
+    'read_manifest',
+    'LazyShardRandomDataset',
+]
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def get_manifest_path(output_files: typing.Union[typing.List[str], str]) -> str:
+    '''
+        分片输出的清单路径 , 字符串为 {output}.manifest.json , 列表按第一个分片
+    '''
+    prefix = output_files if isinstance(output_files, str) else output_files[0]
+    return prefix + MANIFEST_SUFFIX
+
+
+def is_manifest_file(files) -> bool:
+    return isinstance(files, DatasetManifest) or (isinstance(files, str) and files.endswith(MANIFEST_SUFFIX))
+
+
+class DatasetManifest:
+    '''
+        数据集清单 : 后端 , 分片文件 , 每个分片条数 , 字节数 , 校验和 , 表格 schema
+        path 为清单文件路径 , files 为绝对路径
+    '''
+    def __init__(self,
+                 backend: str,
+                 files: typing.List[str],
+                 counts: typing.List[int],
+                 sizes: typing.Optional[typing.List[typing.Optional[int]]] = None,
+                 checksums: typing.Optional[typing.List[typing.Optional[str]]] = None,
+                 schema: typing.Optional[typing.Dict] = None,
+                 options: typing.Optional[typing.Dict] = None,
+                 path: typing.Optional[str] = None):
+        assert len(files) == len(counts)
+        self.backend = backend
+        self.files = list(files)
+        self.counts = [int(n) for n in counts]
+        self.sizes = list(sizes) if sizes is not None else [None] * len(files)
+        self.checksums = list(checksums) if checksums is not None else [None] * len(files)
+        self.schema = schema
+        self.options = options or {}
+        self.path = path
+
+    @property
+    def total_num(self) -> int:
+        return sum(self.counts)
+
+    def __len__(self):
+        return self.total_num
+
+    def record_options(self):
+        # record 压缩方式 , 未记录时返回空使用默认 GZIP
+        compression_type = self.options.get('compression_type')
+        if compression_type is None:
+            return None
+        return RECORD.TFRecordOptions(compression_type=compression_type)
+
+    def verify(self, deep: bool = False) -> typing.List[str]:
+        '''
+            校验分片文件大小 , deep 时重新计算校验和
+            return: 不一致的分片
+        '''
+        bad = []
+        for file, size, checksum in zip(self.files, self.sizes, self.checksums):
+            files = _data_files(file) if os.path.exists(file) else []
+            if not files:
+                bad.append(file)
+            elif size is not None and sum(os.path.getsize(f) for f in files) != size:
+                bad.append(file)
+            elif deep and checksum is not None and _checksum(files) != checksum:
+                bad.append(file)
+        return bad
+
+    def to_dict(self) -> typing.Dict:
+        root = os.path.dirname(os.path.abspath(self.path)) if self.path else None
+        shards = []
+        for file, num, size, checksum in zip(self.files, self.counts, self.sizes, self.checksums):
+            if root is not None:
+                rel = os.path.relpath(os.path.abspath(file), root)
+                if not rel.startswith('..'):
+                    file = rel
+            shards.append({'file': file, 'num': num, 'size': size, 'checksum': checksum})
+        return {
+            'version': 1,
+            'backend': self.backend,
+            'total_num': self.total_num,
+            'shards': shards,
+            'schema': self.schema,
+            'options': self.options,
+            'time': int(time.time()),
+        }
+
+
+def _count(file: str, backend: str, options=None) -> int:
+    if backend == 'arrow_stream':
+        dataset = NumpyReaderAdapter.load(file, backend, options, with_record_iterable_dataset=True,
+                                          with_parse_from_numpy=False)
+        return sum(1 for _ in dataset)
+    dataset = NumpyReaderAdapter.load(file, backend, options, with_parse_from_numpy=False)
+    num = len(dataset)
+    dataset.close()
+    return num
+
+
+def write_manifest(manifest_file: str,
+                   files: typing.List[str],
+                   backend: str,
+                   counts: typing.Optional[typing.List[int]] = None,
+                   schema: typing.Optional[typing.Dict] = None,
+                   options=None,
+                   with_checksum: bool = False) -> DatasetManifest:
+    '''
+        写入数据集清单 , 条数 , 大小 , 校验和优先取完成标记 , 缺失时读取文件统计
+        counts: 每个分片条数 , 为空时取完成标记 total_num , 再缺失时打开分片计数
+        options: 读取选项 , record 记录压缩方式
+        with_checksum: 完成标记没有校验和时重新计算
+    '''
+    files = [os.path.abspath(f) for f in files]
+    sizes, checksums, nums = [], [], []
+    for i, file in enumerate(files):
+        info = read_done_marker(file) or {}
+        data_files = _data_files(file)
+        sizes.append(sum(os.path.getsize(f) for f in data_files) if data_files else None)
+        checksum = info.get('checksum')
+        if checksum is None and with_checksum:
+            checksum = _checksum(data_files)
+        checksums.append(checksum)
+        if counts is not None:
+            nums.append(counts[i])
+        elif info.get('total_num') is not None:
+            nums.append(info['total_num'])
+        else:
+            nums.append(_count(file, backend, options))
+    manifest_options = {}
+    compression_type = getattr(options, 'compression_type', None)
+    if backend == 'record':
+        manifest_options['compression_type'] = 'GZIP' if options is None else (compression_type or '')
+    manifest = DatasetManifest(backend, files, nums, sizes=sizes, checksums=checksums, schema=schema,
+                               options=manifest_options, path=manifest_file)
+    with open(manifest_file + '.tmp', mode='w', encoding='utf-8') as f:
+        json.dump(manifest.to_dict(), f, ensure_ascii=False, indent=1)
+    os.replace(manifest_file + '.tmp', manifest_file)
+    return manifest
+
+
+def read_manifest(manifest_file: typing.Union[str, DatasetManifest]) -> DatasetManifest:
+    '''
+        读取清单 , 只读取清单文件本身 , 相对路径按清单所在目录解析
+    '''
+    if isinstance(manifest_file, DatasetManifest):
+        return manifest_file
+    with open(manifest_file, mode='r', encoding='utf-8') as f:
+        info = json.load(f)
+    root = os.path.dirname(os.path.abspath(manifest_file))
+    shards = info['shards']
+    return DatasetManifest(info['backend'],
+                           [os.path.join(root, s['file']) for s in shards],
+                           [s['num'] for s in shards],
+                           sizes=[s.get('size') for s in shards],
+                           checksums=[s.get('checksum') for s in shards],
+                           schema=info.get('schema'),
+                           options=info.get('options'),
+                           path=manifest_file)
+
+
+class LazyShardRandomDataset(RandomDatasetBase):
+    '''
+        按清单条数拼接多个分片 , 长度与下标定位不打开文件 , 分片在第一次访问时打开
+        load_fn: 分片文件 -> 随机数据集
+        序列化时不带已打开分片 , DataLoader worker 各自按需打开
+    '''
+    def __init__(self, files: typing.List[str], counts: typing.List[int], load_fn: typing.Callable):
+        assert len(files) == len(counts)
+        self.files = list(files)
+        self.counts = [int(n) for n in counts]
+        self.load_fn = load_fn
+        self._cumsum = np.cumsum(self.counts, dtype=np.int64)
+        self._shards = [None] * len(self.files)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_shards'] = [None] * len(self.files)
+        return state
+
+    def get_shard(self, k: int):
+        shard = self._shards[k]
+        if shard is None:
+            shard = self.load_fn(self.files[k])
+            if len(shard) != self.counts[k]:
+                raise ValueError('{} has {} records , manifest has {}'.format(self.files[k], len(shard), self.counts[k]))
+            self._shards[k] = shard
+        return shard
+
+    def reset(self):
+        self.close()
+
+    def close(self):
+        for shard in self._shards:
+            if shard is not None:
+                shard.close()
+        self._shards = [None] * len(self.files)
+
+    def __len__(self):
+        return int(self._cumsum[-1]) if len(self._cumsum) else 0
+
+    def locate_many(self, indices: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        shard_ids = np.searchsorted(self._cumsum, indices, side='right')
+        return shard_ids, indices - (self._cumsum - np.asarray(self.counts, dtype=np.int64))[shard_ids]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= len(self):
+            raise OverflowError
+        k = int(np.searchsorted(self._cumsum, item, side='right'))
+        return self.get_shard(k)[item - (int(self._cumsum[k - 1]) if k > 0 else 0)]
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/19 16:20
+# @Author: tk
+# @File：marker
+import json
+import logging
+import os
+import shutil
+import time
+import typing
+import zlib
+
+__all__ = [
+    'get_tmp_path',
+    'get_done_marker_path',
+    'remove_path',
+    'commit_path',
+    'write_done_marker',
+    'read_done_marker',
+    'remove_done_marker',
+    'verify_done_marker',
+]
+
+
+def get_tmp_path(filename: str):
+    return os.path.join(os.path.dirname(filename), '.' + os.path.basename(filename) + '.tmp')
+
+
+def get_done_marker_path(filename: str):
+    return os.path.join(os.path.dirname(filename), '.' + os.path.basename(filename) + '.DONE')
+
+
+def remove_path(filename: str):
+    if os.path.isdir(filename):
+        shutil.rmtree(filename)
+    elif os.path.exists(filename):
+        os.remove(filename)
+
+
+def commit_path(tmp_filename: str, filename: str):
+    '''
+        临时文件原子重命名为目标文件 , 目标存在时先删除
+    '''
+    remove_path(filename)
+    os.replace(tmp_filename, filename)
+
+
+def _data_files(filename: str) -> typing.List[str]:
+    # leveldb 读取时会改写目录内文件 , 不做校验
+    if os.path.isdir(filename):
+        data_file = os.path.join(filename, 'data.mdb')
+        return [data_file] if os.path.exists(data_file) else []
+    return [filename]
+
+
+def _checksum(files: typing.List[str], block_size=1024 * 1024 * 8):
+    if not files:
+        return None
+    crc = 0
+    for file in files:
+        with open(file, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                crc = zlib.crc32(block, crc)
+    return 'crc32:{:08x}'.format(crc & 0xffffffff)
+
+
+def write_done_marker(filename: str, backend: str, total_num: typing.Optional[int] = None):
+    '''
+        写入完成标记 , 记录后端 , 数据条数 , 文件大小 , 校验和
+    '''
+    files = _data_files(filename)
+    info = {
+        'backend': backend,
+        'total_num': total_num,
+        'size': sum(os.path.getsize(f) for f in files) if files else None,
+        'checksum': _checksum(files),
+        'time': int(time.time()),
+    }
+    marker = get_done_marker_path(filename)
+    with open(marker + '.tmp', mode='w', encoding='utf-8') as f:
+        json.dump(info, f)
+    os.replace(marker + '.tmp', marker)
+    return info
+
+
+def read_done_marker(filename: str) -> typing.Optional[typing.Dict]:
+    marker = get_done_marker_path(filename)
+    if not os.path.exists(marker):
+        return None
+    try:
+        with open(marker, mode='r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def remove_done_marker(filename: str):
+    marker = get_done_marker_path(filename)
+    if os.path.exists(marker):
+        os.remove(marker)
+
+
+def verify_done_marker(filename: str, deep=False, require_done_marker=False) -> bool:
+    '''
+        filename: 数据文件
+        deep: 重新计算校验和 , 默认只比较文件大小
+        require_done_marker: 没有完成标记时视为未完成 , 默认 False 时只检查文件存在 ,
+            兼容没有完成标记的旧数据 (atomic=False 写入或早期版本生成)
+    '''
+    if not isinstance(filename, str) or not os.path.exists(filename):
+        return False
+    info = read_done_marker(filename)
+    if info is None:
+        if require_done_marker:
+            return False
+        logging.warning('{} has no commit marker , assume complete , '
+                        'remove it or set require_done_marker=True to rebuild'.format(filename))
+        return True
+    files = _data_files(filename)
+    if info.get('size') is not None:
+        if sum(os.path.getsize(f) for f in files) != info['size']:
+            return False
+    if deep and info.get('checksum') is not None:
+        return _checksum(files) == info['checksum']
+    return True
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/19 14:05
+# @Author: tk
+# @File：merger
+import argparse
+import itertools
+import logging
+import typing
+import numpy as np
+from .numpyadapter import E_file_backend, NumpyReaderAdapter, NumpyWriterAdapter
+from .converter import TABLE_BACKENDS, _to_backend, _shard_outputs, count_records, infer_table_schema
+from .manifest import get_manifest_path, write_manifest
+
+__all__ = [
+    'merge_datasets',
+    'main'
+]
+
+
+def _iter_source(filename, data_backend: E_file_backend, options=None, **kwargs):
+    # record , 表格类型顺序读取 , 键值数据库按下标读取
+    dataset = NumpyReaderAdapter.load(filename, data_backend, options,
+                                      with_record_iterable_dataset=True,
+                                      with_parse_from_numpy=False,
+                                      **kwargs)
+    if isinstance(dataset, typing.Iterator):
+        for x in dataset:
+            yield x
+    else:
+        for i in range(len(dataset)):
+            yield dataset[i]
+    dataset.close()
+
+
+def _interleave(sources: typing.List[typing.Iterator], counts: typing.List[int], shuffle: bool, seed=None):
+    if not shuffle:
+        for source in sources:
+            for x in source:
+                yield x
+        return
+    # 按剩余条数加权随机选择来源 , 每个来源仍然顺序读取
+    rng = np.random.RandomState(seed)
+    remain = np.asarray(counts, dtype=np.int64)
+    total = int(remain.sum())
+    while total > 0:
+        i = int(np.searchsorted(np.cumsum(remain), rng.randint(total), side='right'))
+        remain[i] -= 1
+        total -= 1
+        yield next(sources[i])
+
+
+def _flush(writer: NumpyWriterAdapter, batch: typing.List, num: int, data_key_prefix_list) -> int:
+    if writer.is_table:
+        keys = list(writer.schema.keys())
+        writer.writer.write_batch(keys, [[d[k] for d in batch] for k in keys])
+    elif writer.is_kv_writer:
+        keys, values = [], []
+        for d in batch:
+            for prefix, v in zip(data_key_prefix_list, d.values()):
+                keys.append('{}{}'.format(prefix, num))
+                values.append(v)
+            num += 1
+        writer.writer.file_writer.put_batch(keys, values)
+        return num
+    else:
+        writer.writer.file_writer.write_batch(batch)
+    return num + len(batch)
+
+
+def _write_shard(writer: NumpyWriterAdapter, data: typing.Iterator, data_key_prefix_list, num_key) -> int:
+    num = 0
+    batch = []
+    for x in data:
+        batch.append(x)
+        if len(batch) >= writer.buffer_batch_size:
+            num = _flush(writer, batch, num, data_key_prefix_list)
+            batch = []
+    if batch:
+        num = _flush(writer, batch, num, data_key_prefix_list)
+    if writer.is_kv_writer:
+        writer.writer.file_writer.put(num_key, str(num))
+    writer.close(num)
+    return num
+
+
+def merge_datasets(input_files: typing.List[str],
+                   backend: typing.Union[E_file_backend, str],
+                   output_files: typing.Union[typing.List, str],
+                   num_shards: typing.Optional[int] = None,
+                   shuffle: bool = False,
+                   seed: typing.Optional[int] = None,
+                   options=None,
+                   output_options=None,
+                   parquet_options: typing.Optional = None,
+                   schema: typing.Optional[typing.Dict] = None,
+                   data_key_prefix_list=('input',),
+                   num_key='total_num',
+                   batch_size=None,
+                   verify: bool = True,
+                   with_manifest: bool = True,
+                   manifest_file: typing.Optional[str] = None) -> typing.List:
+    '''
+        合并同一存储引擎的 N 个小文件为 M 个均衡分片 , 不解码 numpy 数据
+        input_files: 源文件列表
+        backend: 存储引擎类型
+        output_files: 目标文件 , 字符串且 num_shards > 1 时生成 {output}-00000-of-0000N 分片
+        num_shards: 目标分片数
+        shuffle: 按剩余条数加权随机交错读取各源文件
+        seed: shuffle 随机种子
+        options: 读取选项
+        output_options: 写入选项
+        data_key_prefix_list: 键值数据库 键值前缀 , 写入时重新编号
+        num_key: 键值数据库，记录数据总数建
+        with_manifest: 写入数据集清单 , 默认 {output}.manifest.json , 见 manifest.write_manifest
+        return: 输出分片列表
+    '''
+    data_backend = _to_backend(backend)
+    if data_backend in (E_file_backend.memory, E_file_backend.memory_raw):
+        raise ValueError('merge_datasets does not support backend={}'.format(backend))
+    if isinstance(input_files, str):
+        input_files = [input_files]
+
+    kv_kwargs = {}
+    if data_backend in (E_file_backend.leveldb, E_file_backend.lmdb):
+        kv_kwargs = dict(data_key_prefix_list=data_key_prefix_list, num_key=num_key)
+
+    counts = [count_records(f, data_backend, options, **kv_kwargs) for f in input_files]
+    total = sum(counts)
+
+    if data_backend in TABLE_BACKENDS and schema is None:
+        first = next(_iter_source(input_files[counts.index(max(counts))], data_backend, options))
+        schema = infer_table_schema(first)
+
+    outputs = _shard_outputs(output_files, data_backend, num_shards)
+    sources = [_iter_source(f, data_backend, options, **kv_kwargs) for f in input_files]
+    stream = _interleave(sources, counts, shuffle, seed)
+
+    shard_counts = []
+    for shard_id, outfile in enumerate(outputs):
+        n = total * (shard_id + 1) // len(outputs) - total * shard_id // len(outputs)
+        writer = NumpyWriterAdapter(outfile, data_backend.name,
+                                    options=output_options,
+                                    parquet_options=parquet_options,
+                                    schema=schema,
+                                    batch_size=batch_size,
+                                    atomic=True)
+        num = _write_shard(writer, itertools.islice(stream, n), data_key_prefix_list, num_key)
+        logging.info('merge shard {} {} records'.format(outfile, num))
+        shard_counts.append(num)
+    num_written = sum(shard_counts)
+
+    if num_written != total:
+        raise ValueError('merge_datasets: write {} records , expect {}'.format(num_written, total))
+    if verify:
+        num_output = sum(count_records(f, data_backend, output_options, **kv_kwargs) for f in outputs)
+        if num_output != total:
+            raise ValueError('merge_datasets: output has {} records , expect {}'.format(num_output, total))
+    if with_manifest:
+        write_manifest(manifest_file or get_manifest_path(output_files), outputs, data_backend.name,
+                       counts=shard_counts, schema=schema, options=output_options)
+    return outputs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='numpy_io shard merger')
+    parser.add_argument('--input', nargs='+', required=True, help='input files')
+    parser.add_argument('--backend', required=True, help='record,leveldb,lmdb,arrow_stream,arrow_file,parquet')
+    parser.add_argument('--output', required=True, help='output file or shard prefix')
+    parser.add_argument('--num_shards', type=int, default=None)
+    parser.add_argument('--shuffle', action='store_true')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--batch_size', type=int, default=None)
+    parser.add_argument('--no_verify', action='store_true')
+    parser.add_argument('--no_manifest', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    outputs = merge_datasets(args.input,
+                             args.backend,
+                             args.output,
+                             num_shards=args.num_shards,
+                             shuffle=args.shuffle,
+                             seed=args.seed,
+                             batch_size=args.batch_size,
+                             verify=not args.no_verify,
+                             with_manifest=not args.no_manifest)
+    for f in outputs:
+        print(f)
+
+
+if __name__ == '__main__':
+    main()
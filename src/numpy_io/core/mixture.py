@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/21 21:30
+# @Author: tk
+# @File：mixture
+import typing
+from collections import OrderedDict
+import numpy as np
+from fastdatasets.common.iterable_dataset import IterableDatasetBase
+from fastdatasets.common.random_dataset import RandomDatasetBase
+
+__all__ = [
+    'MixSchedule',
+    'MixtureRandomDataset',
+    'MixtureIterableDataset',
+]
+
+
+class MixSchedule:
+    '''
+        按权重确定的数据源调度 , 每 block_size 条为一块 , 块内各数据源条数固定 , 顺序按 (seed , 块号) 打乱
+        前 n 条中数据源 k 的条数为 floor(n * w_k) , 权重最大的数据源补齐余数
+        locate 可直接计算任意位置的数据源及其在该数据源中的序号 , 不需要保存调度表
+    '''
+    def __init__(self, weights: typing.Sequence[float], seed: int = 0, block_size: int = 4096, cache_blocks: int = 8):
+        weights = np.asarray(weights, dtype=np.float64)
+        assert len(weights) > 0 and np.all(weights >= 0) and weights.sum() > 0
+        self.weights = weights / weights.sum()
+        self.seed = seed
+        self.block_size = max(block_size, len(weights) ** 2)
+        self.cache_blocks = cache_blocks
+        self._main = int(np.argmax(self.weights))
+        self._cache = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        return state
+
+    def counts(self, n: int) -> np.ndarray:
+        # 前 n 条各数据源条数
+        c = np.floor(n * self.weights + 1e-9).astype(np.int64)
+        c[self._main] = n - (c.sum() - c[self._main])
+        return c
+
+    def _block(self, b: int):
+        node = self._cache.get(b)
+        if node is not None:
+            self._cache.move_to_end(b)
+            return node
+        start = self.counts(b * self.block_size)
+        c = self.counts((b + 1) * self.block_size) - start
+        ids = np.repeat(np.arange(len(c)), c)
+        ids = ids[np.random.RandomState([self.seed, b]).permutation(len(ids))]
+        # 块内每条是该数据源在块内的第几条
+        rank = np.zeros((len(ids),), dtype=np.int64)
+        for k in np.nonzero(c)[0]:
+            pos = np.nonzero(ids == k)[0]
+            rank[pos] = np.arange(len(pos))
+        node = (ids, start[ids] + rank)
+        self._cache[b] = node
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return node
+
+    def locate(self, i: int) -> typing.Tuple[int, int]:
+        '''
+            return: (数据源 , 该数据源中的序号)
+        '''
+        ids, local = self._block(i // self.block_size)
+        j = i % self.block_size
+        return int(ids[j]), int(local[j])
+
+    def locate_many(self, indices: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        sources = np.zeros((len(indices),), dtype=np.int64)
+        local = np.zeros((len(indices),), dtype=np.int64)
+        blocks = indices // self.block_size
+        for b in np.unique(blocks):
+            pos = np.nonzero(blocks == b)[0]
+            ids, loc = self._block(int(b))
+            j = indices[pos] % self.block_size
+            sources[pos] = ids[j]
+            local[pos] = loc[j]
+        return sources, local
+
+
+class MixtureRandomDataset(RandomDatasetBase):
+    '''
+        多数据源按权重混合随机读 , 不复制数据
+        第 i 条按 MixSchedule 映射到数据源及序号 , 序号超出数据源长度时循环 , 即按权重上采样
+        num_samples: 混合后长度 , 默认各数据源长度之和
+    '''
+    def __init__(self, datasets: typing.List, weights: typing.Sequence[float],
+                 num_samples: typing.Optional[int] = None, seed: int = 0, block_size: int = 4096):
+        assert len(datasets) == len(weights)
+        self.datasets = datasets
+        self.lengths = np.asarray([len(d) for d in datasets], dtype=np.int64)
+        assert np.all(self.lengths[np.asarray(weights) > 0] > 0), 'empty dataset with positive weight'
+        self.schedule = MixSchedule(weights, seed=seed, block_size=block_size)
+        self.length = int(self.lengths.sum()) if num_samples is None else num_samples
+
+    def reset(self):
+        for d in self.datasets:
+            d.close()
+
+    def __len__(self):
+        return self.length
+
+    def locate_many(self, indices: np.ndarray) -> typing.Tuple[np.ndarray, np.ndarray]:
+        sources, local = self.schedule.locate_many(indices)
+        return sources, local % self.lengths[sources]
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= self.length:
+            raise OverflowError
+        k, local = self.schedule.locate(item)
+        return self.datasets[k][local % int(self.lengths[k])]
+
+
+class MixtureIterableDataset(IterableDatasetBase):
+    '''
+        多个迭代数据集按权重混合 , 调度与 MixtureRandomDataset 相同
+        stopping: first_exhausted 任一数据源读完即结束 ,
+            all_exhausted 读完的数据源 reset 后继续 , 所有数据源至少读完一次后结束
+    '''
+    def __init__(self, datasets: typing.List, weights: typing.Sequence[float],
+                 seed: int = 0, block_size: int = 4096, stopping: str = 'first_exhausted'):
+        assert len(datasets) == len(weights)
+        assert stopping in ('first_exhausted', 'all_exhausted')
+        self.datasets = datasets
+        self.schedule = MixSchedule(weights, seed=seed, block_size=block_size)
+        self.stopping = stopping
+        self._init_state()
+
+    def _init_state(self):
+        self._pos = 0
+        self._exhausted = [w <= 0 for w in self.schedule.weights]
+        self._done = False
+
+    def reset(self):
+        self._init_state()
+        for d in self.datasets:
+            d.reset()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while not self._done:
+            k, _ = self.schedule.locate(self._pos)
+            self._pos += 1
+            try:
+                return next(self.datasets[k])
+            except StopIteration:
+                self._exhausted[k] = True
+                if self.stopping == 'first_exhausted' or all(self._exhausted):
+                    self._done = True
+                    break
+                self.datasets[k].reset()
+                try:
+                    return next(self.datasets[k])
+                except StopIteration:
+                    self._done = True
+        raise StopIteration
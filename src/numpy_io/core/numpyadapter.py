@@ -2,6 +2,7 @@
 # @Time:  22:34
 # @Author: tk
 # @File：numpyadapter
+from __future__ import annotations
 
 import copy
 import typing
@@ -10,14 +11,26 @@ from enum import Enum
 
 import numpy as np
 from fastdatasets.utils.py_features import Final
-from fastdatasets.record import writer as record_writer, RECORD, load_dataset as record_loader
-from fastdatasets.leveldb import writer as leveldb_writer, LEVELDB, load_dataset as leveldb_loader
-from fastdatasets.lmdb import writer as lmdb_writer, LMDB, load_dataset as lmdb_loader
-from fastdatasets.memory import writer as memory_writer, MEMORY, load_dataset as memory_loader
-from fastdatasets.arrow import writer as arrow_writer,load_dataset as arrow_loader
-from fastdatasets.parquet import writer as parquet_writer,load_dataset as parquet_loader
+from fastdatasets.record import writer as record_writer, RECORD
+from .lazy_import import LazyModule
 from .parallel import ParallelNode, parallel_apply
-
+from .marker import get_tmp_path, remove_path, commit_path, write_done_marker, remove_done_marker, verify_done_marker
+from .record_index import get_record_index_path, RecordIndexWriter, load_indexed_record_dataset
+
+# record 以外的后端在第一次使用时导入
+leveldb_writer = LazyModule('fastdatasets.leveldb.writer')
+leveldb_loader = LazyModule('fastdatasets.leveldb', 'load_dataset')
+LEVELDB = LazyModule('fastdatasets.leveldb', 'LEVELDB')
+lmdb_writer = LazyModule('fastdatasets.lmdb.writer')
+lmdb_loader = LazyModule('fastdatasets.lmdb', 'load_dataset')
+LMDB = LazyModule('fastdatasets.lmdb', 'LMDB')
+memory_writer = LazyModule('fastdatasets.memory.writer')
+memory_loader = LazyModule('fastdatasets.memory', 'load_dataset')
+MEMORY = LazyModule('fastdatasets.memory', 'MEMORY')
+arrow_writer = LazyModule('fastdatasets.arrow.writer')
+arrow_loader = LazyModule('fastdatasets.arrow', 'load_dataset')
+parquet_writer = LazyModule('fastdatasets.parquet.writer')
+parquet_loader = LazyModule('fastdatasets.parquet', 'load_dataset')
 
 __all__ = [
     'E_file_backend',
@@ -97,10 +110,24 @@ class NumpyWriterAdapter:
                  leveldb_write_buffer_size=1024 * 1024 * 512,
                  leveldb_max_file_size=10 * 1024 * 1024 * 1024,
                  lmdb_map_size=1024 * 1024 * 1024 * 150,
-                 batch_size=None):
-
+                 batch_size=None,
+                 atomic: bool = False,
+                 with_record_index: bool = True):
+        '''
+            atomic: 写入临时文件 , close 时原子重命名并写入完成标记 , 内存后端忽略
+            with_record_index: record 写入偏移索引 , 随机读取时 mmap 载入
+        '''
+        self._f_writer = None
+        self._record_index = None
+        self._closed = False
         self.filename = filename
         self.schema = schema
+        self.atomic = atomic and isinstance(filename, str)
+        if self.atomic:
+            remove_done_marker(filename)
+            filename = get_tmp_path(filename)
+            remove_path(filename)
+        self.write_filename = filename
         if isinstance(backend, E_file_backend):
             self._backend_type = E_file_backend.to_string(backend)
             self._backend = backend
@@ -116,6 +143,10 @@ class NumpyWriterAdapter:
             if options is None:
                 options = RECORD.TFRecordOptions(compression_type='GZIP')
             self._f_writer = record_writer.NumpyWriter(filename, options=options)
+            if with_record_index and isinstance(filename, str):
+                self._record_index = RecordIndexWriter(self._f_writer.file_writer,
+                                                       get_record_index_path(self.filename))
+                self._f_writer.file_writer = self._record_index
 
         elif self._backend == E_file_backend.leveldb:
             self._buffer_batch_size = 100000
@@ -178,12 +209,39 @@ class NumpyWriterAdapter:
             self._buffer_batch_size = batch_size
         assert self._buffer_batch_size > 0
     def __del__(self):
-        self.close()
+        # 未显式 close 的原子写不提交
+        if self.atomic:
+            self.abort()
+        else:
+            self.close()
 
-    def close(self):
+    def close(self, total_num: typing.Optional[int] = None):
+        '''
+            total_num: 数据条数 , 写入完成标记
+        '''
+        if self._f_writer is not None:
+            self._f_writer.close()
+            self._f_writer = None
+            if self.atomic and not self._closed:
+                commit_path(self.write_filename, self.filename)
+            if self._record_index is not None:
+                self._record_index.commit()
+            if self.atomic and not self._closed:
+                write_done_marker(self.filename, self._backend_type, total_num)
+        self._closed = True
+
+    def abort(self):
+        '''
+            关闭写对象 , 丢弃未提交的临时文件
+        '''
         if self._f_writer is not None:
             self._f_writer.close()
             self._f_writer = None
+            if self._record_index is not None:
+                self._record_index.abort()
+            if self.atomic and not self._closed:
+                remove_path(self.write_filename)
+        self._closed = True
 
     @property
     def writer(self):
@@ -224,14 +282,19 @@ class NumpyReaderAdapter:
                  typing.Dict,
                  typing.AnyStr
              ] = None,
-             col_names: typing.Optional[typing.Dict] = None,
+             col_names: typing.Optional[typing.List[str]] = None,
              data_key_prefix_list=('input',),
              num_key='total_num',
              cycle_length=1,
              block_length=1,
              with_record_iterable_dataset=True,
              with_parse_from_numpy=True,
-             with_share_memory=True):
+             with_share_memory=True,
+             with_verify_commit=False,
+             cache_bytes: typing.Optional[int] = None,
+             filter=None,
+             hierarchical_shuffle: typing.Optional[typing.Dict] = None,
+             with_numpy_view=False):
         '''
             input_files: 文件列表
             backend: 存储引擎类型
@@ -240,21 +303,53 @@ class NumpyReaderAdapter:
             num_key: 键值数据库，记录数据总数建
             with_record_iterable_dataset 打开iterable_dataset
             with_parse_from_numpy 解析numpy数据
+            with_verify_commit 校验文件完成标记
+            cache_bytes 随机读数据集解码结果 LRU 缓存字节预算
+            col_names 表格类型读取的列
+            filter 表格类型行过滤 , 见 table_filter.normalize_filter , 其他后端报错
+                parquet 按行组统计 (最小 / 最大值) 及过滤列跳过无命中行组 , arrow 随机读取在 load 内扫描全部行计算命中下标 , 迭代读取时逐条过滤
+            hierarchical_shuffle record , arrow 迭代读取分层打乱参数 , 见 HierarchicalShuffleIterableDataset
+            with_numpy_view arrow , parquet 定长数值列返回只读 numpy 视图 , 不复制 , 见 zero_copy.ColumnView
         '''
+        # 读取时才需要的包装数据集 , 导入 numpyadapter 时不加载
+        from .cache import CacheRandomDataset
+        from .table_filter import ParquetProjectedIterableDataset, ParquetProjectedRandomDataset, apply_table_filter, \
+            normalize_filter, _with_filter_columns
+        from .resumable import ResumableIterableDataset
+        from .stream_shuffle import HierarchicalShuffleIterableDataset
+        from .zero_copy import TableNumpyViewRandomDataset
+
+        if with_verify_commit:
+            for f in ([input_files] if isinstance(input_files, str) else input_files):
+                if isinstance(f, str) and not verify_done_marker(f, require_done_marker=True):
+                    raise ValueError('{} is incomplete , missing or mismatched commit marker'.format(f))
 
         parse_flag = True
         data_backend = backend if isinstance(backend, E_file_backend) else E_file_backend.from_string(backend)
+        filters = normalize_filter(filter)
+        if filters and data_backend not in (E_file_backend.arrow_stream, E_file_backend.arrow_file, E_file_backend.parquet):
+            raise ValueError('filter only supports arrow and parquet backend , got {}'.format(backend))
+        table_col_names = _with_filter_columns(col_names, filters)
         if data_backend == E_file_backend.record:
             if options is None:
                 options = RECORD.TFRecordOptions(compression_type='GZIP')
-            if with_record_iterable_dataset:
-                dataset = record_loader.IterableDataset(input_files,
-                                                        cycle_length=cycle_length,
-                                                        block_length=block_length,
-                                                        options=options,
-                                                        with_share_memory=with_share_memory)
+            if with_record_iterable_dataset and hierarchical_shuffle is not None:
+                dataset = HierarchicalShuffleIterableDataset(input_files,
+                                                             backend='record',
+                                                             cycle_length=cycle_length,
+                                                             options=options,
+                                                             with_share_memory=with_share_memory,
+                                                             **hierarchical_shuffle)
+            elif with_record_iterable_dataset:
+                # 可保存读取位置 , 见 resumable.get_dataset_state
+                dataset = ResumableIterableDataset(input_files,
+                                                   backend='record',
+                                                   cycle_length=cycle_length,
+                                                   block_length=block_length,
+                                                   options=options,
+                                                   with_share_memory=with_share_memory)
             else:
-                dataset = record_loader.RandomDataset(input_files,
+                dataset = load_indexed_record_dataset(input_files,
                                                       options=options,
                                                       with_share_memory=with_share_memory)
 
@@ -287,35 +382,69 @@ class NumpyReaderAdapter:
             dataset = memory_loader.RandomDataset(input_files, options=options)
         elif data_backend == E_file_backend.arrow_stream:
             parse_flag = False
-            if with_record_iterable_dataset:
-                dataset = arrow_loader.IterableDataset(input_files,
-                                                       cycle_length=cycle_length,
-                                                       block_length=block_length,
-                                                       options=options,
-                                                       col_names=col_names,
-                                                       with_share_memory=False)
+            if with_record_iterable_dataset and hierarchical_shuffle is not None:
+                dataset = HierarchicalShuffleIterableDataset(input_files,
+                                                             backend='arrow',
+                                                             cycle_length=cycle_length,
+                                                             options=options,
+                                                             col_names=table_col_names,
+                                                             with_share_memory=False,
+                                                             **hierarchical_shuffle)
+            elif with_record_iterable_dataset:
+                dataset = ResumableIterableDataset(input_files,
+                                                   backend='arrow',
+                                                   cycle_length=cycle_length,
+                                                   block_length=block_length,
+                                                   options=options,
+                                                   col_names=table_col_names,
+                                                   with_share_memory=False,
+                                                   with_numpy_view=with_numpy_view)
             else:
                 dataset = arrow_loader.RandomDataset(input_files,
                                                      options=options,
-                                                     col_names=col_names,
+                                                     col_names=table_col_names,
                                                      with_share_memory=False)
         elif data_backend == E_file_backend.arrow_file:
             parse_flag = False
-            if with_record_iterable_dataset:
-                dataset = arrow_loader.IterableDataset(input_files,
-                                                       cycle_length=cycle_length,
-                                                       block_length=block_length,
-                                                       options=options,
-                                                       col_names=col_names,
-                                                       with_share_memory=True)
+            if with_record_iterable_dataset and hierarchical_shuffle is not None:
+                dataset = HierarchicalShuffleIterableDataset(input_files,
+                                                             backend='arrow',
+                                                             cycle_length=cycle_length,
+                                                             options=options,
+                                                             col_names=table_col_names,
+                                                             with_share_memory=True,
+                                                             **hierarchical_shuffle)
+            elif with_record_iterable_dataset:
+                dataset = ResumableIterableDataset(input_files,
+                                                   backend='arrow',
+                                                   cycle_length=cycle_length,
+                                                   block_length=block_length,
+                                                   options=options,
+                                                   col_names=table_col_names,
+                                                   with_share_memory=True,
+                                                   with_numpy_view=with_numpy_view)
             else:
                 dataset = arrow_loader.RandomDataset(input_files,
                                                      options=options,
-                                                     col_names=col_names,
+                                                     col_names=table_col_names,
                                                      with_share_memory=True)
         elif data_backend == E_file_backend.parquet:
             parse_flag = False
-            if with_record_iterable_dataset:
+            if col_names is not None or filters:
+                # 只读取需要的列块 , 按过滤列跳过行组
+                if with_record_iterable_dataset:
+                    dataset = ParquetProjectedIterableDataset(input_files,
+                                                              columns=col_names,
+                                                              filter=filters,
+                                                              options=options,
+                                                              cycle_length=cycle_length,
+                                                              block_length=block_length)
+                else:
+                    dataset = ParquetProjectedRandomDataset(input_files,
+                                                            columns=col_names,
+                                                            filter=filters,
+                                                            options=options)
+            elif with_record_iterable_dataset:
                 dataset = parquet_loader.IterableDataset(input_files,
                                                          cycle_length=cycle_length,
                                                          block_length=block_length,
@@ -329,8 +458,15 @@ class NumpyReaderAdapter:
         else:
             dataset = None
             warnings.warn('no support databackend')
+        if with_numpy_view and dataset is not None and not isinstance(dataset, typing.Iterator) \
+                and data_backend in (E_file_backend.arrow_stream, E_file_backend.arrow_file, E_file_backend.parquet):
+            dataset = TableNumpyViewRandomDataset(dataset)
+        if filters and data_backend in (E_file_backend.arrow_stream, E_file_backend.arrow_file):
+            dataset = apply_table_filter(dataset, col_names, filters)
         if with_parse_from_numpy and parse_flag:
             dataset = dataset.parse_from_numpy_writer()
+        if cache_bytes and dataset is not None and not isinstance(dataset, typing.Iterator):
+            dataset = CacheRandomDataset(dataset, cache_bytes)
         return dataset
 
 
@@ -357,17 +493,26 @@ class ParallelNumpyWriter(ParallelNode, metaclass=Final):
              leveldb_write_buffer_size=1024 * 1024 * 512,
              leveldb_max_file_size=10 * 1024 * 1024 * 1024,
              lmdb_map_size=1024 * 1024 * 1024 * 150,
-             batch_size=None):
-
-        self.numpy_writer = NumpyWriterAdapter(outfile,
-                                               backend = backend,
-                                               options=options,
-                                               parquet_options=parquet_options,
-                                               schema=schema,
-                                               leveldb_write_buffer_size = leveldb_write_buffer_size,
-                                               leveldb_max_file_size=leveldb_max_file_size,
-                                               lmdb_map_size = lmdb_map_size,
-                                               batch_size=batch_size)
+             batch_size=None,
+             atomic=True,
+             with_manifest: bool = True,
+             manifest_file: typing.Optional[str] = None):
+        '''
+            with_manifest: close 时写入数据集清单 , 默认 {outfile}.manifest.json , 内存后端忽略 , 见 manifest.write_manifest
+        '''
+        self.with_manifest = with_manifest
+        self.manifest_file = manifest_file
+        self.open_kwargs = dict(filename=outfile,
+                                backend=backend,
+                                options=options,
+                                parquet_options=parquet_options,
+                                schema=schema,
+                                leveldb_write_buffer_size=leveldb_write_buffer_size,
+                                leveldb_max_file_size=leveldb_max_file_size,
+                                lmdb_map_size=lmdb_map_size,
+                                batch_size=batch_size,
+                                atomic=atomic)
+        self.numpy_writer = NumpyWriterAdapter(**self.open_kwargs)
         self.backend = self.numpy_writer.backend
         self.backend_type = self.numpy_writer.backend_type
         self.is_kv_writer = self.numpy_writer.is_kv_writer
@@ -397,6 +542,9 @@ class ParallelNumpyWriter(ParallelNode, metaclass=Final):
             write_batch_size = 1
 
         self.write_batch_size = write_batch_size
+        if self.num_process_worker > 0:
+            # 写进程中重新打开 , 主进程先关闭 , 避免 fork 出的写对象副本重复 close 覆盖文件
+            self.numpy_writer.abort()
         parallel_apply(data, self)
 
     def flush(self):
@@ -425,6 +573,11 @@ class ParallelNumpyWriter(ParallelNode, metaclass=Final):
     def on_input_process(self, x):
         return self.input_hook_fn(x, self.fn_args)
 
+    # 继承
+    def on_output_startup(self):
+        if self.numpy_writer is not None and self.numpy_writer.writer is None:
+            self.numpy_writer = NumpyWriterAdapter(**self.open_kwargs)
+
     # 继承
     def on_output_process(self, x):
         #忽略None数据
@@ -448,6 +601,17 @@ class ParallelNumpyWriter(ParallelNode, metaclass=Final):
                 self.flush()
             if self.is_kv_writer:
                 self.numpy_writer.writer.file_writer.put('total_num', str(self.total_num))
-            self.numpy_writer.close()
+            self.numpy_writer.close(self.total_num)
             self.numpy_writer = None
+            if self.with_manifest:
+                self._write_manifest()
+
+    def _write_manifest(self):
+        outfile = self.open_kwargs['filename']
+        if not isinstance(outfile, str) or self.backend in (E_file_backend.memory, E_file_backend.memory_raw):
+            return
+        # manifest 依赖本模块 , 在此导入
+        from .manifest import get_manifest_path, write_manifest
+        write_manifest(self.manifest_file or get_manifest_path(outfile), [outfile], self.backend.name,
+                       counts=[self.total_num], schema=self.schema, options=self.open_kwargs['options'])
 
@@ -137,6 +137,13 @@ def parallel_apply(data: typing.Union[typing.Sequence,typing.Iterator],
             ids = tqdm(ids, total=total, desc=parallel_node.desc if parallel_node.desc else 'parallel_apply')
         except:
             ...
+    elif isinstance(data, typing.Sized):
+        # 长度已知的迭代对象 , 例如 CorpusLines , 不能打乱 , 只显示进度
+        try:
+            from tqdm import tqdm
+            data = tqdm(data, total=len(data), desc=parallel_node.desc if parallel_node.desc else 'parallel_apply')
+        except:
+            ...
 
 
 
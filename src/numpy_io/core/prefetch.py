@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/20 16:30
+# @Author: tk
+# @File：prefetch
+import os
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase
+
+__all__ = [
+    'PrefetchRandomDataset',
+]
+
+
+class PrefetchRandomDataset(RandomDatasetBase):
+    '''
+        随机读数据集预读 , 线程池提前读取后续 depth 条数据 , 按请求顺序返回
+        set_order 设置采样顺序 , 未设置时按最近两次下标步长预测
+        stall_time 为等待读取的累计秒数
+    '''
+    def __init__(self, dataset, depth: int = 64, num_threads: int = 4):
+        assert depth > 0 and num_threads > 0
+        self.dataset = dataset
+        self.depth = depth
+        self.num_threads = num_threads
+        self._order = None
+        self._order_pos = 0
+        self._init_state()
+
+    def _init_state(self):
+        self._executor = None
+        self._pid = None
+        self._futures = OrderedDict()
+        self._last = None
+        self._stride = 1
+        self.stall_time = 0.0
+        self.hits = 0
+        self.waits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_executor'] = None
+        state['_pid'] = None
+        state['_futures'] = OrderedDict()
+        return state
+
+    def _shutdown(self, wait=True):
+        if getattr(self, '_executor', None) is not None and self._pid == os.getpid():
+            for fut in self._futures.values():
+                fut.cancel()
+            self._executor.shutdown(wait=wait)
+        self._executor = None
+        self._futures = OrderedDict()
+
+    def reset(self):
+        self._shutdown()
+        if self.dataset:
+            self.dataset.close()
+
+    def __del__(self):
+        self._shutdown(wait=False)
+
+    def set_order(self, order: typing.Optional[typing.Union[typing.Sequence[int], np.ndarray]]):
+        '''
+            order: 接下来的读取顺序 , 为空时恢复步长预测
+        '''
+        self._order = None if order is None else np.asarray(order, dtype=np.int64)
+        self._order_pos = 0
+        for fut in self._futures.values():
+            fut.cancel()
+        self._futures.clear()
+
+    def stats(self) -> typing.Dict:
+        total = self.hits + self.waits + self.misses
+        return {
+            'hits': self.hits,
+            'waits': self.waits,
+            'misses': self.misses,
+            'stall_time': self.stall_time,
+            'avg_stall_ms': self.stall_time * 1000 / total if total else 0.0,
+            'pending': len(self._futures),
+        }
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def _get_executor(self):
+        # DataLoader worker fork 后重新创建线程池
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(self.num_threads, thread_name_prefix='numpy_io_prefetch')
+            self._pid = os.getpid()
+            self._futures = OrderedDict()
+        return self._executor
+
+    def _next_items(self, item: int) -> typing.Sequence[int]:
+        if self._order is not None:
+            pos = self._order_pos
+            if pos >= len(self._order) or self._order[pos] != item:
+                hit = np.nonzero(self._order[pos:] == item)[0]
+                if len(hit) == 0:
+                    return []
+                pos += int(hit[0])
+            self._order_pos = pos + 1
+            return self._order[pos + 1: pos + 1 + self.depth].tolist()
+
+        if self._last is not None:
+            stride = item - self._last
+            self._stride = stride if 0 < stride <= self.depth else 1
+        self._last = item
+        length = len(self.dataset)
+        return range(item + self._stride, min(item + self._stride * (self.depth + 1), length), self._stride)
+
+    def _schedule(self, items: typing.Iterable[int]):
+        executor = self._get_executor()
+        wanted = OrderedDict.fromkeys(items)
+        # 取消不在预读窗口内的请求
+        for k in [k for k in self._futures if k not in wanted]:
+            self._futures.pop(k).cancel()
+        for k in wanted:
+            if k not in self._futures:
+                self._futures[k] = executor.submit(self.dataset.__getitem__, k)
+
+    def _result(self, fut, item):
+        t = time.perf_counter()
+        if fut is None:
+            self.misses += 1
+            x = self.dataset[item]
+        else:
+            if fut.done():
+                self.hits += 1
+            else:
+                self.waits += 1
+            x = fut.result()
+        self.stall_time += time.perf_counter() - t
+        return x
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        item = int(item)
+        fut = self._futures.pop(item, None) if self._pid == os.getpid() else None
+        self._schedule(self._next_items(item))
+        return self._result(fut, item)
+
+    def get_many(self, indices: typing.Union[typing.Sequence[int], np.ndarray]) -> typing.List:
+        '''
+            一批下标并发读取 , 并预读其后的数据
+        '''
+        indices = [int(i) for i in indices]
+        if not indices:
+            return []
+        executor = self._get_executor()
+        futures = []
+        for item in indices:
+            fut = self._futures.pop(item, None)
+            if fut is None:
+                fut = executor.submit(self.dataset.__getitem__, item)
+            futures.append(fut)
+        if len(indices) > 1:
+            self._last = indices[-2]
+        self._schedule(self._next_items(indices[-1]))
+        t = time.perf_counter()
+        out = []
+        for fut in futures:
+            if fut.done():
+                self.hits += 1
+            else:
+                self.waits += 1
+            out.append(fut.result())
+        self.stall_time += time.perf_counter() - t
+        return out
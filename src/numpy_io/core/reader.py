@@ -2,11 +2,13 @@
 # @Time:  22:44
 # @Author: tk
 # @File：reader
+from __future__ import annotations
+
+import functools
 import typing
-from fastdatasets.leveldb import LEVELDB
-from fastdatasets.lmdb import LMDB
-from fastdatasets.record import RECORD
-from .numpyadapter import NumpyReaderAdapter
+from .numpyadapter import NumpyReaderAdapter, RECORD, LEVELDB, LMDB
+from .cache import CacheRandomDataset
+from .manifest import is_manifest_file, read_manifest, LazyShardRandomDataset
 
 
 def load_numpy_dataset(files: typing.Union[typing.List[str], str],
@@ -22,14 +24,53 @@ def load_numpy_dataset(files: typing.Union[typing.List[str], str],
                        limit_start: typing.Optional[int] = None,
                        limit_count: typing.Optional[int] = None,
                        dataset_loader_filter_fn: typing.Callable = None,
+                       cache_bytes: typing.Optional[int] = None,
+                       columns: typing.Optional[typing.List[str]] = None,
+                       filter=None,
+                       hierarchical_shuffle: typing.Optional[typing.Dict] = None,
+                       with_numpy_view: bool = False,
                        ):
+    '''
+        files: 文件列表 , 或 manifest.write_manifest 生成的清单 , 清单时 backend 以清单为准
+            清单随机读取不检查文件 , 长度按清单条数 , 分片第一次访问时打开
+    '''
+    if is_manifest_file(files):
+        manifest = read_manifest(files)
+        backend = manifest.backend
+        files = manifest.files
+        if options is None and backend == 'record':
+            options = manifest.record_options()
+        if not with_record_iterable_dataset and not filter:
+            load_fn = functools.partial(NumpyReaderAdapter.load,
+                                        backend=backend,
+                                        options=options,
+                                        data_key_prefix_list=data_key_prefix_list,
+                                        num_key=num_key,
+                                        with_record_iterable_dataset=False,
+                                        with_parse_from_numpy=with_parse_from_numpy,
+                                        col_names=columns,
+                                        with_numpy_view=with_numpy_view)
+            dataset = LazyShardRandomDataset(files, manifest.counts, load_fn)
+            if cache_bytes:
+                dataset = CacheRandomDataset(dataset, cache_bytes)
+            return _wrap_dataset(dataset, limit_start, limit_count, dataset_loader_filter_fn)
+
     dataset = NumpyReaderAdapter.load(files, backend, options,
                                       data_key_prefix_list=data_key_prefix_list,
                                       num_key=num_key,
                                       cycle_length=cycle_length,
                                       block_length=block_length,
                                       with_record_iterable_dataset=with_record_iterable_dataset,
-                                      with_parse_from_numpy=with_parse_from_numpy)
+                                      with_parse_from_numpy=with_parse_from_numpy,
+                                      cache_bytes=cache_bytes,
+                                      col_names=columns,
+                                      filter=filter,
+                                      hierarchical_shuffle=hierarchical_shuffle,
+                                      with_numpy_view=with_numpy_view)
+    return _wrap_dataset(dataset, limit_start, limit_count, dataset_loader_filter_fn)
+
+
+def _wrap_dataset(dataset, limit_start, limit_count, dataset_loader_filter_fn):
     if limit_start is not None and limit_start > 0:
         dataset = dataset.skip(limit_start)
     if limit_count is not None and limit_count > 0:
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/20 9:10
+# @Author: tk
+# @File：record_index
+import logging
+import os
+import threading
+import typing
+import numpy as np
+import tfrecords
+from fastdatasets.record import RECORD
+from fastdatasets.record.random_dataset import SingleRecordRandomDataset, MultiRecordRandomDataset
+
+__all__ = [
+    'get_record_index_path',
+    'load_record_index',
+    'RecordIndexWriter',
+    'IndexedRecordRandomDataset',
+    'MultiIndexedRecordRandomDataset',
+    'load_indexed_record_dataset',
+]
+
+# tfrecord 每条记录头尾: length(8) + crc(4) + data + crc(4)
+RECORD_OVERHEAD = 16
+
+_compressed_warned = False
+
+
+def _is_compressed(options) -> bool:
+    return bool(getattr(options, 'compression_type', None)) if options is not None else False
+
+
+def get_record_index_path(filename: str):
+    return os.path.join(os.path.dirname(filename), '.' + os.path.basename(filename) + '.offsets')
+
+
+def load_record_index(filename: str, options=None) -> typing.Optional[np.ndarray]:
+    '''
+        mmap 载入写入时生成的偏移索引 , shape (N , 2) : (未压缩流偏移 , 数据长度)
+        索引缺失或早于数据文件时返回 None
+        压缩文件索引只省去建立索引时的全文件扫描 , 按偏移读取仍从头解压
+    '''
+    index_path = get_record_index_path(filename)
+    if not os.path.exists(index_path) or not os.path.exists(filename):
+        return None
+    if os.path.getmtime(index_path) < os.path.getmtime(filename):
+        return None
+    index_size = os.path.getsize(index_path)
+    if index_size % 16 != 0:
+        return None
+    if index_size == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    indexes = np.memmap(index_path, dtype='<i8', mode='r').reshape((-1, 2))
+    if not _is_compressed(options):
+        if int(indexes[-1, 0] + indexes[-1, 1]) + RECORD_OVERHEAD != os.path.getsize(filename):
+            return None
+    return indexes
+
+
+class RecordIndexWriter:
+    '''
+        代理 TFRecordWriter , 写入时记录每条数据偏移 , 追加写入临时索引文件
+    '''
+    def __init__(self, file_writer, index_filename: str):
+        self.file_writer = file_writer
+        self.index_filename = index_filename
+        self.tmp_index_filename = index_filename + '.tmp'
+        self._f_index = open(self.tmp_index_filename, mode='wb')
+        self._pos = 0
+
+    def _append(self, data_list):
+        lengths = np.asarray([len(d.encode('utf-8')) if isinstance(d, str) else len(d) for d in data_list], dtype=np.int64)
+        if len(lengths) == 0:
+            return
+        offsets = np.cumsum(lengths + RECORD_OVERHEAD) - (lengths + RECORD_OVERHEAD) + self._pos
+        self._pos = int(offsets[-1] + lengths[-1] + RECORD_OVERHEAD)
+        np.stack([offsets, lengths], axis=1).astype('<i8').tofile(self._f_index)
+
+    def write(self, data):
+        self._append([data])
+        return self.file_writer.write(data)
+
+    def write_batch(self, data):
+        self._append(data)
+        return self.file_writer.write_batch(data)
+
+    def flush(self):
+        self._f_index.flush()
+        return self.file_writer.flush()
+
+    def close(self):
+        if self._f_index is not None:
+            self.file_writer.close()
+            self._f_index.close()
+            self._f_index = None
+
+    def commit(self):
+        self.close()
+        os.replace(self.tmp_index_filename, self.index_filename)
+        # 索引时间不早于数据文件 , 用于检测过期索引
+        os.utime(self.index_filename, None)
+
+    def abort(self):
+        self.close()
+        if os.path.exists(self.tmp_index_filename):
+            os.remove(self.tmp_index_filename)
+
+
+class IndexedRecordRandomDataset(SingleRecordRandomDataset):
+    '''
+        使用写入时偏移索引 , 非打开线程各自持有 reader , 支持多线程读取
+    '''
+    def __reopen__(self):
+        self.close()
+        self._owner_thread = threading.get_ident()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._thread_readers = []
+        return super(IndexedRecordRandomDataset, self).__reopen__()
+
+    def close(self):
+        super(IndexedRecordRandomDataset, self).close()
+        if getattr(self, '_thread_readers', None):
+            with self._lock:
+                for reader in self._thread_readers:
+                    reader.close()
+                self._thread_readers = []
+                self._local = threading.local()
+
+    def get_reader(self):
+        if self.file_reader_ is None or threading.get_ident() == self._owner_thread:
+            return self.file_reader_
+        reader = getattr(self._local, 'reader', None)
+        if reader is None:
+            reader = tfrecords.tf_record_random_reader(self.path, options=self.options,
+                                                       with_share_memory=self.with_share_memory)
+            self._local.reader = reader
+            with self._lock:
+                self._thread_readers.append(reader)
+        return reader
+
+    def gen_indexes(self):
+        global _compressed_warned
+        indexes = load_record_index(self.path, self.options)
+        if indexes is None:
+            super(IndexedRecordRandomDataset, self).gen_indexes()
+        else:
+            self.indexes = indexes
+            if _is_compressed(self.options) and not _compressed_warned:
+                _compressed_warned = True
+                logging.warning('{} is compressed , every random read inflates from the start of file , '
+                                'write with compression_type=\'\' for random access'.format(self.path))
+
+    def __getitem__(self, item):
+        if self.file_reader_ is None:
+            raise OverflowError
+
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+
+        x, _ = self.get_reader().read(int(self.indexes[item][0]))
+        return x
+
+
+class MultiIndexedRecordRandomDataset(MultiRecordRandomDataset):
+    def __reopen__(self):
+        for it_obj in self.iterators_:
+            it_obj['inst'] = IndexedRecordRandomDataset(it_obj["file"],
+                                                        index_path=self.index_path,
+                                                        use_index_cache=self.use_index_cache,
+                                                        options=self.options,
+                                                        with_share_memory=self.with_share_memory)
+        self.cumsum_ = np.cumsum([len(it_obj['inst']) for it_obj in self.iterators_], dtype=np.int64)
+
+    def __len__(self):
+        return int(self.cumsum_[-1]) if len(self.cumsum_) else 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= len(self):
+            raise OverflowError
+        i = int(np.searchsorted(self.cumsum_, item, side='right'))
+        real_index = item - (int(self.cumsum_[i - 1]) if i > 0 else 0)
+        return self.iterators_[i]['inst'][real_index]
+
+
+def load_indexed_record_dataset(path: typing.Union[typing.List, typing.AnyStr],
+                                options=None,
+                                with_share_memory=False):
+    if options is None:
+        options = RECORD.TFRecordOptions(compression_type='GZIP')
+    if isinstance(path, list) and len(path) == 1:
+        path = path[0]
+    if isinstance(path, list):
+        return MultiIndexedRecordRandomDataset(path, options=options, with_share_memory=with_share_memory)
+    elif isinstance(path, str):
+        return IndexedRecordRandomDataset(path, options=options, with_share_memory=with_share_memory)
+    raise Exception('data_path must be list or single string')
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/21 14:10
+# @Author: tk
+# @File：resumable
+import os
+import typing
+import warnings
+import numpy as np
+import tfrecords
+from fastdatasets.common.iterable_dataset import IterableDatasetBase, MapIterableDataset, FilterIterableDataset, \
+    SkipIterableDataset, TopRandomDataset, RepeatIterableDataset, ChoiseIterableDataset
+from tfrecords.python.io.arrow import IPC_StreamReader, IPC_MemoryMappedFileReader
+from .table_filter import _cell_value
+from .zero_copy import ColumnView
+
+__all__ = [
+    'ResumableIterableDataset',
+    'ResumableShuffleIterableDataset',
+    'get_dataset_state',
+    'set_dataset_state',
+]
+
+
+class _RecordCursor:
+    '''
+        tfrecord 按未压缩流偏移顺序读取 , 位置为 (偏移 , 已读条数)
+    '''
+    def __init__(self, path: str, options=None, with_share_memory=False, state=None):
+        self.path = path
+        self.offset, self.count = state if state else (0, 0)
+        self.reader = None
+        if os.path.exists(path):
+            self.reader = tfrecords.tf_record_random_reader(path, options=options, with_share_memory=with_share_memory)
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def state(self):
+        return [int(self.offset), self.count]
+
+    def next(self):
+        if self.reader is None:
+            raise StopIteration
+        try:
+            x, offset = self.reader.read(self.offset)
+        except IndexError:
+            raise StopIteration
+        except tfrecords.DataLossError:
+            warnings.warn('data corrupted in {} Is this even a TFRecord file?'.format(self.path))
+            raise StopIteration
+        self.offset = offset
+        self.count += 1
+        return x
+
+
+class _ArrowCursor:
+    '''
+        arrow 按 record batch 顺序读取 , 位置为 (batch 序号 , batch 内行号 , 已读条数)
+        arrow_file 直接定位 batch , arrow_stream 跳过前面的 batch 不解码
+        with_numpy_view 定长数值列返回 numpy 视图 , 见 zero_copy.ColumnView
+    '''
+    def __init__(self, path: str, options=None, col_names=None, with_share_memory=False, state=None,
+                 with_numpy_view=False):
+        self.path = path
+        self.col_names = col_names
+        self.with_share_memory = with_share_memory
+        self.with_numpy_view = with_numpy_view
+        self.batch_id, self.row, self.count = state if state else (0, 0, 0)
+        self.rows = None
+        self.reader = None
+        self._stream_pos = 0
+        if os.path.exists(path):
+            try:
+                if with_share_memory:
+                    self.reader = IPC_MemoryMappedFileReader(path, options=options)
+                else:
+                    self.reader = IPC_StreamReader(path, options=options)
+            except Exception as e:
+                warnings.warn(str(e))
+                self.reader = None
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def state(self):
+        return [self.batch_id, self.row, self.count]
+
+    def _read_batch(self, batch_id: int):
+        if self.with_share_memory:
+            if batch_id >= self.reader.num_record_batches():
+                return None
+            return self.reader.read_batch(batch_id)
+        batch = None
+        while self._stream_pos <= batch_id:
+            batch = self.reader.next()
+            self._stream_pos += 1
+            if batch is None:
+                return None
+        return batch
+
+    def _load(self):
+        batch = self._read_batch(self.batch_id)
+        if batch is None:
+            raise StopIteration
+        names = self.col_names if self.col_names is not None else batch.schema().field_names()
+        cols = {n: batch.GetColumnByName(n) for n in names}
+        if self.with_numpy_view:
+            views = {n: ColumnView(c) for n, c in cols.items()}
+            self.rows = [{n: v[i] for n, v in views.items()} for i in range(batch.num_rows())]
+            return
+        self.rows = [{n: _cell_value(c, i) for n, c in cols.items()} for i in range(batch.num_rows())]
+
+    def next(self):
+        if self.reader is None:
+            raise StopIteration
+        if self.rows is None:
+            self._load()
+        while self.row >= len(self.rows):
+            self.batch_id += 1
+            self.row = 0
+            self._load()
+        x = self.rows[self.row]
+        self.row += 1
+        self.count += 1
+        return x
+
+
+class ResumableIterableDataset(IterableDatasetBase):
+    '''
+        多文件交错顺序读取 , 交错方式与 fastdatasets IterableDataset 一致
+        state_dict 返回可序列化位置 : 未打开文件 , 交错中文件及文件内位置 , 当前交错下标
+        load_state_dict 直接定位到该位置 , 不重新读取已消费数据
+        backend: record , arrow
+        with_numpy_view: arrow 定长数值列返回 numpy 视图
+    '''
+    def __init__(self,
+                 path: typing.Union[typing.List[str], str],
+                 backend: str = 'record',
+                 cycle_length: int = 1,
+                 block_length: int = 1,
+                 options=None,
+                 col_names: typing.Optional[typing.List[str]] = None,
+                 with_share_memory=False,
+                 with_numpy_view=False):
+        assert backend in ('record', 'arrow')
+        assert cycle_length > 0 and block_length > 0
+        self.path = [path] if isinstance(path, str) else list(path)
+        self.backend = backend
+        self.cycle_length = min(cycle_length, max(len(self.path), 1))
+        self.block_length = block_length
+        self.options = options
+        self.col_names = col_names
+        self.with_share_memory = with_share_memory
+        self.with_numpy_view = with_numpy_view
+        self._cursors = {}
+        self.reset()
+
+    def __del__(self):
+        self.close()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cursors'] = {}
+        state['_active'] = [[fid, self._cursors[fid].state() if fid in self._cursors else pos]
+                            for fid, pos in self._active]
+        return state
+
+    def reset(self):
+        self.close()
+        self._pending = list(range(len(self.path)))
+        self._active = []
+        self._cur_id = 0
+
+    def shard(self, num_shards: int, shard_id: int):
+        '''
+            只读取下标为 shard_id , shard_id + num_shards , ... 的文件 , 从头开始读取
+        '''
+        self.path = self.path[shard_id::num_shards]
+        self.cycle_length = min(self.cycle_length, max(len(self.path), 1))
+        self.reset()
+
+    def close(self):
+        for cursor in getattr(self, '_cursors', {}).values():
+            cursor.close()
+        self._cursors = {}
+
+    def _open(self, file_id: int, pos):
+        if self.backend == 'record':
+            return _RecordCursor(self.path[file_id], self.options, self.with_share_memory, state=pos)
+        return _ArrowCursor(self.path[file_id], self.options, self.col_names, self.with_share_memory, state=pos,
+                            with_numpy_view=self.with_numpy_view)
+
+    def state_dict(self) -> typing.Dict:
+        return {
+            'num_files': len(self.path),
+            'pending': list(self._pending),
+            'active': [[fid, self._cursors[fid].state() if fid in self._cursors else pos]
+                       for fid, pos in self._active],
+            'cur_id': self._cur_id,
+        }
+
+    def load_state_dict(self, state: typing.Dict):
+        if state['num_files'] != len(self.path):
+            raise ValueError('state has {} files , dataset has {}'.format(state['num_files'], len(self.path)))
+        self.reset()
+        self._pending = list(state['pending'])
+        self._active = [[fid, pos] for fid, pos in state['active']]
+        self._cur_id = state['cur_id']
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            while len(self._active) < self.cycle_length and self._pending:
+                self._active.append([self._pending.pop(0), None])
+            if not self._active:
+                raise StopIteration
+            self._cur_id %= len(self._active)
+            file_id, pos = self._active[self._cur_id]
+            cursor = self._cursors.get(file_id)
+            if cursor is None:
+                cursor = self._cursors[file_id] = self._open(file_id, pos)
+            try:
+                x = cursor.next()
+            except StopIteration:
+                cursor.close()
+                self._cursors.pop(file_id)
+                self._active.pop(self._cur_id)
+                continue
+            if cursor.count % self.block_length == 0:
+                self._cur_id += 1
+            return x
+
+
+class ResumableShuffleIterableDataset(IterableDatasetBase):
+    '''
+        缓冲区随机打乱 , 缓冲区读空后重新读满 , 与 fastdatasets shuffle 一致
+        每个缓冲区使用 (seed , 缓冲区序号) 的随机数 , 位置保存缓冲区起点的上游位置与已弹出条数
+        恢复时从缓冲区起点重新读满 , 最多重读 buffer_size 条
+    '''
+    def __init__(self, dataset, buffer_size: int = 4096, seed: typing.Optional[int] = None):
+        self.dataset = dataset
+        self.buffer_size = buffer_size
+        self.seed = int(np.random.randint(0, 2 ** 31 - 1)) if seed is None else seed
+        self._init_state()
+
+    def _init_state(self):
+        self.buffer = []
+        self._block = -1
+        self._popped = 0
+        self._rng = None
+        self._source_state = None
+
+    def reset(self):
+        self._init_state()
+        if self.dataset:
+            self.dataset.reset()
+
+    def __iter__(self):
+        return self
+
+    def _fill(self):
+        try:
+            self._source_state = get_dataset_state(self.dataset)
+        except ValueError:
+            self._source_state = None
+        self._block += 1
+        self._popped = 0
+        self._rng = np.random.RandomState([self.seed, self._block])
+        try:
+            for _ in range(self.buffer_size):
+                self.buffer.append(next(self.dataset))
+        except StopIteration:
+            pass
+
+    def _pop(self):
+        self._popped += 1
+        return self.buffer.pop(self._rng.randint(0, len(self.buffer)))
+
+    def __next__(self):
+        if self.buffer_size <= 1:
+            return next(self.dataset)
+        if not self.buffer:
+            self._fill()
+        if not self.buffer:
+            raise StopIteration
+        return self._pop()
+
+    def state_dict(self) -> typing.Dict:
+        if not self.buffer or self.buffer_size <= 1:
+            return {'seed': self.seed, 'block': self._block, 'popped': 0, 'filled': False,
+                    'source': get_dataset_state(self.dataset)}
+        if self._source_state is None:
+            raise ValueError('shuffle source {} does not support resume'.format(type(self.dataset).__name__))
+        return {'seed': self.seed, 'block': self._block, 'popped': self._popped, 'filled': True,
+                'source': self._source_state}
+
+    def load_state_dict(self, state: typing.Dict):
+        self._init_state()
+        self.seed = state['seed']
+        set_dataset_state(self.dataset, state['source'])
+        if state['filled']:
+            self._block = state['block'] - 1
+            self._fill()
+            for _ in range(state['popped']):
+                self._pop()
+        else:
+            self._block = state['block']
+
+
+def get_dataset_state(dataset) -> typing.Dict:
+    '''
+        迭代数据集可序列化位置 , 沿 map , filter , skip , limit , repeat , mutiprocess 包装逐层获取
+        dataset: 迭代数据集或 torch IterableDataset 包装
+    '''
+    if not isinstance(dataset, IterableDatasetBase) and hasattr(dataset, 'dataset'):
+        return get_dataset_state(dataset.dataset)
+    name = type(dataset).__name__
+    if isinstance(dataset, (ResumableIterableDataset, ResumableShuffleIterableDataset)):
+        return {'type': name, 'state': dataset.state_dict()}
+    if isinstance(dataset, (MapIterableDataset, FilterIterableDataset)):
+        state = {}
+    elif isinstance(dataset, (SkipIterableDataset, TopRandomDataset)):
+        state = {'cur_n': dataset.cur_n}
+    elif isinstance(dataset, RepeatIterableDataset):
+        state = {'cur_epoch': dataset.cur_epoch}
+    elif isinstance(dataset, ChoiseIterableDataset) and not dataset.buffer:
+        state = {}
+    else:
+        raise ValueError('{} does not support resume'.format(name))
+    return {'type': name, 'state': state, 'dataset': get_dataset_state(dataset.dataset)}
+
+
+def set_dataset_state(dataset, state: typing.Dict):
+    '''
+        恢复 get_dataset_state 保存的位置 , 数据集需按相同参数构建
+    '''
+    if not isinstance(dataset, IterableDatasetBase) and hasattr(dataset, 'dataset'):
+        return set_dataset_state(dataset.dataset, state)
+    name = type(dataset).__name__
+    if state['type'] != name:
+        raise ValueError('state type {} mismatch dataset {}'.format(state['type'], name))
+    if isinstance(dataset, (ResumableIterableDataset, ResumableShuffleIterableDataset)):
+        dataset.load_state_dict(state['state'])
+        return
+    for k, v in state['state'].items():
+        setattr(dataset, k, v)
+    set_dataset_state(dataset.dataset, state['dataset'])
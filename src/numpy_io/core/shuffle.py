@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/19 18:40
+# @Author: tk
+# @File：shuffle
+import logging
+import math
+import os
+import shutil
+import tempfile
+import typing
+from multiprocessing import Pool
+import numpy as np
+from fastdatasets.record import RECORD, writer as record_writer
+from .numpyadapter import E_file_backend, NumpyReaderAdapter, NumpyWriterAdapter
+from .converter import _shard_outputs
+from .manifest import get_manifest_path, write_manifest
+
+__all__ = [
+    'shuffle_records',
+]
+
+
+def _bucket_file(tmp_dir, part_id, bucket_id):
+    return os.path.join(tmp_dir, 'part-{:05d}-bucket-{:05d}.record'.format(part_id, bucket_id))
+
+
+def _default_max_open_files() -> int:
+    # 每个进程同时打开的桶文件数 , 取 RLIMIT_NOFILE 软限制的一半 , 其余留给源文件 , 进程池管道等
+    try:
+        import resource
+    except ImportError:
+        return 512
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return 4096
+    return max(soft // 2, 1)
+
+
+def _scatter_group(part_id, filename, num_buckets, bucket_start, bucket_stop, tmp_dir, options, tmp_options, seed):
+    # 只写入 [bucket_start, bucket_stop) 的桶 , 相同 seed 每组得到相同的分配
+    rng = np.random.RandomState(seed)
+    writers = [record_writer.WriterObject(_bucket_file(tmp_dir, part_id, k), options=tmp_options)
+               for k in range(bucket_start, bucket_stop)]
+    dataset = NumpyReaderAdapter.load(filename, E_file_backend.record, options, with_parse_from_numpy=False)
+    num = 0
+    block_size = 4096
+    buffer = []
+
+    def _write(buffer):
+        for k, b in zip(rng.randint(num_buckets, size=len(buffer)), buffer):
+            if bucket_start <= k < bucket_stop:
+                writers[k - bucket_start].write(b)
+
+    for x in dataset:
+        buffer.append(x)
+        if len(buffer) >= block_size:
+            _write(buffer)
+            num += len(buffer)
+            buffer = []
+    _write(buffer)
+    num += len(buffer)
+    dataset.close()
+    for w in writers:
+        w.close()
+    return num
+
+
+def _scatter_task(args):
+    # 第一遍: 顺序读取一个源文件 , 每条数据随机写入 K 个临时桶
+    # 桶数超过 max_open_files 时按组分多次读取源文件 , 每次只打开一组桶
+    part_id, filename, num_buckets, tmp_dir, options, tmp_options, seed, max_open_files = args
+    num = 0
+    for bucket_start in range(0, num_buckets, max_open_files):
+        num = _scatter_group(part_id, filename, num_buckets, bucket_start,
+                             min(bucket_start + max_open_files, num_buckets), tmp_dir, options, tmp_options, seed)
+    return num
+
+
+def _gather_task(args):
+    # 第二遍: 逐个桶载入内存打乱后写入输出分片
+    outfile, bucket_ids, num_parts, tmp_dir, options, tmp_options, seed, shard_id = args
+    rng = np.random.RandomState(seed)
+    writer = NumpyWriterAdapter(outfile, E_file_backend.record.name, options=options, atomic=True)
+    num = 0
+    for k in bucket_ids:
+        files = [_bucket_file(tmp_dir, p, k) for p in range(num_parts)]
+        files = [f for f in files if os.path.getsize(f) > 0]
+        if not files:
+            continue
+        dataset = NumpyReaderAdapter.load(files, E_file_backend.record, tmp_options, with_parse_from_numpy=False)
+        data = [x for x in dataset]
+        dataset.close()
+        for f in files:
+            os.remove(f)
+        for i in rng.permutation(len(data)):
+            writer.writer.file_writer.write(data[i])
+        num += len(data)
+    writer.close(num)
+    return num
+
+
+def _run(fn, tasks, num_process_worker):
+    if num_process_worker <= 0:
+        return [fn(t) for t in tasks]
+    with Pool(min(num_process_worker, len(tasks))) as pool:
+        return pool.map(fn, tasks)
+
+
+def shuffle_records(record_filenames: typing.Union[typing.List[str], str],
+                    output_files: typing.Union[typing.List[str], str],
+                    num_shards: typing.Optional[int] = None,
+                    memory_budget: int = 1024 * 1024 * 1024 * 4,
+                    num_buckets: typing.Optional[int] = None,
+                    num_process_worker: int = 4,
+                    seed: typing.Optional[int] = None,
+                    options=None,
+                    tmp_dir: typing.Optional[str] = None,
+                    compression_ratio: float = 4.0,
+                    max_open_files: typing.Optional[int] = None,
+                    with_manifest: bool = True,
+                    manifest_file: typing.Optional[str] = None) -> typing.List[str]:
+    '''
+        record 数据全局打乱 , 两遍外排: 随机分散到 K 个临时桶 , 再逐桶内存打乱写入输出分片
+        record_filenames: 源 record 文件 , 第一遍按文件并行
+        output_files: 目标文件 , 字符串且 num_shards > 1 时生成 {output}-00000-of-0000N 分片 , 第二遍按分片并行
+        memory_budget: 第二遍所有进程合计内存预算 (字节) , 用于估算桶数
+        num_buckets: 临时桶数 , 为空时按 memory_budget 估算
+        options: 源文件与输出文件的 TFRecordOptions , 默认 GZIP
+        tmp_dir: 临时桶目录 , 默认输出目录
+        compression_ratio: 压缩源文件估算解压后大小的倍数
+        max_open_files: 第一遍每个进程同时打开的桶文件数 , 默认 RLIMIT_NOFILE 软限制的一半 ,
+            桶数超过时源文件按组读取多遍
+        with_manifest: 写入数据集清单 , 默认 {output}.manifest.json , 见 manifest.write_manifest
+        return: 输出分片列表
+    '''
+    if isinstance(record_filenames, str):
+        record_filenames = [record_filenames]
+    if options is None:
+        options = RECORD.TFRecordOptions(compression_type='GZIP')
+    tmp_options = RECORD.TFRecordOptions(compression_type='')
+
+    outputs = _shard_outputs(output_files, E_file_backend.record, num_shards)
+    num_workers = max(num_process_worker, 1)
+    if num_buckets is None:
+        input_bytes = sum(os.path.getsize(f) for f in record_filenames)
+        if options.compression_type:
+            input_bytes = int(input_bytes * compression_ratio)
+        bucket_budget = max(memory_budget // min(num_workers, len(outputs)), 1)
+        num_buckets = max(int(math.ceil(input_bytes / bucket_budget)), 1)
+    num_buckets = max(num_buckets, len(outputs))
+
+    if max_open_files is None:
+        max_open_files = _default_max_open_files()
+    if max_open_files < 1:
+        raise ValueError('max_open_files must be positive , got {}'.format(max_open_files))
+    num_passes = int(math.ceil(num_buckets / max_open_files))
+    if num_passes > 1:
+        logging.warning('shuffle_records {} buckets exceed max_open_files {} , read each source file {} times , '
+                        'raise ulimit -n or memory_budget to avoid'.format(num_buckets, max_open_files, num_passes))
+
+    if tmp_dir is None:
+        tmp_dir = os.path.dirname(os.path.abspath(outputs[0]))
+    tmp_dir = tempfile.mkdtemp(prefix='.shuffle-', dir=tmp_dir)
+    logging.info('shuffle_records {} files to {} buckets in {}'.format(len(record_filenames), num_buckets, tmp_dir))
+    # 每个任务的种子在主进程生成 , fork 的子进程继承相同的全局随机状态 , 不能在子进程内取随机种子
+    task_seeds = [int(s.generate_state(1)[0]) for s in
+                  np.random.SeedSequence(seed).spawn(len(record_filenames) + len(outputs))]
+    try:
+        tasks = [(i, f, num_buckets, tmp_dir, options, tmp_options, task_seeds[i], max_open_files)
+                 for i, f in enumerate(record_filenames)]
+        total = sum(_run(_scatter_task, tasks, num_process_worker))
+
+        tasks = [(outfile, list(range(shard_id, num_buckets, len(outputs))), len(record_filenames),
+                  tmp_dir, options, tmp_options, task_seeds[len(record_filenames) + shard_id], shard_id)
+                 for shard_id, outfile in enumerate(outputs)]
+        shard_counts = _run(_gather_task, tasks, num_process_worker)
+        num_written = sum(shard_counts)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if num_written != total:
+        raise ValueError('shuffle_records: write {} records , expect {}'.format(num_written, total))
+    if with_manifest:
+        write_manifest(manifest_file or get_manifest_path(output_files), outputs, E_file_backend.record.name,
+                       counts=shard_counts, options=options)
+    return outputs
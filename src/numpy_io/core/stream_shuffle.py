@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/21 16:40
+# @Author: tk
+# @File：stream_shuffle
+import typing
+import numpy as np
+from fastdatasets.common.iterable_dataset import IterableDatasetBase
+from .cache import sizeof_sample
+from .record_index import load_record_index
+from .resumable import _RecordCursor, _ArrowCursor
+
+__all__ = [
+    'HierarchicalShuffleIterableDataset',
+]
+
+
+class HierarchicalShuffleIterableDataset(IterableDatasetBase):
+    '''
+        分层打乱顺序读取 , 内存占用只取决于 buffer_bytes
+        1. 每个 epoch 按 (seed , epoch) 打乱文件顺序 , cycle_length 个文件交错读取
+        2. 文件按块顺序读取 , record 使用写入时偏移索引分块 , 未压缩时打乱块顺序 , 压缩时从随机块开始循环读取
+           arrow_file 每个 record batch 为一块 , 无索引的文件从头顺序读取
+        3. 按字节预算的蓄水池缓冲区随机输出
+        reset 进入下一个 epoch , 所有进程使用相同 seed 时顺序一致 , 可再按进程 mutiprocess 切分
+    '''
+    def __init__(self,
+                 path: typing.Union[typing.List[str], str],
+                 backend: str = 'record',
+                 cycle_length: int = 4,
+                 block_records: int = 1024,
+                 buffer_bytes: int = 64 * 1024 * 1024,
+                 seed: int = 0,
+                 options=None,
+                 col_names: typing.Optional[typing.List[str]] = None,
+                 with_share_memory=False):
+        assert backend in ('record', 'arrow')
+        assert cycle_length > 0 and block_records > 0 and buffer_bytes > 0
+        self.path = [path] if isinstance(path, str) else list(path)
+        self.backend = backend
+        self.cycle_length = cycle_length
+        self.block_records = block_records
+        self.buffer_bytes = buffer_bytes
+        self.seed = seed
+        self.options = options
+        self.col_names = col_names
+        self.with_share_memory = with_share_memory
+        self.epoch = 0
+        self._it = None
+        self._started = False
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_it'] = None
+        state['_started'] = False
+        return state
+
+    def set_epoch(self, epoch: int):
+        self.close()
+        self.epoch = epoch
+
+    def reset(self):
+        if self._started:
+            self.epoch += 1
+        self.close()
+
+    def shard(self, num_shards: int, shard_id: int):
+        '''
+            只读取下标为 shard_id , shard_id + num_shards , ... 的文件 , 文件顺序在这部分文件内打乱
+        '''
+        self.close()
+        self.path = self.path[shard_id::num_shards]
+
+    def close(self):
+        if self._it is not None:
+            self._it.close()
+            self._it = None
+        self._started = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._it is None:
+            self._it = self._generate()
+            self._started = True
+        return next(self._it)
+
+    def _compressed(self) -> bool:
+        return bool(getattr(self.options, 'compression_type', None)) if self.options is not None else False
+
+    def _open(self, file_id: int):
+        if self.backend == 'record':
+            return _RecordCursor(self.path[file_id], self.options, self.with_share_memory)
+        return _ArrowCursor(self.path[file_id], self.options, self.col_names, self.with_share_memory)
+
+    def _file_units(self, file_id: int, cursor, rng: np.random.RandomState) -> typing.List:
+        # 块 : (起始位置 , 条数) , 起始位置为空时从头读到文件结束
+        units = None
+        if self.backend == 'record':
+            indexes = load_record_index(self.path[file_id], self.options)
+            if indexes is not None and len(indexes):
+                units = [(int(indexes[s][0]), min(self.block_records, len(indexes) - s))
+                         for s in range(0, len(indexes), self.block_records)]
+        elif cursor.reader is not None and self.with_share_memory:
+            units = [(b, -1) for b in range(cursor.reader.num_record_batches())]
+        if units is None:
+            return [(None, -1)]
+        if not units:
+            return []
+        if self.backend == 'record' and self._compressed():
+            # 压缩流向前定位需从头解压 , 只随机起点
+            k = int(rng.randint(0, len(units)))
+            return units[k:] + units[:k]
+        return [units[i] for i in rng.permutation(len(units))]
+
+    def _read_unit(self, cursor, unit):
+        start, num = unit
+        if start is None:
+            while True:
+                try:
+                    yield cursor.next()
+                except StopIteration:
+                    return
+        if self.backend == 'record':
+            cursor.offset = start
+            for _ in range(num):
+                try:
+                    yield cursor.next()
+                except StopIteration:
+                    return
+        else:
+            cursor.batch_id, cursor.row = start, 0
+            try:
+                cursor._load()
+            except StopIteration:
+                return
+            for x in cursor.rows:
+                yield x
+
+    def _iter_blocks(self, rng: np.random.RandomState):
+        queue = [int(i) for i in rng.permutation(len(self.path))]
+        active = []
+        try:
+            while queue or active:
+                while len(active) < self.cycle_length and queue:
+                    file_id = queue.pop(0)
+                    cursor = self._open(file_id)
+                    units = self._file_units(file_id, cursor, rng)
+                    if units:
+                        active.append([cursor, units])
+                    else:
+                        cursor.close()
+                for node in list(active):
+                    cursor, units = node
+                    for x in self._read_unit(cursor, units.pop(0)):
+                        yield x
+                    if not units:
+                        cursor.close()
+                        active.remove(node)
+        finally:
+            for cursor, _ in active:
+                cursor.close()
+
+    def _generate(self):
+        rng = np.random.RandomState([self.seed, self.epoch])
+        buffer = []
+        buffer_bytes = 0
+        for x in self._iter_blocks(rng):
+            if buffer_bytes < self.buffer_bytes:
+                buffer.append(x)
+                buffer_bytes += sizeof_sample(x)
+                continue
+            i = int(rng.randint(0, len(buffer)))
+            y = buffer[i]
+            buffer[i] = x
+            buffer_bytes += sizeof_sample(x) - sizeof_sample(y)
+            yield y
+        for i in rng.permutation(len(buffer)):
+            yield buffer[i]
@@ -0,0 +1,497 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/21 10:20
+# @Author: tk
+# @File：table_filter
+import operator
+import os
+import struct
+import typing
+from collections import deque
+import numpy as np
+from fastdatasets.common.iterable_dataset import IterableDatasetBase
+from fastdatasets.common.random_dataset import RandomDatasetBase, ShuffleIdsRandomDataset
+from tfrecords.python.io.arrow import ParquetReader, arrow
+
+__all__ = [
+    'normalize_filter',
+    'make_filter_fn',
+    'apply_table_filter',
+    'read_row_group_stats',
+    'ParquetProjectedIterableDataset',
+    'ParquetProjectedRandomDataset',
+]
+
+_OPS = {
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda a, b: a in b,
+    'not in': lambda a, b: a not in b,
+}
+
+FilterType = typing.Optional[typing.Union[typing.Tuple, typing.List[typing.Tuple]]]
+
+
+def normalize_filter(filter: FilterType) -> typing.List[typing.Tuple]:
+    '''
+        filter: (列名 , 操作符 , 值) 或其列表 , 多个条件为且关系
+            操作符 == != < <= > >= in , not in
+    '''
+    if not filter:
+        return []
+    if isinstance(filter, tuple) and len(filter) == 3 and isinstance(filter[0], str):
+        filter = [filter]
+    filters = []
+    for col, op, value in filter:
+        op = op.strip().lower()
+        if op not in _OPS:
+            raise ValueError('unsupported filter op {}'.format(op))
+        if op in ('in', 'not in'):
+            try:
+                value = set(value)
+            except TypeError:
+                value = list(value)
+        filters.append((col, op, value))
+    return filters
+
+
+def _filter_columns(filters: typing.List[typing.Tuple]) -> typing.List[str]:
+    return list(dict.fromkeys(f[0] for f in filters))
+
+
+def _with_filter_columns(columns: typing.Optional[typing.List[str]], filters) -> typing.Optional[typing.List[str]]:
+    if columns is None or not filters:
+        return columns
+    return list(dict.fromkeys(list(columns) + _filter_columns(filters)))
+
+
+def make_filter_fn(filter: FilterType) -> typing.Optional[typing.Callable]:
+    filters = normalize_filter(filter)
+    if not filters:
+        return None
+
+    def filter_fn(x: typing.Dict) -> bool:
+        return all(_OPS[op](x[col], value) for col, op, value in filters)
+    return filter_fn
+
+
+def _eval_filter(filters, columns: typing.Dict[str, typing.List], num_rows: int) -> np.ndarray:
+    mask = np.ones((num_rows,), dtype=bool)
+    for col, op, value in filters:
+        fn = _OPS[op]
+        mask &= np.fromiter((fn(x, value) for x in columns[col]), dtype=bool, count=num_rows)
+    return mask
+
+
+# parquet 页脚 FileMetaData 为 thrift compact 编码 , tfrecords 未导出可用的行组统计接口 , 在此只解析需要的字段
+def _read_varint(buf: bytes, pos: int) -> typing.Tuple[int, int]:
+    shift, value = 0, 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        value |= (b & 0x7f) << shift
+        if not b & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _read_zigzag(buf: bytes, pos: int) -> typing.Tuple[int, int]:
+    value, pos = _read_varint(buf, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def _read_thrift(buf: bytes, pos: int, ttype: int) -> typing.Tuple[typing.Any, int]:
+    if ttype in (1, 2):
+        return ttype == 1, pos
+    if ttype == 3:
+        return struct.unpack_from('<b', buf, pos)[0], pos + 1
+    if ttype in (4, 5, 6):
+        return _read_zigzag(buf, pos)
+    if ttype == 7:
+        return struct.unpack_from('<d', buf, pos)[0], pos + 8
+    if ttype == 8:
+        size, pos = _read_varint(buf, pos)
+        return bytes(buf[pos:pos + size]), pos + size
+    if ttype in (9, 10):
+        header = buf[pos]
+        pos += 1
+        size, etype = header >> 4, header & 0x0f
+        if size == 15:
+            size, pos = _read_varint(buf, pos)
+        values = []
+        for _ in range(size):
+            if etype in (1, 2):
+                values.append(buf[pos] == 1)
+                pos += 1
+            else:
+                v, pos = _read_thrift(buf, pos, etype)
+                values.append(v)
+        return values, pos
+    if ttype == 11:
+        size, pos = _read_varint(buf, pos)
+        if size == 0:
+            return {}, pos
+        ktype, vtype = buf[pos] >> 4, buf[pos] & 0x0f
+        pos += 1
+        values = {}
+        for _ in range(size):
+            k, pos = _read_thrift(buf, pos, ktype)
+            values[k], pos = _read_thrift(buf, pos, vtype)
+        return values, pos
+    if ttype == 12:
+        fields, field_id = {}, 0
+        while True:
+            header = buf[pos]
+            pos += 1
+            if header == 0:
+                return fields, pos
+            delta, ftype = header >> 4, header & 0x0f
+            if delta:
+                field_id += delta
+            else:
+                field_id, pos = _read_zigzag(buf, pos)
+            fields[field_id], pos = _read_thrift(buf, pos, ftype)
+    raise ValueError('unsupported thrift type {}'.format(ttype))
+
+
+# parquet 物理类型 -> 统计值解码 , 其余类型不参与裁剪
+_STAT_DECODERS = {
+    0: lambda b: bool(b[0]),
+    1: lambda b: struct.unpack('<i', b)[0],
+    2: lambda b: struct.unpack('<q', b)[0],
+    4: lambda b: struct.unpack('<f', b)[0],
+    5: lambda b: struct.unpack('<d', b)[0],
+    6: lambda b: b.decode('utf-8'),
+}
+
+
+def read_row_group_stats(path: str) -> typing.Optional[typing.List[typing.Tuple[int, typing.Dict[str, typing.Tuple]]]]:
+    '''
+        读取 parquet 页脚中每个行组的行数及顶层列统计 , [(行数 , {列名: (最小值 , 最大值 , 空值数)})]
+        页脚无法解析 (如加密) 时返回 None
+    '''
+    try:
+        with open(path, mode='rb') as f:
+            f.seek(-8, os.SEEK_END)
+            tail = f.read(8)
+            if tail[4:] != b'PAR1':
+                return None
+            size = struct.unpack('<i', tail[:4])[0]
+            f.seek(-8 - size, os.SEEK_END)
+            meta, _ = _read_thrift(f.read(size), 0, 12)
+        groups = []
+        for row_group in meta.get(4, []):
+            stats = {}
+            for chunk in row_group.get(1, []):
+                col_meta = chunk.get(3, {})
+                path_in_schema, decode, st = col_meta.get(3, []), _STAT_DECODERS.get(col_meta.get(1)), col_meta.get(12)
+                if len(path_in_schema) != 1 or decode is None or st is None or 5 not in st or 6 not in st:
+                    continue
+                stats[path_in_schema[0].decode('utf-8')] = (decode(st[6]), decode(st[5]), st.get(3))
+            groups.append((row_group.get(3, 0), stats))
+        return groups
+    except (OSError, ValueError, IndexError, struct.error, UnicodeDecodeError):
+        return None
+
+
+def _stat_match(op: str, value, lo, hi, null_count) -> typing.Optional[bool]:
+    # 按最小 / 最大值判断行组 : False 全部不命中 , True 全部命中 , None 需逐行计算
+    no_null = null_count == 0
+    if op in ('==', '='):
+        if value < lo or value > hi:
+            return False
+        return True if no_null and lo == hi == value else None
+    if op == '!=':
+        if no_null and lo == hi == value:
+            return False
+        return True if no_null and (value < lo or value > hi) else None
+    if op == '<':
+        return False if lo >= value else (True if no_null and hi < value else None)
+    if op == '<=':
+        return False if lo > value else (True if no_null and hi <= value else None)
+    if op == '>':
+        return False if hi <= value else (True if no_null and lo > value else None)
+    if op == '>=':
+        return False if hi < value else (True if no_null and lo >= value else None)
+    if op == 'in':
+        if all(v < lo or v > hi for v in value):
+            return False
+        return True if no_null and lo == hi and lo in value else None
+    if op == 'not in':
+        if no_null and lo == hi and lo in value:
+            return False
+        return True if no_null and all(v < lo or v > hi for v in value) else None
+    return None
+
+
+def _prune_row_group(filters, stats: typing.Dict[str, typing.Tuple]) -> typing.Optional[bool]:
+    # 条件为且关系 : 任一条件全部不命中则跳过 , 全部条件全部命中则不必读取过滤列
+    result = True
+    for col, op, value in filters:
+        if col not in stats:
+            result = None
+            continue
+        lo, hi, null_count = stats[col]
+        try:
+            match = _stat_match(op, value, lo, hi, null_count)
+        except TypeError:
+            match = None
+        if match is False:
+            return False
+        if match is None:
+            result = None
+    return result
+
+
+def _project_fn(columns: typing.List[str]) -> typing.Callable:
+    def project(x: typing.Dict) -> typing.Dict:
+        return {k: x[k] for k in columns}
+    return project
+
+
+def apply_table_filter(dataset, columns: typing.Optional[typing.List[str]], filter: FilterType):
+    '''
+        arrow 等表格数据集按行过滤 , 去除仅用于过滤的列
+        dataset 需已按 columns 与过滤列投影读取
+    '''
+    filters = normalize_filter(filter)
+    if not filters:
+        return dataset
+    filter_fn = make_filter_fn(filters)
+    if isinstance(dataset, typing.Iterator):
+        dataset = dataset.filter(filter_fn)
+    else:
+        indices = [i for i in range(len(dataset)) if filter_fn(dataset[i])]
+        dataset = ShuffleIdsRandomDataset(dataset, shuffle_idx=indices, size=len(indices))
+    if columns is not None and any(c not in columns for c in _filter_columns(filters)):
+        dataset = dataset.map(_project_fn(list(columns)))
+    return dataset
+
+
+def _cell_value(col, i: int):
+    # 与 fastdatasets parquet 读取一致的单元格解码
+    if isinstance(col, arrow.MapArray):
+        it = col.value_slice(i)
+        ks, vs = it.field(0), it.field(1)
+        return {ks.Value(_): vs.Value(_) for _ in range(it.length())}
+    if isinstance(col, arrow.ListArray):
+        it = col.value_slice(i)
+        if isinstance(it, arrow.MapArray):
+            arr_ = []
+            for _ in range(it.length()):
+                t_ = it.value_slice(_)
+                ks, vs = t_.field(0), t_.field(1)
+                arr_.append({ks.Value(__): vs.Value(__) for __ in range(ks.length())})
+            return arr_
+        return [it.Value(_) for _ in range(it.length())]
+    return col.Value(i)
+
+
+class _ParquetFile:
+    def __init__(self, path: str, options=None, with_share_memory=True):
+        self.reader = ParquetReader(path, options=options, memory_map=with_share_memory)
+        schema = self.reader.get_schema()
+        schema = schema.Value() if hasattr(schema, 'Value') else schema
+        self.field_names = schema.field_names()
+        self.num_row_groups = self.reader.num_row_groups()
+        self.path = path
+
+    def close(self):
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+
+    def column_indices(self, names: typing.List[str]) -> typing.List[int]:
+        missing = [n for n in names if n not in self.field_names]
+        if missing:
+            raise ValueError('columns {} not found , available {}'.format(missing, self.field_names))
+        return [self.field_names.index(n) for n in names]
+
+    def read(self, row_groups: typing.List[int], names: typing.List[str]):
+        # 只读取指定行组的指定列 , 返回 (列名 -> arrow 数组 , 行数)
+        table = self.reader.read_row_groups(row_groups, self.column_indices(names))
+        batch = table.CombineChunksToBatch(pool=arrow.default_memory_pool()).Value()
+        return {n: batch.GetColumnByName(n) for n in names}, batch.num_rows()
+
+    def select_row_groups(self, filters) -> typing.Tuple[typing.List[int], typing.List[np.ndarray]]:
+        '''
+            先按页脚行组统计 (最小 / 最大值) 裁剪 , 余下行组只读取过滤列计算每个行组的命中行 ,
+            无命中的行组不读取数据列 , 统计判定全部命中的行组不读取过滤列
+        '''
+        if not filters:
+            return list(range(self.num_row_groups)), [None] * self.num_row_groups
+        names = _filter_columns(filters)
+        stats = read_row_group_stats(self.path)
+        if stats is not None and len(stats) != self.num_row_groups:
+            stats = None
+        groups, masks = [], []
+        for i in range(self.num_row_groups):
+            match = _prune_row_group(filters, stats[i][1]) if stats is not None else None
+            if match is False:
+                continue
+            if match is True:
+                groups.append(i)
+                masks.append(np.ones((stats[i][0],), dtype=bool))
+                continue
+            cols, num_rows = self.read([i], names)
+            values = {n: [_cell_value(c, j) for j in range(num_rows)] for n, c in cols.items()}
+            mask = _eval_filter(filters, values, num_rows)
+            if mask.any():
+                groups.append(i)
+                masks.append(mask)
+        return groups, masks
+
+
+def _resolve_columns(pf: _ParquetFile, columns: typing.Optional[typing.List[str]]) -> typing.List[str]:
+    return list(columns) if columns is not None else list(pf.field_names)
+
+
+class ParquetProjectedIterableDataset(IterableDatasetBase):
+    '''
+        parquet 列投影与行组过滤顺序读取
+        columns: 读取的列 , 其余列的数据块不读取
+        filter: 见 normalize_filter , 按行组统计及过滤列跳过全部不命中的行组
+        cycle_length , block_length: 同时打开 cycle_length 个文件 , 每个文件轮流读取 block_length 条 , 与 parquet_loader 一致
+    '''
+    def __init__(self,
+                 path: typing.Union[typing.List[str], str],
+                 columns: typing.Optional[typing.List[str]] = None,
+                 filter: FilterType = None,
+                 options=None,
+                 with_share_memory=True,
+                 cycle_length: int = 1,
+                 block_length: int = 1):
+        self.path = [path] if isinstance(path, str) else list(path)
+        self.columns = columns
+        self.filters = normalize_filter(filter)
+        self.options = options
+        self.with_share_memory = with_share_memory
+        self.cycle_length = max(cycle_length, 1)
+        self.block_length = max(block_length, 1)
+        self.num_row_groups = 0
+        self.num_row_groups_skipped = 0
+        self._active = []
+        self.reset()
+
+    def reset(self):
+        self.close()
+        self._queue = list(range(len(self.path)))
+        self._cursor = 0
+        self._block_count = 0
+
+    def close(self):
+        # 打开的文件 : [_ParquetFile , 待读行组 , 已读行]
+        for pf, _, _ in getattr(self, '_active', []):
+            pf.close()
+        self._active = []
+
+    def __iter__(self):
+        return self
+
+    def _open_next(self) -> bool:
+        while self._queue:
+            path = self.path[self._queue.pop(0)]
+            if not os.path.exists(path):
+                continue
+            pf = _ParquetFile(path, self.options, self.with_share_memory)
+            groups, masks = pf.select_row_groups(self.filters)
+            self.num_row_groups += pf.num_row_groups
+            self.num_row_groups_skipped += pf.num_row_groups - len(groups)
+            if not groups:
+                pf.close()
+                continue
+            self._active.append([pf, list(zip(groups, masks)), deque()])
+            return True
+        return False
+
+    def _fill(self, node) -> bool:
+        pf, groups, rows = node
+        while not rows and groups:
+            group, mask = groups.pop(0)
+            cols, num_rows = pf.read([group], _resolve_columns(pf, self.columns))
+            index = range(num_rows) if mask is None else np.nonzero(mask)[0].tolist()
+            rows.extend({n: _cell_value(c, i) for n, c in cols.items()} for i in index)
+        return len(rows) > 0
+
+    def __next__(self):
+        while True:
+            while len(self._active) < self.cycle_length and self._open_next():
+                pass
+            if not self._active:
+                raise StopIteration
+            self._cursor %= len(self._active)
+            node = self._active[self._cursor]
+            if not self._fill(node):
+                node[0].close()
+                self._active.pop(self._cursor)
+                self._block_count = 0
+                continue
+            self._block_count += 1
+            if self._block_count >= self.block_length:
+                self._block_count = 0
+                self._cursor += 1
+            return node[2].popleft()
+
+
+class ParquetProjectedRandomDataset(RandomDatasetBase):
+    '''
+        parquet 列投影与行组过滤随机读取 , 只读取命中行组的投影列 , 按命中行编号
+    '''
+    def __init__(self,
+                 path: typing.Union[typing.List[str], str],
+                 columns: typing.Optional[typing.List[str]] = None,
+                 filter: FilterType = None,
+                 options=None,
+                 with_share_memory=True):
+        self.path = [path] if isinstance(path, str) else list(path)
+        self.columns = columns
+        self.filters = normalize_filter(filter)
+        self.options = options
+        self.with_share_memory = with_share_memory
+        self.reset()
+
+    def reset(self):
+        self.close()
+        self._parts = []
+        self.num_row_groups = 0
+        self.num_row_groups_skipped = 0
+        for path in self.path:
+            if not os.path.exists(path):
+                continue
+            pf = _ParquetFile(path, self.options, self.with_share_memory)
+            groups, masks = pf.select_row_groups(self.filters)
+            self.num_row_groups += pf.num_row_groups
+            self.num_row_groups_skipped += pf.num_row_groups - len(groups)
+            if not groups:
+                pf.close()
+                continue
+            cols, num_rows = pf.read(groups, _resolve_columns(pf, self.columns))
+            if self.filters:
+                rows = np.nonzero(np.concatenate(masks))[0]
+            else:
+                rows = np.arange(num_rows)
+            self._parts.append((pf, cols, rows))
+        self._cumsum = np.cumsum([len(p[2]) for p in self._parts], dtype=np.int64)
+
+    def close(self):
+        for pf, _, _ in getattr(self, '_parts', []):
+            pf.close()
+        self._parts = []
+
+    def __len__(self):
+        return int(self._cumsum[-1]) if len(self._cumsum) else 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= len(self):
+            raise OverflowError
+        part_id = int(np.searchsorted(self._cumsum, item, side='right'))
+        real_index = item - (int(self._cumsum[part_id - 1]) if part_id > 0 else 0)
+        _, cols, rows = self._parts[part_id]
+        i = int(rows[real_index])
+        return {n: _cell_value(c, i) for n, c in cols.items()}
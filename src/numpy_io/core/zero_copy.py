@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/22 14:20
+# @Author: tk
+# @File：zero_copy
+import ctypes
+import typing
+import numpy as np
+from fastdatasets.common.random_dataset import RandomDatasetBase
+from tfrecords.python.io.arrow import arrow
+from .table_filter import _cell_value
+
+__all__ = [
+    'buffer_view',
+    'ColumnView',
+    'TableNumpyViewRandomDataset',
+]
+
+# arrow 定长数值类型 -> numpy dtype , bool 按位存储不在其中
+_NUMPY_DTYPES = {
+    'INT8': np.int8,
+    'INT16': np.int16,
+    'INT32': np.int32,
+    'INT64': np.int64,
+    'UINT8': np.uint8,
+    'UINT16': np.uint16,
+    'UINT32': np.uint32,
+    'UINT64': np.uint64,
+    'HALF_FLOAT': np.float16,
+    'FLOAT': np.float32,
+    'DOUBLE': np.float64,
+}
+
+_LIST_OFFSET_DTYPES = {
+    'LIST': np.int32,
+    'LARGE_LIST': np.int64,
+}
+
+
+def _type_name(arr) -> str:
+    return arr.type().id().name
+
+
+def buffer_view(buf, dtype) -> np.ndarray:
+    '''
+        arrow Buffer 只读 numpy 视图 , 不复制 , 视图持有 Buffer 引用
+    '''
+    if buf is None or buf.size() == 0:
+        return np.zeros((0,), dtype=dtype)
+    c_buf = (ctypes.c_char * buf.size()).from_address(buf.address())
+    c_buf._owner = buf
+    out = np.frombuffer(c_buf, dtype=dtype, count=buf.size() // np.dtype(dtype).itemsize)
+    out.flags.writeable = False
+    return out
+
+
+def _primitive_view(arr) -> typing.Optional[np.ndarray]:
+    dtype = _NUMPY_DTYPES.get(_type_name(arr))
+    if dtype is None or arr.null_count() > 0:
+        return None
+    offset = arr.offset()
+    return buffer_view(arr.data().buffers[1], dtype)[offset: offset + arr.length()]
+
+
+class ColumnView:
+    '''
+        arrow 列按行取 numpy 视图
+        定长数值列 : 取行为标量
+        定长数值 list 列 : 取行为 values 缓冲区切片视图
+        含 null 或其他类型列按 fastdatasets 方式解码
+    '''
+    def __init__(self, col):
+        self.col = col
+        self.values = None
+        self.offsets = None
+        name = _type_name(col)
+        if name in _LIST_OFFSET_DTYPES:
+            values = _primitive_view(col.values())
+            if values is not None and col.null_count() == 0:
+                offset = col.offset()
+                self.offsets = buffer_view(col.data().buffers[1], _LIST_OFFSET_DTYPES[name])[offset: offset + col.length() + 1]
+                self.values = values
+        else:
+            self.values = _primitive_view(col)
+
+    @property
+    def is_view(self) -> bool:
+        return self.values is not None
+
+    def __getitem__(self, i: int):
+        if self.values is None:
+            return _cell_value(self.col, i)
+        if self.offsets is None:
+            return self.values[i]
+        return self.values[self.offsets[i]: self.offsets[i + 1]]
+
+
+def _table_parts(dataset) -> typing.List[typing.Tuple[typing.Dict, typing.Optional[np.ndarray], int]]:
+    # fastdatasets arrow , parquet 单文件 / 多文件随机数据集及 ParquetProjectedRandomDataset
+    if hasattr(dataset, '_parts'):
+        return [(cols, rows, len(rows)) for _, cols, rows in dataset._parts]
+    if hasattr(dataset, 'iterators_'):
+        insts = [it_obj['inst'] for it_obj in dataset.iterators_]
+    else:
+        insts = [dataset]
+    parts = []
+    for inst in insts:
+        if getattr(inst, 'cols', None) is None or len(inst) == 0:
+            continue
+        parts.append((dict(zip(inst._cache_col_names, inst.cols)), None, len(inst)))
+    return parts
+
+
+class TableNumpyViewRandomDataset(RandomDatasetBase):
+    '''
+        arrow , parquet 随机数据集按列返回 numpy 视图 , 不复制数据
+        定长数值列返回 numpy 标量 , 定长数值 list 列返回只读 numpy 数组 , 其余列与原数据集一致
+        视图引用底层 arrow 缓冲区 , 不可原地修改 , 需要修改时先 copy
+    '''
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self._build()
+
+    def _build(self):
+        parts = _table_parts(self.dataset)
+        self._parts = [({n: ColumnView(c) for n, c in cols.items()}, rows) for cols, rows, _ in parts]
+        self._cumsum = np.cumsum([length for _, _, length in parts], dtype=np.int64)
+
+    def reset(self):
+        self.dataset.reset()
+        self._build()
+
+    def close(self):
+        self._parts = []
+        self.dataset.close()
+
+    def __len__(self):
+        return int(self._cumsum[-1]) if len(self._cumsum) else 0
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.__getitem_slice__(item)
+        if item < 0 or item >= len(self):
+            raise OverflowError
+        part_id = int(np.searchsorted(self._cumsum, item, side='right'))
+        real_index = item - (int(self._cumsum[part_id - 1]) if part_id > 0 else 0)
+        views, rows = self._parts[part_id]
+        if rows is not None:
+            real_index = int(rows[real_index])
+        return {n: v[real_index] for n, v in views.items()}
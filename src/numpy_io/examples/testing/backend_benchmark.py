@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/23 14:30
+# @Author  : tk
+# @FileName: backend_benchmark
+# 各 E_file_backend 端到端基准 : 写入吞吐 , 随机读 , 批量读 , 顺序读 , 冷启动 , 磁盘大小 , 峰值内存
+# 每个用例在新进程中运行 , 启动耗时包含导入 numpy_io , 峰值内存互不影响
+# python backend_benchmark.py --num_records 100000 --num_process_worker 0 4 --batch_size 0 1000 --output result.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+ALL_BACKENDS = ['record', 'leveldb', 'lmdb', 'memory', 'memory_raw', 'arrow_stream', 'arrow_file', 'parquet']
+MEMORY_BACKENDS = ('memory', 'memory_raw')
+TABLE_BACKENDS = ('arrow_stream', 'arrow_file', 'parquet')
+
+TABLE_SCHEMA = {
+    'input_ids': 'int32_list',
+    'labels': 'int32_list',
+    'seqlen': 'int32',
+}
+
+
+def make_record(index, args):
+    import numpy as np
+    # 按下标生成 , 不同进程 , 不同后端写入相同数据
+    rng = np.random.RandomState(args['seed'] + index)
+    seq_len = int(rng.randint(args['min_seq_len'], args['max_seq_len'] + 1))
+    input_ids = rng.randint(0, args['vocab_size'], size=(seq_len,), dtype=np.int32)
+    return {
+        'input_ids': input_ids,
+        'labels': np.roll(input_ids, -1),
+        'seqlen': np.asarray(seq_len, dtype=np.int32),
+    }
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    # linux 单位 KB , macos 单位字节 , 包含已结束的写进程
+    rss = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def _disk_size(outfile: str) -> int:
+    # leveldb , lmdb 为目录
+    if not os.path.isdir(outfile):
+        return os.path.getsize(outfile)
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(outfile) for f in files)
+
+
+def _write(case, outfile):
+    from numpy_io.core.writer import DataWriteHelper
+    backend = case['backend']
+    num_process_worker = 0 if backend in MEMORY_BACKENDS else case['num_process_worker']
+    writer = DataWriteHelper(make_record, case, outfile, backend=backend,
+                             num_process_worker=num_process_worker, shuffle=False)
+    start = time.perf_counter()
+    writer.save(list(range(case['num_records'])),
+                schema=TABLE_SCHEMA if backend in TABLE_BACKENDS else None,
+                batch_size=case['batch_size'] or None)
+    cost = time.perf_counter() - start
+    return {
+        'write_s': cost,
+        'write_records_per_s': case['num_records'] / cost,
+        'disk_bytes': None if backend in MEMORY_BACKENDS else _disk_size(outfile),
+    }
+
+
+def _read(case, outfile, start_time):
+    import numpy as np
+    from numpy_io.core.reader import load_numpy_dataset
+    from numpy_io.core.batch import fetch_batch
+    backend = case['backend']
+    res = {}
+
+    dataset = load_numpy_dataset(outfile, backend=backend)
+    dataset[0]
+    res['startup_s'] = time.perf_counter() - start_time
+    num = len(dataset)
+    assert num == case['num_records'], (num, case['num_records'])
+
+    rng = np.random.RandomState(case['seed'])
+    indices = rng.randint(0, num, size=(case['num_random_reads'],))
+    start = time.perf_counter()
+    for i in indices:
+        dataset[int(i)]
+    res['random_read_records_per_s'] = len(indices) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for k in range(0, len(indices), case['read_batch_size']):
+        fetch_batch(dataset, indices[k: k + case['read_batch_size']])
+    res['batch_read_records_per_s'] = len(indices) / (time.perf_counter() - start)
+
+    # leveldb , lmdb , 内存后端没有迭代读取 , 按下标顺序遍历
+    if backend not in MEMORY_BACKENDS:
+        dataset.close()
+        dataset = load_numpy_dataset(outfile, backend=backend, with_record_iterable_dataset=True)
+    start = time.perf_counter()
+    it = dataset if isinstance(dataset, typing.Iterator) else (dataset[i] for i in range(num))
+    n = sum(1 for _ in it)
+    res['sequential_read_records_per_s'] = n / (time.perf_counter() - start)
+    return res
+
+
+def run_case(case) -> dict:
+    # 子进程中运行 , phase 为 write 或 read , 内存后端数据不落盘 , 写读在同一进程
+    start_time = time.perf_counter()
+    backend = case['backend']
+    res = {}
+    if backend in MEMORY_BACKENDS:
+        outfile = []
+        res.update(_write(case, outfile))
+        start_time = time.perf_counter()
+        res.update(_read(case, outfile, start_time))
+    elif case['phase'] == 'write':
+        res.update(_write(case, case['outfile']))
+    else:
+        res.update(_read(case, case['outfile'], start_time))
+    res['peak_rss_mb'] = _peak_rss_mb()
+    return res
+
+
+def _spawn(case) -> dict:
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--_case', json.dumps(case)],
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if out.returncode != 0:
+        lines = out.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else 'exit code {}'.format(out.returncode)}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _remove_outputs(outfile: str):
+    from numpy_io.core.marker import remove_path, remove_done_marker
+    from numpy_io.core.record_index import get_record_index_path
+    remove_done_marker(outfile)
+    remove_path(outfile)
+    remove_path(get_record_index_path(outfile))
+
+
+def run_benchmark(args) -> list:
+    results = []
+    root = args.output_dir or tempfile.mkdtemp(prefix='numpy_io_benchmark_')
+    os.makedirs(root, exist_ok=True)
+    case_args = dict(seed=args.seed,
+                     num_records=args.num_records,
+                     min_seq_len=args.min_seq_len,
+                     max_seq_len=args.max_seq_len,
+                     vocab_size=args.vocab_size,
+                     num_random_reads=args.num_random_reads,
+                     read_batch_size=args.read_batch_size)
+    try:
+        for backend in args.backends:
+            workers = [0] if backend in MEMORY_BACKENDS else args.num_process_worker
+            for num_process_worker in workers:
+                for batch_size in args.batch_size:
+                    outfile = os.path.join(root, 'data_{}_{}_{}.{}'.format(backend, num_process_worker, batch_size, backend))
+                    case = dict(case_args, backend=backend, num_process_worker=num_process_worker,
+                                batch_size=batch_size, outfile=outfile)
+                    row = {'backend': backend, 'num_process_worker': num_process_worker, 'batch_size': batch_size}
+                    for repeat in range(args.repeats):
+                        if backend in MEMORY_BACKENDS:
+                            res = _spawn(dict(case, phase='all'))
+                        else:
+                            res = _spawn(dict(case, phase='write'))
+                            if 'error' not in res:
+                                res['write_peak_rss_mb'] = res.pop('peak_rss_mb')
+                                read_res = _spawn(dict(case, phase='read'))
+                                res.update(read_res if 'error' not in read_res else {'error': read_res['error']})
+                            if not args.keep_files:
+                                _remove_outputs(outfile)
+                        results.append(dict(row, repeat=repeat, **res))
+                        print(_format_row(results[-1]), file=sys.stderr)
+    finally:
+        if not args.output_dir and not args.keep_files:
+            shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+_COLUMNS = [
+    # 结果键 , 表头 , 宽度 , 格式
+    ('num_process_worker', 'nw', 3, ''),
+    ('batch_size', 'batch', 6, ''),
+    ('write_records_per_s', 'write/s', 10, '.0f'),
+    ('random_read_records_per_s', 'rand/s', 10, '.0f'),
+    ('batch_read_records_per_s', 'batch/s', 10, '.0f'),
+    ('sequential_read_records_per_s', 'seq/s', 10, '.0f'),
+    ('startup_s', 'start_s', 8, '.3f'),
+    ('disk_bytes', 'disk_bytes', 12, ''),
+    ('peak_rss_mb', 'rss_mb', 8, '.1f'),
+]
+
+
+def _format_header() -> str:
+    return ' '.join(['{:<13}'.format('backend')] + [name.rjust(width) for _, name, width, _ in _COLUMNS])
+
+
+def _format_row(row) -> str:
+    out = ['{:<13}'.format(row['backend'])]
+    if 'error' in row:
+        return ' '.join(out + [str(row['num_process_worker']).rjust(3), str(row['batch_size']).rjust(6),
+                               'error: ' + row['error']])
+    for key, _, width, spec in _COLUMNS:
+        v = row.get(key)
+        out.append(('-' if v is None else format(v, spec)).rjust(width))
+    return ' '.join(out)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--backends', type=str, nargs='*', default=ALL_BACKENDS, choices=ALL_BACKENDS)
+    parser.add_argument('--num_records', type=int, default=20000)
+    parser.add_argument('--min_seq_len', type=int, default=64)
+    parser.add_argument('--max_seq_len', type=int, default=512)
+    parser.add_argument('--vocab_size', type=int, default=32000)
+    parser.add_argument('--num_process_worker', type=int, nargs='*', default=[0])
+    parser.add_argument('--batch_size', type=int, nargs='*', default=[0], help='写入批大小 , 0 为后端默认')
+    parser.add_argument('--num_random_reads', type=int, default=5000)
+    parser.add_argument('--read_batch_size', type=int, default=64)
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output_dir', type=str, default=None, help='数据目录 , 默认临时目录')
+    parser.add_argument('--keep_files', action='store_true')
+    parser.add_argument('--output', type=str, default=None, help='json 结果文件 , 默认输出到 stdout')
+    parser.add_argument('--_case', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._case is not None:
+        print(json.dumps(run_case(json.loads(args._case))))
+        return
+
+    print(_format_header(), file=sys.stderr)
+    results = run_benchmark(args)
+    report = {
+        'time': int(time.time()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'args': {k: v for k, v in vars(args).items() if k != '_case'},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == '__main__':
+    main()
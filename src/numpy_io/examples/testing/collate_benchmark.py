@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/22 10:10
+# @Author  : tk
+# @FileName: collate_benchmark
+# NumpyCollate 与 torch default_collate 对比
+import argparse
+import time
+import numpy as np
+from torch.utils.data import default_collate
+from numpy_io.pytorch_loader.collate import NumpyCollate
+
+
+def make_samples(batch_size, seq_len, num_fields, rng, with_var_len=False):
+    samples = []
+    for _ in range(batch_size):
+        n = int(rng.randint(seq_len // 2, seq_len + 1)) if with_var_len else seq_len
+        x = {'field_{}'.format(k): rng.randint(0, 32000, size=(n,)).astype(np.int32) for k in range(num_fields)}
+        x['label'] = np.int64(rng.randint(0, 10))
+        samples.append(x)
+    return samples
+
+
+def bench(fn, batches, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for b in batches:
+            fn(b)
+    return (time.perf_counter() - start) / (repeats * len(batches)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_size', type=int, default=32)
+    parser.add_argument('--num_fields', type=int, default=4)
+    parser.add_argument('--num_batches', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    collate = NumpyCollate()
+    pad_collate = NumpyCollate(default_pad_value=0)
+    print('{:>8} {:>16} {:>16} {:>8}'.format('seq_len', 'default_collate', 'NumpyCollate', 'speedup'))
+    for seq_len in (16, 128, 1024):
+        batches = [make_samples(args.batch_size, seq_len, args.num_fields, rng) for _ in range(args.num_batches)]
+        t_default = bench(default_collate, batches, args.repeats)
+        t_numpy = bench(collate, batches, args.repeats)
+        print('{:>8} {:>14.1f}us {:>14.1f}us {:>7.2f}x'.format(seq_len, t_default, t_numpy, t_default / t_numpy))
+
+    batches = [make_samples(args.batch_size, 512, args.num_fields, rng, with_var_len=True)
+               for _ in range(args.num_batches)]
+    t_pad = bench(pad_collate, batches, args.repeats)
+    print('dynamic padding seq_len<=512: {:.1f}us per batch'.format(t_pad))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/22 21:30
+# @Author  : tk
+# @FileName: import_benchmark
+# 各模块冷启动导入耗时 , 每次在新进程中导入 , 可设置上限用于 CI 检查
+# --baseline_ref 导出指定 git 版本的 src 作对比 , 如 python import_benchmark.py --baseline_ref 4fba635^
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_MODULES = [
+    'numpy_io',
+    'numpy_io.core.numpyadapter',
+    'numpy_io.core.reader',
+    'numpy_io.core.writer',
+    'numpy_io.pytorch_loader.tokenizer_config_helper',
+    'numpy_io.pytorch_loader.data_helper',
+    'numpy_io.pytorch_loader.dataloaders',
+]
+
+# 必需依赖的导入耗时 , numpy_io 无法低于该值 , fastdatasets 导入 tfrecords 时已加载其 arrow 库
+DEPENDENCY_FLOOR = 'numpy, fastdatasets.record'
+
+# 导入后检查是否已加载 , 慢依赖应推迟到第一次使用
+HEAVY_MODULES = ['torch', 'transformers', 'fastdatasets.leveldb', 'fastdatasets.lmdb',
+                 'fastdatasets.arrow', 'fastdatasets.parquet']
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+_SCRIPT = '''
+import json, sys, time
+start = time.perf_counter()
+import {module}
+cost = time.perf_counter() - start
+print(json.dumps({{"ms": cost * 1000, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+
+def import_time(module: str, repeats: int, src_dir: str = SRC_DIR):
+    costs, loaded = [], []
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([src_dir] + [p for p in [os.environ.get('PYTHONPATH')] if p]))
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', _SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                             stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, env=env)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1:]
+        info = json.loads(out.stdout.strip().splitlines()[-1])
+        costs.append(info['ms'])
+        loaded = info['loaded']
+    return min(costs), loaded
+
+
+def export_src(ref: str, root: str) -> str:
+    # git archive 导出 ref 的 src 目录 , 不改动工作区
+    top = subprocess.check_output(['git', 'rev-parse', '--show-toplevel'], cwd=SRC_DIR, universal_newlines=True).strip()
+    archive = subprocess.run(['git', 'archive', ref, 'src'], cwd=top, stdout=subprocess.PIPE, check=True)
+    subprocess.run(['tar', '-x', '-C', root], input=archive.stdout, check=True)
+    return os.path.join(root, 'src')
+
+
+def _format_ms(ms) -> str:
+    return '-' if ms is None else '{:.1f}'.format(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=str, nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max_ms', type=float, default=None, help='超过上限时返回非 0')
+    parser.add_argument('--baseline_ref', type=str, default=None, help='对比的 git 版本 , 如 HEAD~1')
+    parser.add_argument('--json', action='store_true', help='输出 json')
+    args = parser.parse_args()
+
+    baseline_root = tempfile.mkdtemp(prefix='numpy_io_import_') if args.baseline_ref else None
+    try:
+        baseline_src = export_src(args.baseline_ref, baseline_root) if baseline_root else None
+        results = []
+        for module in [DEPENDENCY_FLOOR] + args.modules:
+            ms, loaded = import_time(module, args.repeats)
+            r = {'module': module, 'ms': ms, 'loaded': loaded}
+            if baseline_src is not None:
+                r['baseline_ms'], r['baseline_loaded'] = import_time(module, args.repeats, baseline_src)
+            results.append(r)
+    finally:
+        if baseline_root:
+            shutil.rmtree(baseline_root, ignore_errors=True)
+
+    failed = [r for r in results[1:] if r['ms'] is None or (args.max_ms is not None and r['ms'] > args.max_ms)]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=1))
+    else:
+        print('{:<50} {:>10} {:>12}  {}'.format('module', 'ms', 'baseline_ms', 'loaded'))
+        for r in results:
+            ms = 'error' if r['ms'] is None else _format_ms(r['ms'])
+            baseline_ms = 'error' if 'baseline_ms' in r and r['baseline_ms'] is None else _format_ms(r.get('baseline_ms'))
+            print('{:<50} {:>10} {:>12}  {}'.format(r['module'], ms, baseline_ms, ','.join(r['loaded'])))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
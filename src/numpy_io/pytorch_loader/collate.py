@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/22 9:40
+# @Author  : tk
+# @FileName: collate
+import typing
+import numpy as np
+import torch
+
+__all__ = [
+    'NumpyCollate',
+]
+
+
+class NumpyCollate:
+    '''
+        dict 样本按键合并 , numpy 数组写入预分配的 batch 数组 , 每个键只调用一次 torch.from_numpy
+        pad_values: 需要动态补齐的键及补齐值 , 按 batch 内第一维最大长度补齐 , 例如 {'input_ids': 0, 'labels': -100}
+        default_pad_value: 未在 pad_values 中的变长键的补齐值 , 为空时变长键报错
+        pad_to_multiple_of: 补齐长度取整倍数 , 只作用于补齐的键 : pad_values 中的键 , 及按 default_pad_value 补齐的变长键 ,
+            batch 内等长且不在 pad_values 中的键不补齐 , pad_values , default_pad_value 均为空时报错
+        with_torch: 返回 torch.Tensor , 否则返回 numpy 数组
+        torch.Tensor 样本 (见 dataloaders with_tensor_view) 按 numpy 视图合并 , 只在写入 batch 时复制
+        字符串等非数值数据保留为 list
+    '''
+    def __init__(self,
+                 pad_values: typing.Optional[typing.Dict[str, typing.Any]] = None,
+                 default_pad_value: typing.Optional[typing.Any] = None,
+                 pad_to_multiple_of: typing.Optional[int] = None,
+                 with_torch: bool = True):
+        self.pad_values = pad_values or {}
+        self.default_pad_value = default_pad_value
+        if pad_to_multiple_of is not None:
+            if pad_to_multiple_of <= 0:
+                raise ValueError('pad_to_multiple_of must be positive , got {}'.format(pad_to_multiple_of))
+            if not self.pad_values and default_pad_value is None:
+                raise ValueError('pad_to_multiple_of requires pad_values or default_pad_value')
+        self.pad_to_multiple_of = pad_to_multiple_of
+        self.with_torch = with_torch
+
+    def _pad_value(self, key):
+        return self.pad_values.get(key, self.default_pad_value)
+
+    def _stack(self, key, values: typing.List[np.ndarray]) -> np.ndarray:
+        v0 = values[0]
+        shape = v0.shape
+        dtype = np.result_type(*values) if any(v.dtype != v0.dtype for v in values) else v0.dtype
+        if key not in self.pad_values and all(v.shape == shape for v in values):
+            out = np.empty((len(values),) + shape, dtype=dtype)
+            for i, v in enumerate(values):
+                out[i] = v
+            return out
+
+        pad_value = self._pad_value(key)
+        if pad_value is None:
+            raise ValueError('{} has different shapes in batch , set pad_values'.format(key))
+        if v0.ndim == 0 or any(v.shape[1:] != shape[1:] for v in values):
+            raise ValueError('{} can only pad the first dimension'.format(key))
+        max_len = max(len(v) for v in values)
+        if self.pad_to_multiple_of:
+            max_len = (max_len + self.pad_to_multiple_of - 1) // self.pad_to_multiple_of * self.pad_to_multiple_of
+        out = np.full((len(values), max_len) + shape[1:], pad_value, dtype=dtype)
+        for i, v in enumerate(values):
+            out[i, :len(v)] = v
+        return out
+
+    def _collate_key(self, key, values: typing.List):
+        v0 = values[0]
+        if isinstance(v0, torch.Tensor):
+            values = [v.numpy() for v in values]
+            v0 = values[0]
+        if isinstance(v0, np.ndarray):
+            out = self._stack(key, values)
+        elif isinstance(v0, (bool, int, float, np.generic)):
+            out = np.asarray(values)
+        else:
+            return values
+        if self.with_torch and out.dtype.kind in 'biuf':
+            return torch.from_numpy(out)
+        return out
+
+    def __call__(self, samples: typing.List[typing.Dict]) -> typing.Dict:
+        if not samples:
+            return {}
+        if not isinstance(samples[0], dict):
+            return torch.utils.data.default_collate(samples)
+        return {k: self._collate_key(k, [s[k] for s in samples]) for k in samples[0]}
@@ -6,14 +6,15 @@ import logging
 import os
 import typing
 from ..core.writer import DataWriteHelper
-from .dataloaders import load_distributed_random_sampler, load_random_sampler
+from ..core.marker import verify_done_marker
+from ..core.corpus import CorpusLines
+from ..core.labels import build_label_vocab
 from .tokenizer_config_helper import *
 
+# load_distributed_random_sampler , load_random_sampler 按名称导入时才导入 torch , 不列入 __all__ , 见 __getattr__
 __all__ = [
     "DataPreprocessCallback",
     "DataHelperBase",
-    "load_distributed_random_sampler",
-    "load_random_sampler",
     'load_tokenizer',
     'load_configure',
     'load_imageprocesser',
@@ -21,7 +22,23 @@ __all__ = [
     'load_feature_extractor',
 ]
 
+def _dataloaders():
+    # torch 在第一次加载数据时导入 , 只写数据的进程不导入
+    from . import dataloaders
+    return dataloaders
+
+
+def __getattr__(name):
+    if name in ('load_distributed_random_sampler', 'load_random_sampler'):
+        return getattr(_dataloaders(), name)
+    raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+
+
 class DataPreprocessCallback(object):
+    # on_get_corpus 返回 CorpusLines 流式迭代 , 不整体读入内存 , 写入时不能 shuffle
+    corpus_streaming = False
+    # 读取语料的进程数
+    corpus_num_workers = 0
 
     # stage 1
     def on_data_ready(self):...
@@ -37,36 +54,25 @@ class DataPreprocessCallback(object):
     def on_task_specific_params(self) -> typing.Dict:
         return {}
 
+    # 标签缓存文件 , 为空时不缓存
+    def on_get_labels_cache_file(self, files: typing.List[str]) -> typing.Optional[str]:
+        return None
+
+    # 读取所有标签文件 , 按频次编号 , 见 build_label_vocab
     def on_get_labels(self, files: typing.List[str]):
         if not files:
             return None, None
-        label_fname = files[0]
-        is_json_file = label_fname.endswith('.json')
-        D = set()
-        with open(label_fname, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-            for line in lines:
-                line = line.replace('\r\n', '').replace('\n', '')
-                if not line: continue
-                if is_json_file:
-                    jd = json.loads(line)
-                    line = jd['label']
-                D.add(line)
-        label2id = {label: i for i, label in enumerate(D)}
-        id2label = {i: label for i, label in enumerate(D)}
-        return label2id, id2label
-
-    # 读取文件
+        return build_label_vocab(files,
+                                 cache_file=self.on_get_labels_cache_file(files),
+                                 num_workers=self.corpus_num_workers)
+
+    # 读取文件 , 支持 .gz .bz2 .xz .zst
     def on_get_corpus(self, files: typing.List[str], mode: str):
-        D = []
-        for filename in files:
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.readlines()
-                for line in lines:
-                    line = line.replace('\r\n', '').replace('\n', '')
-                    if not line: continue
-                    D.append(line)
-        return D
+        D = CorpusLines(files, num_workers=self.corpus_num_workers)
+        if self.corpus_streaming:
+            return D
+        # iter 避免 list 调用 len 多读一遍文件
+        return list(iter(D))
 
 
 class DataHelperBase(DataPreprocessCallback):
@@ -83,13 +89,19 @@ class DataHelperBase(DataPreprocessCallback):
         self.cache_dir = cache_dir
 
 
+    # 标签缓存与数据集在同一目录
+    def on_get_labels_cache_file(self, files: typing.List[str]) -> typing.Optional[str]:
+        if not self.cache_dir or not self.intermediate_name:
+            return None
+        return os.path.join(self.cache_dir, self.intermediate_name + '-labels.json')
+
     def load_distributed_random_sampler(self,*args,**kwargs):
         if 'backend' not in kwargs:
             kwargs.update({"backend": getattr(self,'backend','record')})
         kwargs.update({
             "shuffle": True,
         })
-        return load_distributed_random_sampler(*args,**kwargs)
+        return _dataloaders().load_distributed_random_sampler(*args,**kwargs)
 
     def load_distributed_sequential_sampler(self, *args, **kwargs):
         if 'backend' not in kwargs:
@@ -97,7 +109,7 @@ class DataHelperBase(DataPreprocessCallback):
         kwargs.update({
             "shuffle": False,
         })
-        return load_distributed_random_sampler(*args, **kwargs)
+        return _dataloaders().load_distributed_random_sampler(*args, **kwargs)
 
     def load_random_sampler(self,*args,**kwargs):
         if 'backend' not in kwargs:
@@ -105,7 +117,7 @@ class DataHelperBase(DataPreprocessCallback):
         kwargs.update({
             "shuffle": True,
         })
-        return load_random_sampler(*args, **kwargs)
+        return _dataloaders().load_random_sampler(*args, **kwargs)
 
     def load_sequential_sampler(self,*args,**kwargs):
         if 'backend' not in kwargs:
@@ -114,7 +126,7 @@ class DataHelperBase(DataPreprocessCallback):
         kwargs.update({
             "shuffle": False,
         })
-        return load_random_sampler(*args, **kwargs)
+        return _dataloaders().load_random_sampler(*args, **kwargs)
 
 
 
@@ -176,6 +188,7 @@ class DataHelperBase(DataPreprocessCallback):
                                overwrite: bool = False,
                                mixed_data=True,
                                dupe_factor=1,
+                               require_done_marker: bool = False,
                                **dataset_args):
         '''
             mode: one of [ train , eval , test]
@@ -183,6 +196,7 @@ class DataHelperBase(DataPreprocessCallback):
             num_process_worker: the number of mutiprocess
             overwrite: whether overwrite data
             mixed_data: Whether the mixed data
+            require_done_marker: rebuild existing data without commit marker , default reuse it with a warning
         '''
         logging.info('make_dataset {} {}...'.format(','.join(input_files), mode))
         if mode == 'train':
@@ -204,7 +218,8 @@ class DataHelperBase(DataPreprocessCallback):
                     intermediate_name = self.intermediate_name + '_dupe_factor_{}'.format(i)
                     intermediate_output = self.get_intermediate_file(intermediate_name, mode)
 
-                    if isinstance(intermediate_output, list) or not os.path.exists(intermediate_output) or overwrite:
+                    if isinstance(intermediate_output, list) or overwrite or not verify_done_marker(
+                            intermediate_output, require_done_marker=require_done_marker):
                         data = self.on_get_corpus(input_files, mode)
                         self.make_dataset(intermediate_output,
                                           data,
@@ -218,8 +233,8 @@ class DataHelperBase(DataPreprocessCallback):
                         intermediate_name = self.intermediate_name + '_file_{}_dupe_factor_{}'.format(fid, i)
                         intermediate_output = self.get_intermediate_file(intermediate_name, mode)
 
-                        if isinstance(intermediate_output, list) or not os.path.exists(
-                                intermediate_output) or overwrite:
+                        if isinstance(intermediate_output, list) or overwrite or not verify_done_marker(
+                                intermediate_output, require_done_marker=require_done_marker):
                             data = self.on_get_corpus([input_item], mode)
                             self.make_dataset(intermediate_output,
                                               data,
@@ -250,9 +265,10 @@ def make_dataset(data: typing.List,
                  leveldb_write_buffer_size=None,
                  leveldb_max_file_size=None,
                  lmdb_map_size=None,
-                 batch_size=None):
+                 batch_size=None,
+                 require_done_marker=False):
 
-    if not os.path.exists(outfile) or overwrite:
+    if overwrite or not verify_done_marker(outfile, require_done_marker=require_done_marker):
         fw = DataWriteHelper(input_fn,input_fn_args,outfile,backend,num_process_worker)
         fw.save(data,
                 options=options,
@@ -1,18 +1,29 @@
 # @Time    : 2023/4/27 20:35
 # @Author  : tk
 # @FileName: dataloaders
+import functools
 import logging
 import os
 import typing
+import warnings
 
+import numpy as np
 import torch
-from torch.utils.data import DataLoader
-from fastdatasets import memory as MEMORY
+from torch.utils.data import DataLoader, RandomSampler, SequentialSampler
 from fastdatasets.common.iterable_dataset import IterableDatasetBase
 from fastdatasets.common.random_dataset import RandomDatasetBase
 from fastdatasets.torch_dataset import IterableDataset
 from fastdatasets.torch_dataset import IterableDataset as torch_IterableDataset, Dataset as torch_Dataset
 from ..core.reader import load_numpy_dataset
+from ..core.numpyadapter import memory_loader
+from ..core.batch import get_batch, fetch_batch, get_shard_sizes
+from ..core.prefetch import PrefetchRandomDataset
+from ..core.arena import DEFAULT_SHM_DIR, get_arena_name, load_shared_arena
+from ..core.resumable import ResumableShuffleIterableDataset, set_dataset_state
+from ..core.mixture import MixtureRandomDataset, MixtureIterableDataset
+from ..core.iterable_shard import shard_iterable_dataset
+from ..core.manifest import DatasetManifest, is_manifest_file, read_manifest
+from .samplers import TokenBudgetBatchSampler, ShardLocalityDistributedSampler, EpochBatchSampler
 
 
 def check_dataset_file(files):
@@ -37,6 +48,200 @@ def check_dataset_file(files):
 
 
 
+class BatchFetchDataset(torch.utils.data.Dataset):
+    '''
+        按 batch 下标批量读取 , 配合 BatchSampler 与 DataLoader(batch_size=None) 使用
+    '''
+    def __init__(self, dataset):
+        super(BatchFetchDataset, self).__init__()
+        if isinstance(dataset, torch_Dataset):
+            dataset = dataset.dataset
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, indices):
+        return get_batch(self.dataset, indices)
+
+
+class BatchedDataset(torch_Dataset):
+    '''
+        DataLoader 通过 __getitems__ 按 batch 读取 , 预读数据集并发读取整个 batch
+    '''
+    def __getitems__(self, indices):
+        return fetch_batch(self.dataset, indices)
+
+
+# torch.from_numpy 支持的数值类型
+_TENSOR_VIEW_DTYPES = (np.bool_, np.uint8, np.int8, np.int16, np.int32, np.int64, np.float16, np.float32, np.float64)
+
+
+def _to_tensor_view(x):
+    # numpy 数组转 torch.Tensor 共享同一内存 , 不复制 , 只读视图不可原地修改
+    if isinstance(x, dict):
+        return {k: _to_tensor_view(v) for k, v in x.items()}
+    if isinstance(x, np.ndarray) and x.ndim > 0 and x.dtype.type in _TENSOR_VIEW_DTYPES:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', UserWarning)
+            return torch.from_numpy(x)
+    return x
+
+
+class TensorViewDataset(BatchedDataset):
+    '''
+        样本中 numpy 数组按 torch.Tensor 视图返回 , arrow 定长数值列缓冲区与 mmap 数组不复制 , 只在组 batch 时复制一次
+    '''
+    def __getitem__(self, item):
+        return _to_tensor_view(self.dataset[item])
+
+    def __getitems__(self, indices):
+        return [_to_tensor_view(x) for x in fetch_batch(self.dataset, indices)]
+
+
+class WorkerShardIterableDataset(torch_IterableDataset):
+    '''
+        DataLoader num_workers > 1 时每个 worker 在自己的副本上切分 , 不重复读取
+        在进程切分之上再按 worker 切分 , 文件足够时按文件 , 否则按条间隔 , 见 shard_iterable_dataset
+        resume_state: 切分后恢复的位置 , num_workers > 1 时为按 worker id 排列的列表 ,
+            每个 worker 内 core.resumable.get_dataset_state(dataset) 获取
+    '''
+    def __init__(self, dataset, with_file_shard: bool = True,
+                 resume_state: typing.Optional[typing.Union[typing.Dict, typing.List[typing.Dict]]] = None):
+        super(WorkerShardIterableDataset, self).__init__(dataset)
+        self.with_file_shard = with_file_shard
+        self.resume_state = resume_state
+        self._worker_sharded = False
+
+    def _worker_resume_state(self, num_workers: int, worker_id: int):
+        state = self.resume_state
+        if isinstance(state, (list, tuple)):
+            if len(state) != num_workers:
+                raise ValueError('resume_state has {} worker states , DataLoader has {} workers'.format(len(state), num_workers))
+            return state[worker_id]
+        if num_workers > 1:
+            raise ValueError('resume_state with num_workers > 1 requires one state per worker')
+        return state
+
+    def _worker_dataset(self):
+        if self._worker_sharded:
+            return self.dataset
+        info = torch.utils.data.get_worker_info()
+        num_workers, worker_id = (info.num_workers, info.id) if info is not None else (1, 0)
+        if num_workers > 1:
+            self.dataset = shard_iterable_dataset(self.dataset, num_workers, worker_id,
+                                                  with_file_shard=self.with_file_shard)
+        # 切分会重置读取位置 , 位置在切分之后恢复
+        if self.resume_state is not None:
+            set_dataset_state(self.dataset, self._worker_resume_state(num_workers, worker_id))
+        self._worker_sharded = True
+        return self.dataset
+
+    def set_epoch(self, epoch: int):
+        '''
+            num_workers > 0 时 worker 在数据集副本上迭代 , 副本内的 epoch 不会回传 ,
+            每个 epoch 在主进程调用 , 转发给包装链中支持 set_epoch 的数据集 , 如 HierarchicalShuffleIterableDataset
+        '''
+        node = self.dataset
+        while node is not None:
+            if hasattr(node, 'set_epoch'):
+                node.set_epoch(epoch)
+            node = getattr(node, 'dataset', None)
+
+    def __iter__(self):
+        return self._worker_dataset()
+
+
+def _default_shuffle_seed(shuffle_seed: typing.Optional[int], num_processes: int) -> int:
+    # 多进程各自打乱后再切分 , 种子必须一致 , 与 DistributedSampler 相同默认 0 ; 单进程随机选取
+    if shuffle_seed is not None:
+        return shuffle_seed
+    if num_processes > 1:
+        return 0
+    return int(np.random.randint(0, 2 ** 31 - 1))
+
+
+class TensorViewIterableDataset(WorkerShardIterableDataset):
+    '''
+        迭代数据集样本中 numpy 数组按 torch.Tensor 视图返回 , 见 TensorViewDataset
+    '''
+    def __iter__(self):
+        return map(_to_tensor_view, self._worker_dataset())
+
+
+class PrefetchSampler(torch.utils.data.Sampler):
+    '''
+        每个 epoch 将采样顺序告知预读数据集 , 仅 num_workers=0 时有效
+        set_epoch 转发给被包装的采样器 , 如 DistributedSampler
+    '''
+    def __init__(self, sampler, dataset: PrefetchRandomDataset):
+        self.sampler = sampler
+        self.dataset = dataset
+
+    def __iter__(self):
+        order = list(self.sampler)
+        self.dataset.set_order(order)
+        return iter(order)
+
+    def __len__(self):
+        return len(self.sampler)
+
+    def set_epoch(self, epoch: int):
+        if hasattr(self.sampler, 'set_epoch'):
+            self.sampler.set_epoch(epoch)
+
+
+def _get_prefetch_dataset(dataset):
+    if isinstance(dataset, torch_Dataset):
+        dataset = dataset.dataset
+    return dataset if isinstance(dataset, PrefetchRandomDataset) else None
+
+
+def _get_token_budget_sampler(dataset, lengths, max_tokens, **kwargs):
+    if lengths is None:
+        raise ValueError('lengths is required with max_tokens , see samplers.load_sample_lengths')
+    batch_sampler = TokenBudgetBatchSampler(lengths, max_tokens, **kwargs)
+    if len(batch_sampler.lengths) != len(dataset):
+        raise ValueError('lengths size {} mismatch dataset size {}'.format(len(batch_sampler.lengths), len(dataset)))
+    return batch_sampler
+
+
+def _load_memory_arena(dataset, files, backend,
+                       with_record_iterable_dataset=False,
+                       limit_start=None,
+                       limit_count=None,
+                       dataset_loader_filter_fn=None,
+                       shm_dir=None,
+                       arena_key=None,
+                       load_memory_workers=4,
+                       with_load_memory_stream=False):
+    # 仅 with_shared_memory 时使用 , 同一节点所有进程共享一份数据
+    if dataset_loader_filter_fn is not None and arena_key is None:
+        # 函数无法可靠标识 , lambda 及修改函数体后名称不变 , 会复用旧数据区
+        raise ValueError('with_shared_memory with dataset_loader_filter_fn requires arena_key')
+    shm_dir = shm_dir or DEFAULT_SHM_DIR
+    name = get_arena_name(files.files if isinstance(files, DatasetManifest) else files, backend,
+                          with_record_iterable_dataset=with_record_iterable_dataset,
+                          limit_start=limit_start,
+                          limit_count=limit_count,
+                          arena_key=arena_key)
+    dataset_fn = None
+    if backend in ('record', 'lmdb'):
+        # leveldb 不支持多进程同时打开 , memory 数据在当前进程
+        dataset_fn = functools.partial(load_numpy_dataset, files,
+                                       backend=backend,
+                                       with_parse_from_numpy=False,
+                                       limit_start=limit_start,
+                                       limit_count=limit_count,
+                                       dataset_loader_filter_fn=dataset_loader_filter_fn)
+        if isinstance(dataset, typing.Iterator):
+            dataset = dataset_fn()
+    return load_shared_arena(dataset, name, shm_dir,
+                             dataset_fn=dataset_fn,
+                             num_workers=load_memory_workers,
+                             with_stream=with_load_memory_stream)
+
+
 def load_dataset(files: typing.Union[typing.List, str],
                  shuffle: bool = False,
                  infinite: bool = False,
@@ -54,12 +259,62 @@ def load_dataset(files: typing.Union[typing.List, str],
                  limit_start: typing.Optional[int] = None,
                  limit_count: typing.Optional[int] = None,
                  dataset_loader_filter_fn: typing.Callable = None,
+                 cache_bytes: typing.Optional[int] = None,
+                 prefetch_depth: int = 0,
+                 prefetch_threads: int = 4,
+                 with_shared_memory: bool = False,
+                 shm_dir: typing.Optional[str] = None,
+                 arena_key: typing.Optional[str] = None,
+                 load_memory_workers: int = 4,
+                 with_load_memory_stream: bool = False,
+                 columns: typing.Optional[typing.List[str]] = None,
+                 filter=None,
+                 shuffle_seed: typing.Optional[int] = None,
+                 resume_state: typing.Optional[typing.Union[typing.Dict, typing.List[typing.Dict]]] = None,
+                 shuffle_mode: str = 'buffer',
+                 shuffle_block_records: int = 1024,
+                 shuffle_buffer_bytes: int = 64 * 1024 * 1024,
+                 with_tensor_view: bool = False,
+                 with_file_shard: bool = True,
+                 with_rank_file_shard: bool = False,
                  ) -> typing.Optional[typing.Union[torch.utils.data.Dataset, torch.utils.data.IterableDataset]]:
+    '''
+        resume_state: 迭代数据集 core.resumable.get_dataset_state 保存的位置 , 按相同参数构建后直接定位
+            DataLoader num_workers > 1 时为每个 worker 的位置列表 , 在 worker 切分之后恢复 , 见 WorkerShardIterableDataset
+        shuffle_mode: 迭代数据集打乱方式 , buffer 4096 条缓冲区 ,
+            hierarchical 每个 epoch 打乱文件顺序 , 文件内随机块 , 按 shuffle_buffer_bytes 字节预算缓冲区 , 仅 record , arrow
+            DataLoader num_workers > 0 时每个 epoch 调用 loader.dataset.set_epoch(epoch) , 见 WorkerShardIterableDataset
+        shuffle_seed: 打乱种子 , 为空时单进程随机选取 , num_processes > 1 时各进程须一致 , 默认 0
+        with_tensor_view: numpy 数组按 torch.Tensor 视图返回 , arrow , parquet 定长数值列直接引用缓冲区 ,
+            张量只读 , 需要原地修改时先 clone
+        with_file_shard: 迭代数据集按 DataLoader worker 切分时文件数足够则按文件切分 , 否则按条间隔切分
+        with_rank_file_shard: 迭代数据集按进程切分时也按文件切分 , 默认按条间隔切分 ,
+            按文件切分时各进程条数取决于文件大小 , 分布式训练各进程步数不同会导致集合通信挂起 , 需自行保证文件均衡
+        files 为 manifest 清单时只读取清单 , backend 以清单为准 , 见 core.manifest
+        with_shared_memory: with_load_memory 时加载至 shm_dir 共享内存数据区 , 同一节点进程共享 ,
+            load_memory_workers , with_load_memory_stream 仅此时有效 , 默认加载至进程内 list
+        arena_key: 共享内存数据区版本 , 参与数据区命名 , 有 dataset_loader_filter_fn 时必须提供 , 修改过滤逻辑后需更换
+    '''
     assert process_index <= num_processes and num_processes >= 1
-    check_dataset_file_fn = check_dataset_file_fn or check_dataset_file
-    files = check_dataset_file_fn(files)
-    if files is None:
-        return None
+    if is_manifest_file(files):
+        if isinstance(files, str) and not os.path.exists(files):
+            return None
+        files = read_manifest(files)
+        backend = files.backend
+    else:
+        check_dataset_file_fn = check_dataset_file_fn or check_dataset_file
+        files = check_dataset_file_fn(files)
+        if files is None:
+            return None
+
+    hierarchical_shuffle = None
+    if shuffle and with_record_iterable_dataset and shuffle_mode == 'hierarchical':
+        if backend in ('record', 'arrow_stream', 'arrow_file'):
+            hierarchical_shuffle = dict(block_records=shuffle_block_records,
+                                        buffer_bytes=shuffle_buffer_bytes,
+                                        seed=_default_shuffle_seed(shuffle_seed, num_processes))
+        else:
+            logging.warning('hierarchical shuffle does not support {} , use buffer shuffle'.format(backend))
 
     dataset = load_numpy_dataset(files,
                                  cycle_length=cycle_length,
@@ -69,22 +324,40 @@ def load_dataset(files: typing.Union[typing.List, str],
                                  backend=backend,
                                  limit_start=limit_start,
                                  limit_count=limit_count,
-                                 dataset_loader_filter_fn=dataset_loader_filter_fn)
+                                 dataset_loader_filter_fn=dataset_loader_filter_fn,
+                                 cache_bytes=None if with_load_memory else cache_bytes,
+                                 columns=columns,
+                                 filter=filter,
+                                 hierarchical_shuffle=hierarchical_shuffle,
+                                 with_numpy_view=with_tensor_view and not with_arrow_copy_to_memory)
 
     if backend.startswith('arrow') or backend.startswith('parquet'):
         with_load_memory = False
         if with_arrow_copy_to_memory:
             with_load_memory = True
 
+    # with_shared_memory 时并行加载至 shm_dir 下紧凑的共享内存数据区 , 同一节点所有进程共享一份数据
+    # 否则加载至进程内 list , 不占用 /dev/shm (docker 默认 64MB)
+    if with_load_memory and with_shared_memory and backend in ('record', 'leveldb', 'lmdb', 'memory'):
+        dataset = _load_memory_arena(dataset, files, backend,
+                                     with_record_iterable_dataset=with_record_iterable_dataset,
+                                     limit_start=limit_start,
+                                     limit_count=limit_count,
+                                     dataset_loader_filter_fn=dataset_loader_filter_fn,
+                                     shm_dir=shm_dir,
+                                     arena_key=arena_key,
+                                     load_memory_workers=load_memory_workers,
+                                     with_load_memory_stream=with_load_memory_stream)
+        dataset = dataset.parse_from_numpy_writer()
     # 加载至内存
-    if with_load_memory:
+    elif with_load_memory:
         logging.info('load dataset to memory...')
         if isinstance(dataset, typing.Iterator):
             raw_data = [i for i in dataset]
         else:
             raw_data = [dataset[i] for i in range(len(dataset))]
 
-        dataset = MEMORY.load_dataset.SingleRandomDataset(raw_data)
+        dataset = memory_loader.SingleRandomDataset(raw_data)
         # 解析numpy数据
         if backend != 'memory_raw' and not backend.startswith('arrow') and not backend.startswith('parquet'):
             dataset = dataset.parse_from_numpy_writer()
@@ -92,10 +365,10 @@ def load_dataset(files: typing.Union[typing.List, str],
     if isinstance(dataset, typing.Iterator):
         dataset: IterableDatasetBase
         if num_processes > 1:
-            dataset = dataset.mutiprocess(num_processes, process_index)
+            dataset = shard_iterable_dataset(dataset, num_processes, process_index, with_file_shard=with_rank_file_shard)
 
-        if shuffle:
-            dataset = dataset.shuffle(4096)
+        if shuffle and hierarchical_shuffle is None:
+            dataset = ResumableShuffleIterableDataset(dataset, 4096, seed=shuffle_seed)
 
         if infinite:
             dataset = dataset.repeat(-1)
@@ -103,7 +376,14 @@ def load_dataset(files: typing.Union[typing.List, str],
         if transform_fn is not None:
             dataset = dataset.map(transform_fn)
 
-        dataset_ = torch_IterableDataset(dataset) if with_torchdataset else dataset
+        if not with_torchdataset:
+            if resume_state is not None:
+                set_dataset_state(dataset, resume_state)
+            dataset_ = dataset
+        elif with_tensor_view:
+            dataset_ = TensorViewIterableDataset(dataset, with_file_shard=with_file_shard, resume_state=resume_state)
+        else:
+            dataset_ = WorkerShardIterableDataset(dataset, with_file_shard=with_file_shard, resume_state=resume_state)
     else:
         dataset: RandomDatasetBase
         if num_processes > 1:
@@ -115,13 +395,76 @@ def load_dataset(files: typing.Union[typing.List, str],
         if transform_fn is not None:
             dataset = dataset.map(transform_fn)
 
-        dataset_ = torch_Dataset(dataset) if with_torchdataset else dataset
+        if prefetch_depth > 0:
+            dataset = PrefetchRandomDataset(dataset, depth=prefetch_depth, num_threads=prefetch_threads)
+        if not with_torchdataset:
+            dataset_ = dataset
+        elif with_tensor_view:
+            dataset_ = TensorViewDataset(dataset)
+        elif prefetch_depth > 0:
+            dataset_ = BatchedDataset(dataset)
+        else:
+            dataset_ = torch_Dataset(dataset)
     return dataset_
 
 
 
 
 
+def load_mixture_dataset(sources: typing.List[typing.Union[typing.List, str, typing.Dict]],
+                         weights: typing.Sequence[float],
+                         num_samples: typing.Optional[int] = None,
+                         seed: int = 0,
+                         shuffle: bool = False,
+                         num_processes: int = 1,
+                         process_index: int = 0,
+                         with_record_iterable_dataset: bool = False,
+                         stopping: str = 'first_exhausted',
+                         with_torchdataset: bool = True,
+                         transform_fn: typing.Callable = None,
+                         **kwargs
+                         ) -> typing.Optional[typing.Union[torch.utils.data.Dataset, torch.utils.data.IterableDataset]]:
+    '''
+        多语料按权重混合 , 例如 weights=[0.7, 0.2, 0.1]
+        sources: 每个数据源的文件 , 或 load_numpy_dataset 参数 dict , 需包含 files
+        num_samples: 随机读混合后长度 , 默认各数据源长度之和 , 小数据源循环上采样
+        stopping: 迭代数据集结束方式 , 见 MixtureIterableDataset
+        kwargs: 所有数据源共用的 load_numpy_dataset 参数
+    '''
+    datasets = []
+    for source in sources:
+        source_kwargs = dict(kwargs)
+        if isinstance(source, dict):
+            source_kwargs.update(source)
+            files = source_kwargs.pop('files')
+        else:
+            files = source
+        files = check_dataset_file(files)
+        if files is None:
+            return None
+        datasets.append(load_numpy_dataset(files, with_record_iterable_dataset=with_record_iterable_dataset,
+                                           **source_kwargs))
+
+    if with_record_iterable_dataset:
+        dataset = MixtureIterableDataset(datasets, weights, seed=seed, stopping=stopping)
+        if num_processes > 1:
+            dataset = dataset.mutiprocess(num_processes, process_index)
+        if shuffle:
+            dataset = ResumableShuffleIterableDataset(dataset, 4096, seed=seed)
+        if transform_fn is not None:
+            dataset = dataset.map(transform_fn)
+        return WorkerShardIterableDataset(dataset) if with_torchdataset else dataset
+
+    dataset = MixtureRandomDataset(datasets, weights, num_samples=num_samples, seed=seed)
+    if num_processes > 1:
+        dataset = dataset.mutiprocess(num_processes, process_index)
+    if shuffle:
+        dataset = dataset.shuffle(-1)
+    if transform_fn is not None:
+        dataset = dataset.map(transform_fn)
+    return torch_Dataset(dataset) if with_torchdataset else dataset
+
+
 def load_distributed_random_sampler(files: typing.Union[typing.List, str],
                                     batch_size,
                                     num_processes: int = 1,
@@ -137,8 +480,30 @@ def load_distributed_random_sampler(files: typing.Union[typing.List, str],
                                     limit_start: typing.Optional[int] = None,
                                     limit_count: typing.Optional[int] = None,
                                     dataset_loader_filter_fn: typing.Callable = None,
+                                    cache_bytes: typing.Optional[int] = None,
+                                    with_batch_fetch: bool = False,
+                                    prefetch_depth: int = 0,
+                                    prefetch_threads: int = 4,
+                                    with_shared_memory: bool = False,
+                                    shm_dir: typing.Optional[str] = None,
+                                    arena_key: typing.Optional[str] = None,
+                                    load_memory_workers: int = 4,
+                                    with_load_memory_stream: bool = False,
+                                    columns: typing.Optional[typing.List[str]] = None,
+                                    filter=None,
+                                    max_tokens: typing.Optional[int] = None,
+                                    lengths=None,
+                                    with_shard_locality: bool = False,
+                                    with_tensor_view: bool = False,
                                     **kwargs
                                     ):
+    '''
+        max_tokens: 按长度分桶组 batch 的 token 预算 , 需提供 lengths , batch_size 不再使用 , 见 TokenBudgetBatchSampler
+            每个 epoch 调用 loader.batch_sampler.set_epoch(epoch)
+        with_shard_locality: 整个文件分配给进程 , 每个 epoch 轮换 , 见 ShardLocalityDistributedSampler
+        with_tensor_view: numpy 数组按 torch.Tensor 视图返回 , 见 load_dataset
+        with_batch_fetch: 按 batch 读取 , 每个 epoch 调用 loader.sampler.set_epoch(epoch) , 见 EpochBatchSampler
+    '''
     dataset = load_dataset(
         files, shuffle=False,
         backend=backend, with_record_iterable_dataset=False,
@@ -147,20 +512,65 @@ def load_distributed_random_sampler(files: typing.Union[typing.List, str],
         limit_start=limit_start,
         limit_count=limit_count,
         dataset_loader_filter_fn=dataset_loader_filter_fn,
+        cache_bytes=cache_bytes,
+        prefetch_depth=prefetch_depth,
+        prefetch_threads=prefetch_threads,
+        with_shared_memory=with_shared_memory,
+        shm_dir=shm_dir,
+        arena_key=arena_key,
+        load_memory_workers=load_memory_workers,
+        with_load_memory_stream=with_load_memory_stream,
+        columns=columns,
+        filter=filter,
+        with_tensor_view=with_tensor_view,
     )
     if dataset is None:
         return None
 
-    sampler = torch.utils.data.distributed.DistributedSampler(dataset,
-                                                              num_replicas=num_processes,
-                                                              rank=process_index,
-                                                              shuffle=shuffle) if num_processes > 1 else None
+    if max_tokens is not None:
+        return DataLoader(dataset,
+                          batch_sampler=_get_token_budget_sampler(dataset, lengths, max_tokens,
+                                                                  num_replicas=num_processes,
+                                                                  rank=process_index,
+                                                                  shuffle=shuffle,
+                                                                  drop_last=kwargs.pop('drop_last', False)),
+                          collate_fn=collate_fn,
+                          pin_memory=pin_memory, **kwargs)
+
+    if num_processes <= 1:
+        sampler = None
+    elif with_shard_locality:
+        sampler = ShardLocalityDistributedSampler(get_shard_sizes(dataset),
+                                                  num_replicas=num_processes,
+                                                  rank=process_index,
+                                                  shuffle=shuffle,
+                                                  drop_last=kwargs.get('drop_last', False))
+    else:
+        sampler = torch.utils.data.distributed.DistributedSampler(dataset,
+                                                                  num_replicas=num_processes,
+                                                                  rank=process_index,
+                                                                  shuffle=shuffle)
 
     if not shuffle:
         do_shuffle = False
     else:
         do_shuffle = sampler is None
 
+    prefetch_dataset = _get_prefetch_dataset(dataset)
+    if prefetch_dataset is not None and kwargs.get('num_workers', 0) == 0:
+        if sampler is None:
+            sampler = RandomSampler(dataset) if do_shuffle else SequentialSampler(dataset)
+            do_shuffle = False
+        sampler = PrefetchSampler(sampler, prefetch_dataset)
+
+    if with_batch_fetch:
+        if sampler is None:
+            sampler = RandomSampler(dataset) if do_shuffle else SequentialSampler(dataset)
+        return DataLoader(BatchFetchDataset(dataset), batch_size=None,
+                          sampler=EpochBatchSampler(sampler, batch_size, drop_last=kwargs.pop('drop_last', False)),
+                          collate_fn=collate_fn,
+                          pin_memory=pin_memory, **kwargs)
+
     return DataLoader(dataset, batch_size=batch_size,
                       shuffle=do_shuffle,
                       sampler=sampler,
@@ -190,22 +600,97 @@ def load_random_sampler(files: typing.Union[typing.List, str],
                         limit_start: typing.Optional[int] = None,
                         limit_count: typing.Optional[int] = None,
                         dataset_loader_filter_fn: typing.Callable = None,
+                        cache_bytes: typing.Optional[int] = None,
+                        with_batch_fetch: bool = False,
+                        prefetch_depth: int = 0,
+                        prefetch_threads: int = 4,
+                        with_shared_memory: bool = False,
+                        shm_dir: typing.Optional[str] = None,
+                        arena_key: typing.Optional[str] = None,
+                        load_memory_workers: int = 4,
+                        with_load_memory_stream: bool = False,
+                        columns: typing.Optional[typing.List[str]] = None,
+                        filter=None,
+                        shuffle_seed: typing.Optional[int] = None,
+                        resume_state: typing.Optional[typing.Union[typing.Dict, typing.List[typing.Dict]]] = None,
+                        shuffle_mode: str = 'buffer',
+                        shuffle_block_records: int = 1024,
+                        shuffle_buffer_bytes: int = 64 * 1024 * 1024,
+                        max_tokens: typing.Optional[int] = None,
+                        lengths=None,
+                        with_tensor_view: bool = False,
+                        with_file_shard: bool = True,
+                        with_rank_file_shard: bool = False,
                         **kwargs
                         ) -> typing.Optional[typing.Union[
     DataLoader, torch.utils.data.Dataset, torch.utils.data.IterableDataset, IterableDatasetBase, RandomDatasetBase]]:
+    '''
+        max_tokens: 按长度分桶组 batch 的 token 预算 , 需提供 lengths , batch_size 不再使用 , 见 TokenBudgetBatchSampler
+            数据集按文件顺序加载 , 打乱与按进程切分由 sampler 完成
+        with_tensor_view: numpy 数组按 torch.Tensor 视图返回 , 见 load_dataset
+        with_file_shard , with_rank_file_shard: 迭代数据集按 DataLoader worker , 按进程切分方式 , 见 load_dataset
+    '''
+    # lengths 按文件顺序 , 数据集不能先打乱或切分
+    with_token_budget = max_tokens is not None and not with_record_iterable_dataset
     dataset = load_dataset(
-        files, shuffle=shuffle, infinite=infinite, cycle_length=cycle_length,
-        block_length=block_length, num_processes=num_processes, process_index=process_index,
+        files, shuffle=shuffle and not with_token_budget, infinite=infinite, cycle_length=cycle_length,
+        block_length=block_length,
+        num_processes=1 if with_token_budget else num_processes,
+        process_index=0 if with_token_budget else process_index,
         backend=backend, with_record_iterable_dataset=with_record_iterable_dataset,
         with_load_memory=with_load_memory, with_torchdataset=with_torchdataset,
         transform_fn=transform_fn, check_dataset_file_fn=check_dataset_file_fn,
         limit_start=limit_start,
         limit_count=limit_count,
         dataset_loader_filter_fn=dataset_loader_filter_fn,
+        cache_bytes=cache_bytes,
+        prefetch_depth=prefetch_depth,
+        prefetch_threads=prefetch_threads,
+        with_shared_memory=with_shared_memory,
+        shm_dir=shm_dir,
+        arena_key=arena_key,
+        load_memory_workers=load_memory_workers,
+        with_load_memory_stream=with_load_memory_stream,
+        columns=columns,
+        filter=filter,
+        shuffle_seed=shuffle_seed,
+        resume_state=resume_state,
+        shuffle_mode=shuffle_mode,
+        shuffle_block_records=shuffle_block_records,
+        shuffle_buffer_bytes=shuffle_buffer_bytes,
+        with_tensor_view=with_tensor_view,
+        with_file_shard=with_file_shard,
+        with_rank_file_shard=with_rank_file_shard,
     )
     if dataset is None:
         return None
 
+    if with_token_budget:
+        return DataLoader(dataset,
+                          batch_sampler=_get_token_budget_sampler(dataset, lengths, max_tokens,
+                                                                  num_replicas=num_processes,
+                                                                  rank=process_index,
+                                                                  shuffle=shuffle,
+                                                                  seed=_default_shuffle_seed(shuffle_seed, num_processes),
+                                                                  drop_last=kwargs.pop('drop_last', False)),
+                          collate_fn=collate_fn,
+                          pin_memory=pin_memory, **kwargs)
+
+    prefetch_dataset = _get_prefetch_dataset(dataset)
+    if prefetch_dataset is not None and kwargs.get('num_workers', 0) == 0 and kwargs.get('sampler') is None:
+        sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+        kwargs['sampler'] = PrefetchSampler(sampler, prefetch_dataset)
+        shuffle = False
+
+    if with_batch_fetch and not isinstance(dataset, IterableDataset):
+        sampler = kwargs.pop('sampler', None)
+        if sampler is None:
+            sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+        return DataLoader(BatchFetchDataset(dataset), batch_size=None,
+                          sampler=EpochBatchSampler(sampler, batch_size, drop_last=kwargs.pop('drop_last', False)),
+                          collate_fn=collate_fn,
+                          pin_memory=pin_memory, **kwargs)
+
     return DataLoader(dataset, batch_size=batch_size,
                       shuffle=False if isinstance(dataset, IterableDataset) else shuffle,
                       collate_fn=collate_fn,
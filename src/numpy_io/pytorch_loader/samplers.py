@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+# @Time    : 2026/10/21 19:20
+# @Author  : tk
+# @FileName: samplers
+import logging
+import os
+import typing
+import numpy as np
+import torch
+from ..core.batch import fetch_batch
+from ..core.reader import load_numpy_dataset
+
+__all__ = [
+    'load_sample_lengths',
+    'TokenBudgetBatchSampler',
+    'ShardLocalityDistributedSampler',
+    'EpochBatchSampler',
+]
+
+
+def _value_length(x) -> int:
+    if isinstance(x, (int, np.integer)):
+        return int(x)
+    return len(x)
+
+
+def load_sample_lengths(files: typing.Union[typing.List, str],
+                        backend='record',
+                        column: typing.Optional[str] = None,
+                        length_fn: typing.Optional[typing.Callable] = None,
+                        cache_file: typing.Optional[str] = None,
+                        block_size: int = 4096,
+                        **kwargs) -> np.ndarray:
+    '''
+        样本长度 , 优先读取缓存 , 不存在时计算一次并保存
+        column: 表格类型只读取该列 , 整数列为长度 , 序列列取长度
+        length_fn: 解析后的样本 -> 长度 , 未指定 column 时使用
+        cache_file: 长度缓存 .npy , mmap 载入
+        kwargs: load_numpy_dataset 参数 , 需与训练数据集一致
+    '''
+    if cache_file is not None and os.path.exists(cache_file):
+        return np.load(cache_file, mmap_mode='r')
+    if column is not None:
+        dataset = load_numpy_dataset(files, backend=backend, columns=[column], **kwargs)
+        fn = lambda x: _value_length(x[column])
+    else:
+        assert length_fn is not None, 'column or length_fn is required'
+        dataset = load_numpy_dataset(files, backend=backend, **kwargs)
+        fn = length_fn
+    total = len(dataset)
+    lengths = np.zeros((total,), dtype=np.int64)
+    for i in range(0, total, block_size):
+        end = min(i + block_size, total)
+        lengths[i:end] = [fn(x) for x in fetch_batch(dataset, np.arange(i, end))]
+    dataset.close()
+    if cache_file is not None:
+        logging.info('save sample lengths to {}'.format(cache_file))
+        np.save(cache_file + '.tmp.npy', lengths)
+        os.replace(cache_file + '.tmp.npy', cache_file)
+    return lengths
+
+
+class TokenBudgetBatchSampler(torch.utils.data.Sampler):
+    '''
+        按长度分桶 , batch 按 最大长度 * 条数 <= max_tokens 组成
+        每个 epoch 随机划分 bucket_size 条为一桶 , 桶内按长度排序后组 batch , 再打乱全部 batch 顺序
+        分布式时所有进程按 (seed , epoch) 生成相同 batch 列表 , 按 batch 轮流分配 , 每个进程 batch 数相同
+        lengths: 样本长度 , 与数据集等长 , 见 load_sample_lengths
+    '''
+    def __init__(self,
+                 lengths: typing.Union[typing.Sequence[int], np.ndarray, str],
+                 max_tokens: int,
+                 num_replicas: int = 1,
+                 rank: int = 0,
+                 shuffle: bool = True,
+                 seed: int = 0,
+                 bucket_size: int = 100000,
+                 max_batch_size: typing.Optional[int] = None,
+                 drop_last: bool = False):
+        if isinstance(lengths, str):
+            lengths = np.load(lengths, mmap_mode='r')
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        assert max_tokens > 0 and bucket_size > 0
+        assert 0 <= rank < num_replicas
+        self.max_tokens = max_tokens
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.bucket_size = bucket_size
+        self.max_batch_size = max_batch_size
+        self.drop_last = drop_last
+        self.epoch = 0
+        self._plan = None
+        num_over = int(np.sum(self.lengths > max_tokens))
+        if num_over:
+            logging.warning('{} samples longer than max_tokens {} , use single sample batches'.format(num_over, max_tokens))
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def _make_batches(self, indices: np.ndarray) -> typing.List[np.ndarray]:
+        batches = []
+        start = 0
+        max_len = 0
+        for i, n in enumerate(self.lengths[indices].tolist()):
+            size = i - start
+            new_len = max(max_len, n)
+            if size > 0 and (new_len * (size + 1) > self.max_tokens or size == self.max_batch_size):
+                batches.append(indices[start:i])
+                start = i
+                new_len = n
+            max_len = new_len
+        if start < len(indices):
+            batches.append(indices[start:])
+        return batches
+
+    def _get_plan(self) -> typing.List[np.ndarray]:
+        if self._plan is not None and self._plan[0] == self.epoch:
+            return self._plan[1]
+        rng = np.random.RandomState([self.seed, self.epoch])
+        total = len(self.lengths)
+        order = rng.permutation(total) if self.shuffle else np.arange(total)
+        batches = []
+        for s in range(0, total, self.bucket_size):
+            bucket = order[s: s + self.bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind='stable')]
+            batches.extend(self._make_batches(bucket))
+        if self.shuffle:
+            batches = [batches[i] for i in rng.permutation(len(batches))]
+        if self.num_replicas > 1 and len(batches) % self.num_replicas:
+            if self.drop_last:
+                batches = batches[:len(batches) - len(batches) % self.num_replicas]
+            else:
+                pad = self.num_replicas - len(batches) % self.num_replicas
+                batches = batches + [batches[i % len(batches)] for i in range(pad)]
+        batches = batches[self.rank::self.num_replicas]
+        self._plan = (self.epoch, batches)
+        return batches
+
+    def __iter__(self):
+        for batch in self._get_plan():
+            yield batch.tolist()
+
+    def __len__(self):
+        return len(self._get_plan())
+
+
+class ShardLocalityDistributedSampler(torch.utils.data.Sampler):
+    '''
+        按整个分片分配给进程 , 每个进程只随机读取自己的分片 , 页缓存与文件句柄集中在本进程分片
+        分片按条数贪心均衡分为 num_replicas 组 , 每个 epoch 轮换组与进程的对应关系 , 多个 epoch 覆盖全部数据
+        各进程条数按最大组补齐 , drop_last 时按最小组截断
+        shard_sizes: 连续下标区间条数 , 见 core.batch.get_shard_sizes
+    '''
+    def __init__(self,
+                 shard_sizes: typing.Sequence[int],
+                 num_replicas: int = 1,
+                 rank: int = 0,
+                 shuffle: bool = True,
+                 seed: int = 0,
+                 drop_last: bool = False):
+        assert 0 <= rank < num_replicas
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.epoch = 0
+        starts = np.cumsum([0] + list(shard_sizes))[:-1]
+        shards = [(int(s), int(n)) for s, n in zip(starts, shard_sizes) if n > 0]
+        # 分片少于进程数时对半拆分最大分片 , 拆分后仍为连续区间
+        while shards and len(shards) < num_replicas:
+            k = max(range(len(shards)), key=lambda i: shards[i][1])
+            s, n = shards.pop(k)
+            if n < 2:
+                shards.insert(k, (s, n))
+                break
+            shards[k:k] = [(s, n // 2), (s + n // 2, n - n // 2)]
+        self.groups = [[] for _ in range(num_replicas)]
+        loads = [0] * num_replicas
+        for s, n in sorted(shards, key=lambda x: (-x[1], x[0])):
+            r = int(np.argmin(loads))
+            self.groups[r].append((s, n))
+            loads[r] += n
+        self.group_sizes = loads
+        self.num_samples = min(loads) if drop_last else max(loads)
+
+    def set_epoch(self, epoch: int):
+        self.epoch = epoch
+
+    def __iter__(self):
+        group_id = (self.rank + self.epoch) % self.num_replicas
+        shards = self.groups[group_id]
+        rng = np.random.RandomState([self.seed, self.epoch, group_id])
+        if self.shuffle:
+            shards = [shards[i] for i in rng.permutation(len(shards))]
+        indices = np.concatenate([np.arange(s, s + n, dtype=np.int64) for s, n in shards]) \
+            if shards else np.zeros((0,), dtype=np.int64)
+        if self.shuffle:
+            indices = indices[rng.permutation(len(indices))]
+        if len(indices) > self.num_samples:
+            indices = indices[:self.num_samples]
+        elif 0 < len(indices) < self.num_samples:
+            indices = np.resize(indices, self.num_samples)
+        return iter(indices.tolist())
+
+    def __len__(self):
+        return self.num_samples
+
+
+class EpochBatchSampler(torch.utils.data.BatchSampler):
+    '''
+        BatchSampler , set_epoch 转发给 self.sampler , 如 DistributedSampler , ShardLocalityDistributedSampler
+    '''
+    def set_epoch(self, epoch: int):
+        if hasattr(self.sampler, 'set_epoch'):
+            self.sampler.set_epoch(epoch)
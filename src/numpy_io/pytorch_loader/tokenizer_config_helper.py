@@ -1,17 +1,91 @@
 # -*- coding: utf-8 -*-
 # @Author  : ssbuild
 # @Time    : 2022/11/4 13:31
-
-from transformers import AutoTokenizer, AutoConfig,AutoImageProcessor,AutoProcessor,AutoFeatureExtractor, CONFIG_MAPPING, PretrainedConfig
+# transformers 导入较慢 , 在函数内第一次调用时导入
+import copy
+import hashlib
+import json
+import os
+import re
+import shutil
 
 __all__ = [
     'load_tokenizer',
     'load_configure',
+    'clear_tokenizer_config_cache',
     'load_imageprocesser',
     'load_processer',
     'load_feature_extractor',
 ]
 
+# 进程内缓存 , fork 出的 worker 继承父进程已加载的 tokenizer , config
+_MEMO_CACHE = {}
+
+# cache_dir 下预先序列化的 fast tokenizer 目录
+_FAST_TOKENIZER_CACHE_DIR = 'numpy_io_fast_tokenizer'
+
+
+def clear_tokenizer_config_cache():
+    _MEMO_CACHE.clear()
+
+
+def _hub_commit(repo_id, revision, cache_dir):
+    # hub 模型按本地 huggingface 缓存中 revision 指向的 commit 区分 , 不访问网络
+    # 本地缓存未更新时 (如 hub 上 main 已更新但未重新下载) 沿用旧 commit 的缓存
+    if revision and re.fullmatch(r'[0-9a-f]{40}', revision):
+        return revision
+    try:
+        from huggingface_hub import constants
+    except ImportError:
+        return None
+    root = cache_dir or getattr(constants, 'HF_HUB_CACHE', None) or constants.HUGGINGFACE_HUB_CACHE
+    ref = os.path.join(root, 'models--' + repo_id.replace('/', '--'), 'refs', revision or 'main')
+    if not os.path.isfile(ref):
+        return None
+    with open(ref, mode='r', encoding='utf-8') as f:
+        return f.read().strip()
+
+
+def _cache_key(kind, name, class_name, kwargs, repo_id=None):
+    info = {
+        'kind': kind,
+        'name': name,
+        'class_name': None if class_name is None else '{}.{}'.format(class_name.__module__, class_name.__qualname__),
+        'kwargs': kwargs,
+    }
+    repo_id = name if repo_id is None else repo_id
+    if isinstance(repo_id, str) and os.path.isdir(repo_id):
+        # 本地目录按文件修改时间区分 , 文件更新后缓存失效
+        info['mtime'] = max([os.path.getmtime(os.path.join(repo_id, f)) for f in os.listdir(repo_id)] or [0])
+    elif isinstance(repo_id, str) and repo_id:
+        info['commit'] = _hub_commit(repo_id, kwargs.get('revision'), kwargs.get('cache_dir'))
+    return hashlib.md5(json.dumps(info, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+
+def _load_fast_tokenizer_cache(path, class_name, tokenizer_kwargs):
+    if not os.path.exists(os.path.join(path, 'tokenizer.json')):
+        return None
+    kwargs = {k: v for k, v in tokenizer_kwargs.items() if k not in ('cache_dir', 'revision', 'use_auth_token')}
+    if class_name is not None:
+        return class_name.from_pretrained(path, **kwargs)
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(path, **kwargs)
+
+
+def _save_fast_tokenizer_cache(path, tokenizer):
+    # 先写临时目录再改名 , 多个进程同时写时只保留第一个
+    if not getattr(tokenizer, 'is_fast', False) or os.path.exists(path):
+        return
+    tmp_path = '{}.tmp{}'.format(path, os.getpid())
+    try:
+        tokenizer.save_pretrained(tmp_path)
+        os.rename(tmp_path, path)
+    except OSError:
+        pass
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
 def load_tokenizer(tokenizer_name,
                    model_name_or_path=None,
                    class_name = None,
@@ -20,7 +94,14 @@ def load_tokenizer(tokenizer_name,
                    use_fast_tokenizer=True,
                    model_revision="main",
                    use_auth_token=None,
+                   with_cache=True,
                    **kwargs):
+    '''
+        with_cache: 相同参数在进程内只加载一次 , 每次返回副本 , 修改返回的 tokenizer (如 add_tokens) 不影响缓存
+            cache_dir 不为空时 fast tokenizer 序列化到 cache_dir/numpy_io_fast_tokenizer , 新进程直接读取 tokenizer.json
+            hub 模型的缓存键包含本地 huggingface 缓存中 model_revision 对应的 commit , 不访问网络 ,
+            hub 更新后需重新下载模型 (或 with_cache=False) 才会使用新版本
+    '''
     tokenizer_kwargs = {
         "cache_dir": cache_dir,
         "revision": model_revision,
@@ -33,6 +114,24 @@ def load_tokenizer(tokenizer_name,
     if use_fast_tokenizer is not None:
         tokenizer_kwargs['use_fast'] = use_fast_tokenizer
 
+    if with_cache:
+        key = _cache_key('tokenizer', tokenizer_name or model_name_or_path, class_name, tokenizer_kwargs)
+        tokenizer = _MEMO_CACHE.get(key)
+        if tokenizer is not None:
+            return copy.deepcopy(tokenizer)
+        cache_path = os.path.join(cache_dir, _FAST_TOKENIZER_CACHE_DIR, key) if cache_dir else None
+        tokenizer = _load_fast_tokenizer_cache(cache_path, class_name, tokenizer_kwargs) if cache_path else None
+        if tokenizer is None:
+            tokenizer = load_tokenizer(tokenizer_name, model_name_or_path=model_name_or_path, class_name=class_name,
+                                       cache_dir=cache_dir, do_lower_case=do_lower_case,
+                                       use_fast_tokenizer=use_fast_tokenizer, model_revision=model_revision,
+                                       use_auth_token=use_auth_token, with_cache=False, **kwargs)
+            if cache_path:
+                _save_fast_tokenizer_cache(cache_path, tokenizer)
+        _MEMO_CACHE[key] = tokenizer
+        return copy.deepcopy(tokenizer)
+
+    from transformers import AutoTokenizer
     if class_name is not None:
         tokenizer = class_name.from_pretrained(tokenizer_name or model_name_or_path, **tokenizer_kwargs)
     elif tokenizer_name:
@@ -60,7 +159,11 @@ def load_configure(config_name,
                    sep_token_id=None,
                    return_dict=False,
                    task_specific_params=None,
+                   with_cache=True,
                    **kwargs):
+    '''
+        with_cache: 相同参数在进程内只解析一次 , 每次返回副本 , 修改返回的 config 不影响缓存
+    '''
     config_kwargs = {
         "cache_dir": cache_dir,
         "revision": model_revision,
@@ -81,6 +184,22 @@ def load_configure(config_name,
     if tmp_kwargs:
         config_kwargs.update(tmp_kwargs)
 
+    from transformers import AutoConfig, CONFIG_MAPPING, PretrainedConfig
+    if with_cache and not isinstance(config_name, PretrainedConfig):
+        key = _cache_key('config', (config_name, model_name_or_path, model_type, config_overrides),
+                         class_name, config_kwargs, repo_id=config_name or model_name_or_path)
+        config = _MEMO_CACHE.get(key)
+        if config is None:
+            config = load_configure(config_name, model_name_or_path=model_name_or_path, class_name=class_name,
+                                    cache_dir=cache_dir, model_revision=model_revision,
+                                    use_auth_token=use_auth_token, model_type=model_type,
+                                    config_overrides=config_overrides, bos_token_id=bos_token_id,
+                                    pad_token_id=pad_token_id, eos_token_id=eos_token_id, sep_token_id=sep_token_id,
+                                    return_dict=return_dict, task_specific_params=task_specific_params,
+                                    with_cache=False, **kwargs)
+            _MEMO_CACHE[key] = config
+        return copy.deepcopy(config)
+
     if class_name is not None:
         config = class_name.from_pretrained(config_name or model_name_or_path, **config_kwargs)
     elif isinstance(config_name,PretrainedConfig):
@@ -119,6 +238,7 @@ def load_imageprocesser(imageprocesser_name,
         **kwargs
     }
 
+    from transformers import AutoImageProcessor
     if class_name is not None:
         image_processer = class_name.from_pretrained(imageprocesser_name or model_name_or_path, **image_kwargs)
     elif imageprocesser_name:
@@ -148,6 +268,7 @@ def load_processer(processer_name,
         **kwargs
     }
 
+    from transformers import AutoProcessor
     if class_name is not None:
         processer = class_name.from_pretrained(processer_name or model_name_or_path, **image_kwargs)
     elif processer_name:
@@ -176,6 +297,7 @@ def load_feature_extractor(feature_extractor_name,
         **kwargs
     }
 
+    from transformers import AutoFeatureExtractor
     if class_name is not None:
         feature_extractor = class_name.from_pretrained(feature_extractor_name or model_name_or_path, **ft_kwargs)
     elif feature_extractor_name:
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 9:00
+# @Author: tk
+# @File：conftest
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+TABLE_SCHEMA = {
+    'input_ids': 'int32_list',
+    'seqlen': 'int32',
+}
+
+
+def make_record(index, args=None):
+    seqlen = index % 7 + 1
+    return {
+        'input_ids': np.arange(index, index + seqlen, dtype=np.int32),
+        'seqlen': np.asarray(seqlen, dtype=np.int32),
+    }
+
+
+def write_dataset(outfile, backend='record', num=50, **kwargs):
+    from numpy_io.core.writer import DataWriteHelper
+    schema = TABLE_SCHEMA if backend in ('arrow_stream', 'arrow_file', 'parquet') else None
+    DataWriteHelper(make_record, None, outfile, backend=backend, num_process_worker=0, shuffle=False) \
+        .save(list(range(num)), schema=schema, **kwargs)
+    return outfile
+
+
+@pytest.fixture
+def record_file(tmp_path):
+    return write_dataset(str(tmp_path / 'data.record'), 'record')
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 10:30
+# @Author: tk
+# @File：test_arena
+import os
+import subprocess
+import sys
+import time
+import pytest
+from numpy_io.core.arena import load_shared_arena, ArenaRandomDataset, _arena_path, _write_meta
+from numpy_io.core.reader import load_numpy_dataset
+
+
+def _dead_pid() -> int:
+    p = subprocess.Popen([sys.executable, '-c', 'pass'])
+    p.wait()
+    return p.pid
+
+
+def _raw(record_file):
+    return load_numpy_dataset(record_file, with_parse_from_numpy=False)
+
+
+def _expect(record_file):
+    dataset = _raw(record_file)
+    return [dataset[i]['input'] if isinstance(dataset[i], dict) else dataset[i] for i in range(len(dataset))]
+
+
+@pytest.mark.parametrize('with_stream', [False, True])
+def test_build_and_load(tmp_path, record_file, with_stream):
+    arena = load_shared_arena(_raw(record_file), 'arena', str(tmp_path), num_workers=0, with_stream=with_stream)
+    assert [arena[i] for i in range(len(arena))] == _expect(record_file)
+    # 后台写入时完成标记在最后一个分块之后写入
+    deadline = time.time() + 10
+    while not os.path.exists(_arena_path(str(tmp_path), 'arena', 'done')) and time.time() < deadline:
+        time.sleep(0.01)
+    assert os.path.exists(_arena_path(str(tmp_path), 'arena', 'done'))
+
+
+def test_stale_lock_is_rebuilt(tmp_path, record_file):
+    shm_dir = str(tmp_path)
+    # 写入进程崩溃 : 遗留 meta 与 pid 已退出的锁 , 没有完成标记
+    _write_meta('arena', shm_dir, [[0, 10], [10, 50]])
+    with open(_arena_path(shm_dir, 'arena', 'lock'), 'w') as f:
+        f.write(str(_dead_pid()))
+    arena = load_shared_arena(_raw(record_file), 'arena', shm_dir, timeout=10, poll_interval=0.01)
+    assert [arena[i] for i in range(len(arena))] == _expect(record_file)
+    assert not os.path.exists(_arena_path(shm_dir, 'arena', 'lock'))
+
+
+def test_meta_without_done_is_rebuilt(tmp_path, record_file):
+    shm_dir = str(tmp_path)
+    _write_meta('arena', shm_dir, [[0, 10]])
+    arena = load_shared_arena(_raw(record_file), 'arena', shm_dir, timeout=10)
+    assert len(arena) == 50
+
+
+def test_reader_detects_dead_builder(tmp_path):
+    shm_dir = str(tmp_path)
+    _write_meta('arena', shm_dir, [[0, 10]], with_stream=True)
+    with open(_arena_path(shm_dir, 'arena', 'lock'), 'w') as f:
+        f.write(str(_dead_pid()))
+    arena = ArenaRandomDataset('arena', shm_dir, timeout=10, poll_interval=0.01)
+    with pytest.raises(RuntimeError):
+        arena[0]
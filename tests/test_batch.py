@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 11:20
+# @Author: tk
+# @File：test_batch
+import numpy as np
+import pytest
+from numpy_io.core.reader import load_numpy_dataset
+from numpy_io.core.batch import fetch_batch, get_batch
+from conftest import write_dataset, make_record
+
+BACKENDS = ['record', 'leveldb', 'lmdb', 'arrow_file', 'parquet']
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_fetch_batch_matches_getitem(tmp_path, backend):
+    fn = write_dataset(str(tmp_path / 'data.{}'.format(backend)), backend)
+    dataset = load_numpy_dataset(fn, backend=backend)
+    indices = np.asarray([7, 3, 3, 49, 0, 21], dtype=np.int64)
+    batch = fetch_batch(dataset, indices)
+    assert len(batch) == len(indices)
+    for i, x in zip(indices, batch):
+        y = dataset[int(i)]
+        if isinstance(x, dict):
+            assert x.keys() == y.keys()
+            for k in x:
+                np.testing.assert_array_equal(np.asarray(x[k]), np.asarray(y[k]))
+        else:
+            assert x == y
+    if backend in ('record', 'leveldb', 'lmdb'):
+        with pytest.raises(OverflowError):
+            fetch_batch(dataset, [50])
+    dataset.close()
+
+
+def test_fetch_batch_wrapped(tmp_path):
+    fn = write_dataset(str(tmp_path / 'data.arrow_file'), 'arrow_file')
+    dataset = load_numpy_dataset(fn, backend='arrow_file')
+    dataset = dataset.concat([dataset]).skip(10).limit(80).shuffle(16)
+    indices = np.arange(len(dataset))[::-1]
+    for i, x in zip(indices, fetch_batch(dataset, indices)):
+        np.testing.assert_array_equal(x['input_ids'], dataset[int(i)]['input_ids'])
+
+
+def test_get_batch_stacks(tmp_path):
+    fn = write_dataset(str(tmp_path / 'data.arrow_file'), 'arrow_file')
+    dataset = load_numpy_dataset(fn, backend='arrow_file')
+    batch = get_batch(dataset, [0, 7, 14])
+    np.testing.assert_array_equal(batch['seqlen'], [make_record(i)['seqlen'] for i in (0, 7, 14)])
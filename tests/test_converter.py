@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 14:30
+# @Author: tk
+# @File：test_converter
+import numpy as np
+import pytest
+from numpy_io.core.converter import convert_dataset
+from numpy_io.core.reader import load_numpy_dataset
+from conftest import write_dataset
+
+
+def _first_ids(fn, backend):
+    dataset = load_numpy_dataset(fn, backend=backend)
+    return [int(np.asarray(dataset[i]['input_ids'])[0]) for i in range(len(dataset))]
+
+
+@pytest.mark.parametrize('num_process_worker', [0, 2])
+def test_convert_iterable_round_robin(tmp_path, num_process_worker):
+    # arrow_stream 迭代读取 , 一遍读取按条轮流写入
+    src = write_dataset(str(tmp_path / 'data.arrow_stream'), 'arrow_stream', num=50)
+    outputs = convert_dataset(src, 'arrow_stream', str(tmp_path / 'out.arrow_file'), 'arrow_file',
+                              num_shards=3, num_process_worker=num_process_worker)
+    assert len(outputs) == 3
+    for k, fn in enumerate(outputs):
+        ids = _first_ids(fn, 'arrow_file')
+        if num_process_worker == 0:
+            assert ids == list(range(k, 50, 3))
+        else:
+            assert sorted(ids) == list(range(k, 50, 3))
+
+
+def test_convert_random_contiguous(tmp_path):
+    # record 随机读取 , 按连续区间分片
+    src = write_dataset(str(tmp_path / 'data.record'), 'record', num=50)
+    outputs = convert_dataset(src, 'record', str(tmp_path / 'out.arrow_file'), 'arrow_file',
+                              num_shards=4, num_process_worker=0)
+    ids = [_first_ids(fn, 'arrow_file') for fn in outputs]
+    assert [len(x) for x in ids] == [12, 13, 12, 13]
+    assert sum(ids, []) == list(range(50))
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 18:10
+# @Author: tk
+# @File：test_corpus
+import gzip
+import pytest
+from numpy_io.core.corpus import CorpusLines, count_lines, iter_lines
+
+
+@pytest.fixture
+def corpus_files(tmp_path):
+    files = []
+    for i in range(3):
+        lines = ['file{} line{} {}'.format(i, k, 'x' * (k % 13)) for k in range(200 + 50 * i)]
+        # 空行 , \r\n 与缺少末尾换行
+        text = '\n'.join(lines[:10]) + '\n\n\r\n' + '\r\n'.join(lines[10:])
+        fn = str(tmp_path / 'corpus_{}.txt'.format(i))
+        with open(fn, mode='w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        files.append((fn, lines))
+    gz = str(tmp_path / 'corpus_gz.txt.gz')
+    with gzip.open(gz, 'wt', encoding='utf-8') as f:
+        f.write('\n'.join(files[0][1]) + '\n')
+    files.append((gz, files[0][1]))
+    return files
+
+
+def test_iter_lines(corpus_files):
+    for fn, lines in corpus_files:
+        assert list(iter_lines(fn, block_size=64)) == lines
+        assert count_lines(fn, block_size=64) == len(lines)
+
+
+@pytest.mark.parametrize('num_workers', [0, 1, 3])
+def test_multi_worker_order(corpus_files, num_workers):
+    files = [fn for fn, _ in corpus_files]
+    expect = sum([lines for _, lines in corpus_files], [])
+    corpus = CorpusLines(files, block_size=37, num_workers=num_workers, task_size=500, max_pending=2)
+    assert list(corpus) == expect
+    # 可多次迭代
+    assert list(corpus) == expect
+    assert len(corpus) == len(expect)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 16:50
+# @Author: tk
+# @File：test_entry_points
+import importlib
+import os
+import re
+import pytest
+from numpy_io.core.reader import load_numpy_dataset
+from conftest import write_dataset
+
+SETUP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'setup.py')
+
+
+def _console_scripts():
+    with open(SETUP_FILE, mode='r', encoding='utf-8') as f:
+        return dict(re.findall(r"'(\w+)\s*=\s*([\w.]+:\w+)'", f.read()))
+
+
+def test_console_scripts_resolve():
+    scripts = _console_scripts()
+    assert {'numpy_io_convert', 'numpy_io_merge'} <= set(scripts)
+    for name, target in scripts.items():
+        module_name, attr = target.split(':')
+        assert callable(getattr(importlib.import_module(module_name), attr)), name
+
+
+def test_merge_main(tmp_path, capsys):
+    from numpy_io.core.merger import main
+    with pytest.raises(SystemExit):
+        main(['--help'])
+    assert 'numpy_io shard merger' in capsys.readouterr().out
+    src = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=10 + i) for i in range(3)]
+    main(['--input'] + src + ['--backend', 'record', '--output', str(tmp_path / 'out.record')])
+    outputs = capsys.readouterr().out.split()
+    assert outputs == [str(tmp_path / 'out.record')]
+    assert len(load_numpy_dataset(outputs[0], backend='record')) == 33
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/25 9:10
+# @Author: tk
+# @File：test_iterable_shard
+import numpy as np
+from numpy_io.core.reader import load_numpy_dataset
+from numpy_io.core.iterable_shard import shard_iterable_dataset
+from conftest import write_dataset
+
+
+def _shards(files, num_shards, **kwargs):
+    out = []
+    for shard_id in range(num_shards):
+        dataset = load_numpy_dataset(files, backend='record', with_record_iterable_dataset=True)
+        dataset = shard_iterable_dataset(dataset, num_shards, shard_id, **kwargs)
+        out.append([int(np.asarray(x['input_ids'])[0]) for x in dataset])
+    return out
+
+
+def test_default_record_stride_is_balanced(tmp_path):
+    # 文件大小不均 , 默认按条间隔切分 , 各份条数相差不超过 1
+    files = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=n) for i, n in enumerate([5, 30, 7, 12])]
+    shards = _shards(files, 2)
+    assert [len(x) for x in shards] == [27, 27]
+
+
+def test_file_shard_opt_in(tmp_path):
+    files = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=n) for i, n in enumerate([5, 30, 7, 12])]
+    shards = _shards(files, 2, with_file_shard=True)
+    assert [len(x) for x in shards] == [5 + 7, 30 + 12]
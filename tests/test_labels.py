@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 18:30
+# @Author: tk
+# @File：test_labels
+import json
+import os
+from numpy_io.core.labels import build_label_vocab, scan_labels
+
+
+def _write_labels(tmp_path):
+    json_file = str(tmp_path / 'labels.jsonl')
+    with open(json_file, mode='w', encoding='utf-8') as f:
+        for label in ['b', 'a', 'c', 'a', 'b', 'd'] * 20:
+            f.write(json.dumps({'text': 'x', 'label': label}) + '\n')
+    text_file = str(tmp_path / 'labels.txt')
+    with open(text_file, mode='w', encoding='utf-8') as f:
+        f.write('c\ne\nc\nc\n' * 10)
+    return [json_file, text_file]
+
+
+def test_vocab_order(tmp_path):
+    files = _write_labels(tmp_path)
+    assert scan_labels(files) == {'a': 40, 'b': 40, 'c': 50, 'd': 20, 'e': 10}
+    label2id, id2label = build_label_vocab(files)
+    # 频次降序 , 相同频次按标签排序
+    assert [id2label[i] for i in range(len(id2label))] == ['c', 'a', 'b', 'd', 'e']
+    assert label2id == {v: k for k, v in id2label.items()}
+
+
+def test_vocab_deterministic(tmp_path):
+    files = _write_labels(tmp_path)
+    expect = build_label_vocab(files)
+    assert build_label_vocab(files[::-1]) == expect
+    assert build_label_vocab(files, num_workers=2, task_size=128, block_size=64) == expect
+
+
+def test_vocab_cache(tmp_path):
+    files = _write_labels(tmp_path)
+    cache_file = str(tmp_path / 'labels-cache.json')
+    expect = build_label_vocab(files, cache_file=cache_file)
+    assert os.path.exists(cache_file)
+    # 缓存命中时不再扫描
+    with open(cache_file, mode='r', encoding='utf-8') as f:
+        cache = json.load(f)
+    cache['labels'] = [['z', 1]]
+    with open(cache_file, mode='w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    assert build_label_vocab(files, cache_file=cache_file) == ({'z': 0}, {0: 'z'})
+    # 标签文件修改后重新扫描
+    with open(files[1], mode='a', encoding='utf-8') as f:
+        f.write('e\n')
+    assert build_label_vocab(files, cache_file=cache_file) == expect
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 18:50
+# @Author: tk
+# @File：test_manifest
+import json
+import os
+import shutil
+import numpy as np
+from numpy_io.core.manifest import write_manifest, read_manifest, get_manifest_path, is_manifest_file, \
+    LazyShardRandomDataset
+from numpy_io.core.marker import read_done_marker
+from numpy_io.core.reader import load_numpy_dataset
+from numpy_io.core.batch import fetch_batch
+from numpy_io.core.merger import merge_datasets
+from conftest import write_dataset, make_record, TABLE_SCHEMA
+
+
+def _files(tmp_path, backend='record'):
+    return [write_dataset(str(tmp_path / 'data_{}.{}'.format(i, backend)), backend, num=10 + i) for i in range(3)]
+
+
+def test_round_trip(tmp_path):
+    files = _files(tmp_path)
+    manifest_file = get_manifest_path(str(tmp_path / 'data.record'))
+    assert is_manifest_file(manifest_file)
+    written = write_manifest(manifest_file, files, 'record')
+    manifest = read_manifest(manifest_file)
+    assert manifest.files == [os.path.abspath(f) for f in files]
+    assert manifest.counts == [10, 11, 12] and len(manifest) == 33
+    assert manifest.sizes == [os.path.getsize(f) for f in files]
+    assert manifest.checksums == [read_done_marker(f)['checksum'] for f in files]
+    assert manifest.options == written.options == {'compression_type': 'GZIP'}
+    assert manifest.verify(deep=True) == []
+    # 清单内为相对路径 , 整个目录移动后仍可读取
+    with open(manifest_file, mode='r', encoding='utf-8') as f:
+        assert [s['file'] for s in json.load(f)['shards']] == [os.path.basename(f) for f in files]
+
+
+def test_load_from_manifest(tmp_path):
+    files = _files(tmp_path)
+    manifest_file = get_manifest_path(str(tmp_path / 'data.record'))
+    write_manifest(manifest_file, files, 'record')
+    moved = str(tmp_path / 'moved')
+    shutil.copytree(str(tmp_path), moved, ignore=shutil.ignore_patterns('moved'))
+    dataset = load_numpy_dataset(os.path.join(moved, os.path.basename(manifest_file)))
+    assert isinstance(dataset, LazyShardRandomDataset)
+    assert len(dataset) == 33 and dataset._shards == [None] * 3
+    ids = list(range(10)) + list(range(11)) + list(range(12))
+    for i in (0, 9, 10, 21, 32):
+        np.testing.assert_array_equal(dataset[i]['input_ids'], make_record(ids[i])['input_ids'])
+    batch = fetch_batch(dataset, [32, 0, 15])
+    assert [int(x['input_ids'][0]) for x in batch] == [ids[32], ids[0], ids[15]]
+    iterable = load_numpy_dataset(manifest_file, with_record_iterable_dataset=True)
+    assert sum(1 for _ in iterable) == 33
+
+
+def test_verify_and_schema(tmp_path):
+    files = _files(tmp_path, 'parquet')
+    manifest_file = str(tmp_path / 'data.manifest.json')
+    write_manifest(manifest_file, files, 'parquet', schema=TABLE_SCHEMA)
+    manifest = read_manifest(manifest_file)
+    assert manifest.backend == 'parquet' and manifest.schema == TABLE_SCHEMA and manifest.options == {}
+    assert len(load_numpy_dataset(manifest_file)) == 33
+    with open(files[1], 'ab') as f:
+        f.write(b'\0')
+    os.remove(files[2])
+    assert manifest.verify() == [os.path.abspath(f) for f in files[1:]]
+
+
+def test_writers_emit_manifest(tmp_path):
+    # ParallelNumpyWriter close 及 merge_datasets 都写入清单
+    files = _files(tmp_path)
+    manifest = read_manifest(get_manifest_path(files[0]))
+    assert manifest.files == [os.path.abspath(files[0])] and manifest.counts == [10]
+    assert manifest.verify() == []
+
+    outputs = merge_datasets(files, 'record', str(tmp_path / 'merged.record'), num_shards=2)
+    manifest = read_manifest(get_manifest_path(str(tmp_path / 'merged.record')))
+    assert manifest.files == [os.path.abspath(f) for f in outputs] and len(manifest) == 33
+    assert not os.path.exists(get_manifest_path(outputs[0]))
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 15:10
+# @Author: tk
+# @File：test_marker
+import logging
+import os
+import pytest
+from numpy_io.core.marker import get_done_marker_path, read_done_marker, remove_done_marker, verify_done_marker
+from numpy_io.core.numpyadapter import NumpyReaderAdapter
+from numpy_io.pytorch_loader.data_helper import make_dataset
+from conftest import write_dataset, make_record
+
+
+def test_commit_marker(record_file):
+    assert not os.path.exists(os.path.join(os.path.dirname(record_file), '.data.record.tmp'))
+    info = read_done_marker(record_file)
+    assert info['backend'] == 'record' and info['total_num'] == 50
+    assert info['size'] == os.path.getsize(record_file)
+    assert verify_done_marker(record_file)
+    assert verify_done_marker(record_file, deep=True)
+    assert not verify_done_marker(record_file + '.missing')
+
+
+def test_marker_mismatch(record_file):
+    with open(record_file, 'ab') as f:
+        f.write(b'\0')
+    assert not verify_done_marker(record_file)
+
+
+def test_checksum_mismatch(record_file):
+    with open(record_file, 'r+b') as f:
+        f.seek(20)
+        b = f.read(1)
+        f.seek(20)
+        f.write(bytes([b[0] ^ 0xff]))
+    assert verify_done_marker(record_file)
+    assert not verify_done_marker(record_file, deep=True)
+
+
+def test_legacy_without_marker(record_file, caplog):
+    remove_done_marker(record_file)
+    assert not os.path.exists(get_done_marker_path(record_file))
+    with caplog.at_level(logging.WARNING):
+        assert verify_done_marker(record_file)
+    assert 'no commit marker' in caplog.text
+    assert not verify_done_marker(record_file, require_done_marker=True)
+    with pytest.raises(ValueError):
+        NumpyReaderAdapter.load(record_file, 'record', with_verify_commit=True)
+
+
+def test_make_dataset_reuse(tmp_path):
+    outfile = write_dataset(str(tmp_path / 'data.record'), num=10)
+    remove_done_marker(outfile)
+    mtime = os.stat(outfile).st_mtime_ns
+    make_dataset(list(range(20)), make_record, None, outfile, 'record', num_process_worker=0)
+    assert os.stat(outfile).st_mtime_ns == mtime and read_done_marker(outfile) is None
+
+    make_dataset(list(range(20)), make_record, None, outfile, 'record', num_process_worker=0,
+                 require_done_marker=True)
+    assert read_done_marker(outfile)['total_num'] == 20
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 17:10
+# @Author: tk
+# @File：test_record_index
+import os
+import numpy as np
+from fastdatasets.record import RECORD
+from numpy_io.core.record_index import get_record_index_path, load_record_index, IndexedRecordRandomDataset
+from numpy_io.core.reader import load_numpy_dataset
+from conftest import write_dataset, make_record
+
+
+def _check_items(dataset, ids):
+    assert len(dataset) == len(ids)
+    for i, k in enumerate(ids):
+        np.testing.assert_array_equal(dataset[i]['input_ids'], make_record(k)['input_ids'])
+
+
+def test_index_read_back(record_file):
+    indexes = load_record_index(record_file, RECORD.TFRecordOptions(compression_type='GZIP'))
+    assert indexes is not None and indexes.shape == (50, 2)
+    assert np.all(np.diff(indexes[:, 0]) > 0)
+    dataset = load_numpy_dataset(record_file, backend='record')
+    # 解析数据为 map 包装
+    assert isinstance(dataset.dataset, IndexedRecordRandomDataset)
+    assert isinstance(dataset.dataset.indexes, np.memmap)
+    _check_items(dataset, range(50))
+    _check_items(dataset, range(50))
+
+
+def test_multi_file_index(tmp_path):
+    files = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=10 + i) for i in range(3)]
+    dataset = load_numpy_dataset(files, backend='record')
+    _check_items(dataset, list(range(10)) + list(range(11)) + list(range(12)))
+
+
+def test_stale_index_falls_back(record_file):
+    index_path = get_record_index_path(record_file)
+    st = os.stat(record_file)
+    os.utime(index_path, ns=(st.st_atime_ns, st.st_mtime_ns - 10 ** 9))
+    assert load_record_index(record_file) is None
+    dataset = load_numpy_dataset(record_file, backend='record')
+    assert not isinstance(dataset.dataset.indexes, np.memmap)
+    _check_items(dataset, range(50))
+
+
+def test_uncompressed_index_size_check(tmp_path):
+    options = RECORD.TFRecordOptions(compression_type='')
+    fn = write_dataset(str(tmp_path / 'data.record'), num=20, options=options)
+    assert load_record_index(fn, options).shape == (20, 2)
+    index_path = get_record_index_path(fn)
+    with open(index_path, 'r+b') as f:
+        f.truncate(os.path.getsize(index_path) - 16)
+    assert load_record_index(fn, options) is None
+    _check_items(load_numpy_dataset(fn, backend='record', options=options), range(20))
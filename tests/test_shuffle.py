@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 16:20
+# @Author: tk
+# @File：test_shuffle
+import numpy as np
+from numpy_io.core.shuffle import shuffle_records
+from numpy_io.core.reader import load_numpy_dataset
+from conftest import write_dataset
+
+
+def _read_all(files):
+    out = []
+    for fn in files:
+        dataset = load_numpy_dataset(fn, backend='record')
+        out.extend(int(np.asarray(dataset[i]['input_ids'])[0]) for i in range(len(dataset)))
+        dataset.close()
+    return out
+
+
+def test_shuffle_bucket_groups(tmp_path):
+    # max_open_files 小于桶数时按组多遍读取 , 与一次打开全部桶结果一致
+    src = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=40) for i in range(2)]
+    kwargs = dict(num_shards=2, num_buckets=5, num_process_worker=0, seed=3, with_manifest=False)
+    a = _read_all(shuffle_records(src, str(tmp_path / 'a.record'), **kwargs))
+    b = _read_all(shuffle_records(src, str(tmp_path / 'b.record'), max_open_files=2, **kwargs))
+    assert a == b
+    assert sorted(a) == sorted(list(range(40)) * 2)
+    assert a != sorted(a)
+
+
+def test_shuffle_seed_per_task(tmp_path):
+    # 每个任务的种子由主进程生成 , 多进程与单进程结果一致
+    src = [write_dataset(str(tmp_path / 'data_{}.record'.format(i)), num=40) for i in range(2)]
+    kwargs = dict(num_shards=2, num_buckets=4, seed=5, with_manifest=False)
+    a = _read_all(shuffle_records(src, str(tmp_path / 'a.record'), num_process_worker=0, **kwargs))
+    b = _read_all(shuffle_records(src, str(tmp_path / 'b.record'), num_process_worker=2, **kwargs))
+    assert a == b
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# @Time:  2026/10/24 9:10
+# @Author: tk
+# @File：test_table_filter
+import numpy as np
+import pytest
+from numpy_io.core.numpyadapter import NumpyReaderAdapter
+from numpy_io.core.writer import DataWriteHelper
+from numpy_io.core.table_filter import ParquetProjectedIterableDataset, ParquetProjectedRandomDataset, \
+    read_row_group_stats
+from conftest import write_dataset, make_record
+
+
+def _make_id(index, args=None):
+    return {'id': np.asarray(index, dtype=np.int32), 'name': 'n{}'.format(index)}
+
+
+@pytest.mark.parametrize('backend', ['arrow_file', 'parquet'])
+@pytest.mark.parametrize('with_iterable', [False, True])
+def test_single_tuple_filter(tmp_path, backend, with_iterable):
+    fn = write_dataset(str(tmp_path / 'data.{}'.format(backend)), backend)
+    dataset = NumpyReaderAdapter.load(fn, backend, col_names=['input_ids'], filter=('seqlen', '>=', 6),
+                                      with_record_iterable_dataset=with_iterable)
+    rows = list(dataset) if with_iterable else [dataset[i] for i in range(len(dataset))]
+    expect = [list(make_record(i)['input_ids']) for i in range(50) if i % 7 + 1 >= 6]
+    assert [list(x['input_ids']) for x in rows] == expect
+    assert all(list(x.keys()) == ['input_ids'] for x in rows)
+
+
+def test_filter_list(tmp_path):
+    fn = write_dataset(str(tmp_path / 'data.arrow'), 'arrow_file')
+    dataset = NumpyReaderAdapter.load(fn, 'arrow_file', filter=[('seqlen', 'in', [1, 2]), ('seqlen', '!=', 2)],
+                                      with_record_iterable_dataset=False)
+    assert len(dataset) == len([i for i in range(50) if i % 7 == 0])
+
+
+def test_filter_unsupported_backend(record_file):
+    with pytest.raises(ValueError):
+        NumpyReaderAdapter.load(record_file, 'record', filter=('seqlen', '>=', 6))
+
+
+def test_parquet_row_group_stats(tmp_path):
+    # 按页脚统计跳过行组 , 结果与逐行过滤一致
+    fn = str(tmp_path / 'data.parquet')
+    DataWriteHelper(_make_id, None, fn, backend='parquet', num_process_worker=0, shuffle=False) \
+        .save(list(range(50)), schema={'id': 'int32', 'name': 'str'}, parquet_options={'max_row_group_length': 10})
+    stats = read_row_group_stats(fn)
+    assert [s[0] for s in stats] == [10] * 5
+    assert stats[2][1]['id'] == (20, 29, 0) and stats[2][1]['name'][:2] == ('n20', 'n29')
+
+    filter = [('id', '>=', 25), ('id', '<', 32)]
+    dataset = ParquetProjectedRandomDataset(fn, columns=['name'], filter=filter)
+    assert [dataset[i]['name'] for i in range(len(dataset))] == ['n{}'.format(i) for i in range(25, 32)]
+    assert dataset.num_row_groups_skipped == 3
+    dataset = ParquetProjectedIterableDataset(fn, filter=('id', 'in', [3, 47]))
+    assert [int(x['id']) for x in dataset] == [3, 47] and dataset.num_row_groups_skipped == 3
+
+
+def test_parquet_projected_cycle_length(tmp_path):
+    files = [write_dataset(str(tmp_path / 'data_{}.parquet'.format(i)), 'parquet', num=7 + i,
+                           parquet_options={'max_row_group_length': 4}) for i in range(3)]
+    kwargs = dict(cycle_length=2, block_length=3, with_record_iterable_dataset=True)
+    expect = NumpyReaderAdapter.load(files, 'parquet', **kwargs)
+    dataset = NumpyReaderAdapter.load(files, 'parquet', col_names=['seqlen'], **kwargs)
+    assert [int(x['seqlen']) for x in dataset] == [int(x['seqlen']) for x in expect]